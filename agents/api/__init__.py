@@ -0,0 +1,3 @@
+from .server import PromptAPI, HTTPError, create_app
+
+__all__ = ['PromptAPI', 'HTTPError', 'create_app']
@@ -0,0 +1,353 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..base.client_registry import get_registry
+from ..base.metrics import get_metrics, session_scope
+from ..prompt.prompt_analysis_agent import PromptAnalysisAgent
+from ..module.module_suggestion_agent import ModuleSuggestionAgent
+from ..question.dynamic_question_agent import DynamicQuestionAgent
+from ..question.session_store import SessionStore, create_session_store
+
+logger = logging.getLogger(__name__)
+
+MAX_QUESTIONS = 5
+
+# Question agents kept per worker so speculative prefetch survives between requests
+MAX_AGENTS = 1024
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+class HTTPError(Exception):
+    """An error answered with a JSON body and the given status code."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class PromptAPI:
+    """
+    ASGI application serving the prompt pipeline over HTTP.
+
+    Endpoints:
+        POST /sessions                            Start a session: {"prompt": ...}
+        GET  /sessions/{id}                       Current question and progress
+        POST /sessions/{id}/answers               Answer the current question: {"answer": ...}
+        GET  /sessions/{id}/final-prompt          Generate (once) and return the final prompt
+        GET  /sessions/{id}/final-prompt/stream   Stream the final prompt as server-sent events
+        GET  /metrics                             Completion metrics in Prometheus format
+        GET  /health                              Liveness check
+
+    Every request loads the session from the store and saves it back, so any
+    worker sharing the store can serve any request. Each worker also keeps the
+    question agent of its recently active sessions, so questions it prefetched
+    while the user was reading can serve the next answer.
+    """
+
+    def __init__(
+        self,
+        store: Optional[SessionStore] = None,
+        max_questions: int = MAX_QUESTIONS,
+        question_agent_options: Optional[Dict[str, Any]] = None,
+        fast_start: Optional[bool] = None
+    ):
+        """
+        Args:
+            store: Where session state lives between requests; configured from the environment by default
+            max_questions: Questions asked per session, including the initial one
+            question_agent_options: Extra keyword arguments for each DynamicQuestionAgent
+            fast_start: Start sessions with one combined analysis and question call;
+                read from AISCRIBE_FAST_START by default
+        """
+        self.store = store or create_session_store()
+        self.max_questions = max_questions
+        self.question_agent_options = question_agent_options or {}
+        if fast_start is None:
+            fast_start = os.getenv("AISCRIBE_FAST_START", "0") == "1"
+        self.fast_start = fast_start
+        # Analysis and suggestion agents keep no per-session state
+        self.analyzer = PromptAnalysisAgent()
+        self.suggester = ModuleSuggestionAgent()
+        self._agents: "OrderedDict[str, DynamicQuestionAgent]" = OrderedDict()
+        # Serializes requests for the same session within this worker
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._routes: List[Tuple[str, re.Pattern, Callable]] = [
+            ("POST", re.compile(r"^/sessions$"), self.start_session),
+            ("GET", re.compile(r"^/sessions/(?P<session_id>[0-9a-f]+)$"), self.get_session),
+            ("POST", re.compile(r"^/sessions/(?P<session_id>[0-9a-f]+)/answers$"), self.submit_answer),
+            ("GET", re.compile(r"^/sessions/(?P<session_id>[0-9a-f]+)/final-prompt$"), self.final_prompt),
+            ("GET", re.compile(r"^/sessions/(?P<session_id>[0-9a-f]+)/final-prompt/stream$"), self.stream_final_prompt),
+            ("GET", re.compile(r"^/metrics$"), self.metrics),
+            ("GET", re.compile(r"^/health$"), self.health)
+        ]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        started = False
+
+        async def tracked_send(message: Dict[str, Any]):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            handler, params = self._route(scope["method"], scope["path"])
+            await handler(scope, receive, tracked_send, **params)
+        except HTTPError as e:
+            await _send_error(send, started, e.status, e.message)
+        except Exception:
+            # Upstream error text and internals stay in the server log
+            logger.exception("Unhandled error in %s %s", scope["method"], scope["path"])
+            await _send_error(send, started, 500, "internal error")
+
+    async def _lifespan(self, receive: Receive, send: Send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                registry = get_registry()
+                if registry.config.prewarm_connections:
+                    await registry.warm_up()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await get_registry().aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _route(self, method: str, path: str) -> Tuple[Callable, Dict[str, str]]:
+        allowed = False
+        for route_method, pattern, handler in self._routes:
+            match = pattern.match(path)
+            if match is None:
+                continue
+            if route_method == method:
+                return handler, match.groupdict()
+            allowed = True
+        if allowed:
+            raise HTTPError(405, "Method not allowed")
+        raise HTTPError(404, "Not found")
+
+    def _lock(self, session_id: str) -> asyncio.Lock:
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[session_id] = lock
+        return lock
+
+    def _load(self, session_id: str) -> Dict[str, Any]:
+        record = self.store.load(session_id)
+        if record is None:
+            raise HTTPError(404, f"Unknown session {session_id}")
+        return record
+
+    def _question_agent(self, session_id: str, record: Optional[Dict[str, Any]] = None) -> DynamicQuestionAgent:
+        questioner = self._agents.get(session_id)
+        if questioner is None:
+            questioner = self._agents[session_id] = DynamicQuestionAgent(**self.question_agent_options)
+            while len(self._agents) > MAX_AGENTS:
+                _, evicted = self._agents.popitem(last=False)
+                evicted.prefetcher.reset()
+        self._agents.move_to_end(session_id)
+        # The store stays authoritative, since another worker may have served the last request
+        if record is not None:
+            questioner.session.load_state(record["state"])
+        return questioner
+
+    def _release_agent(self, session_id: str):
+        questioner = self._agents.pop(session_id, None)
+        if questioner is not None:
+            questioner.prefetcher.reset()
+
+    async def _prefetch(self, session_id: str, questioner: DynamicQuestionAgent, record: Dict[str, Any]):
+        # Speculate on the answers to the question just sent while the user reads it
+        if record["question"] and record["question_count"] < self.max_questions:
+            with session_scope(session_id):
+                await questioner.prefetch_next_questions(record["question"], record["prompt"])
+
+    def _public(self, session_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "session_id": session_id,
+            "question": record["question"],
+            "question_number": record["question_count"],
+            "max_questions": self.max_questions,
+            "done": record["question"] is None
+        }
+
+    async def start_session(self, scope: Scope, receive: Receive, send: Send):
+        body = await _read_json(receive)
+        prompt = body.get("prompt")
+        if not isinstance(prompt, str) or not prompt.strip():
+            raise HTTPError(400, "'prompt' must be a non-empty string")
+
+        session_id = uuid.uuid4().hex
+        with session_scope(session_id):
+            questioner = self._question_agent(session_id)
+            if self.fast_start:
+                session = await questioner.fast_start(prompt, self.suggester)
+            else:
+                analysis = await self.analyzer.analyze_prompt(prompt)
+                suggestions = await self.suggester.process_prompt_analysis_lazy(analysis)
+                session = await questioner.process_module_suggestions(suggestions)
+
+        record = {
+            "prompt": prompt,
+            "state": questioner.session.get_session_state(),
+            "question": session["initial_question"],
+            "question_count": 1 if session["initial_question"] else 0,
+            "final_prompt": None
+        }
+        self.store.save(session_id, record)
+        await _send_json(send, 201, self._public(session_id, record))
+        await self._prefetch(session_id, questioner, record)
+
+    async def get_session(self, scope: Scope, receive: Receive, send: Send, session_id: str):
+        record = self._load(session_id)
+        await _send_json(send, 200, {
+            **self._public(session_id, record),
+            "prompt": record["prompt"],
+            "answers": [
+                {"question": turn["question"].get("question"), "answer": turn["response"]}
+                for turn in record["state"]["question_history"]
+            ],
+            "final_prompt": record["final_prompt"]
+        })
+
+    async def submit_answer(self, scope: Scope, receive: Receive, send: Send, session_id: str):
+        body = await _read_json(receive)
+        answer = body.get("answer")
+        if not isinstance(answer, str) or not answer.strip():
+            raise HTTPError(400, "'answer' must be a non-empty string")
+
+        async with self._lock(session_id):
+            record = self._load(session_id)
+            question = record["question"]
+            if question is None:
+                raise HTTPError(409, "The session has no open question")
+            # Lets clients detect a retried or out-of-order submission
+            expected = body.get("question_number")
+            if expected is not None and expected != record["question_count"]:
+                raise HTTPError(409, f"Question {expected} is not the current question ({record['question_count']})")
+
+            questioner = self._question_agent(session_id, record)
+            questioner.record_response(question, answer)
+            next_question = None
+            if record["question_count"] < self.max_questions:
+                with session_scope(session_id):
+                    next_question = await questioner.generate_next_question({
+                        "question": question,
+                        "response": answer,
+                        "initial_prompt": record["prompt"]
+                    })
+
+            record["state"] = questioner.session.get_session_state()
+            record["question"] = next_question
+            if next_question:
+                record["question_count"] += 1
+            self.store.save(session_id, record)
+            await _send_json(send, 200, self._public(session_id, record))
+            await self._prefetch(session_id, questioner, record)
+
+    async def final_prompt(self, scope: Scope, receive: Receive, send: Send, session_id: str):
+        async with self._lock(session_id):
+            record = self._load(session_id)
+            if record["final_prompt"] is None:
+                with session_scope(session_id):
+                    record["final_prompt"] = await self._question_agent(session_id, record).generate_final_prompt(initial_prompt=record["prompt"])
+                self.store.save(session_id, record)
+            self._release_agent(session_id)
+        await _send_json(send, 200, {"session_id": session_id, "final_prompt": record["final_prompt"]})
+
+    async def stream_final_prompt(self, scope: Scope, receive: Receive, send: Send, session_id: str):
+        async with self._lock(session_id):
+            record = self._load(session_id)
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")]
+            })
+            if record["final_prompt"] is not None:
+                await _send_event(send, record["final_prompt"])
+            else:
+                chunks = []
+                with session_scope(session_id):
+                    async for chunk in self._question_agent(session_id, record).stream_final_prompt(initial_prompt=record["prompt"]):
+                        chunks.append(chunk)
+                        await _send_event(send, chunk)
+                record["final_prompt"] = "".join(chunks).strip()
+                self.store.save(session_id, record)
+            self._release_agent(session_id)
+            await send({"type": "http.response.body", "body": b"event: done\ndata: {}\n\n"})
+
+    async def metrics(self, scope: Scope, receive: Receive, send: Send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/plain; version=0.0.4")]
+        })
+        await send({"type": "http.response.body", "body": get_metrics().to_prometheus().encode("utf-8")})
+
+    async def health(self, scope: Scope, receive: Receive, send: Send):
+        await _send_json(send, 200, {"status": "ok"})
+
+async def _read_json(receive: Receive) -> Dict[str, Any]:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    try:
+        body = json.loads(b"".join(chunks) or b"{}")
+    except ValueError:
+        raise HTTPError(400, "Request body must be JSON")
+    if not isinstance(body, dict):
+        raise HTTPError(400, "Request body must be a JSON object")
+    return body
+
+async def _send_json(send: Send, status: int, payload: Dict[str, Any]):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def _send_error(send: Send, started: bool, status: int, message: str):
+    if not started:
+        await _send_json(send, status, {"error": message})
+        return
+    # The response has already begun, so end its body with an error event instead of starting another
+    data = json.dumps({"status": status, "error": message}, ensure_ascii=False)
+    await send({"type": "http.response.body", "body": f"event: error\ndata: {data}\n\n".encode("utf-8")})
+
+async def _send_event(send: Send, chunk: str):
+    data = json.dumps({"text": chunk}, ensure_ascii=False)
+    await send({"type": "http.response.body", "body": f"data: {data}\n\n".encode("utf-8"), "more_body": True})
+
+def create_app(store: Optional[SessionStore] = None, **kwargs) -> PromptAPI:
+    """
+    Build the ASGI application.
+
+    Args:
+        store: Where session state lives between requests; configured from the environment by default
+        **kwargs: Passed through to PromptAPI
+
+    Returns:
+        The ASGI application
+    """
+    return PromptAPI(store=store, **kwargs)
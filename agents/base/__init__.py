@@ -1,3 +1,12 @@
 from .base_agent import BaseAgent
+from .llm_client import LLMClient
+from .response_cache import ResponseCache, SQLiteCacheStore
+from .metrics import MetricsRegistry, CallRecord, current_session, get_metrics, session_scope
+from .tracing import end_session_trace, traced, traced_stream, tracing_enabled
+from .client_registry import ClientRegistry, PoolConfig, get_registry
+from .rate_limiter import RateLimiter, RateLimitConfig
+from .latency_policy import DeadlineExceeded, LatencyPolicy, LatencyPolicyConfig
+from .model_router import ModelRouter, RoutingConfig
+from .model_transport import LatencyModel, StubTransport, RecordingTransport, ReplayTransport
 
-__all__ = ['BaseAgent'] 
\ No newline at end of file
+__all__ = ['BaseAgent', 'LLMClient', 'ClientRegistry', 'PoolConfig', 'get_registry', 'ResponseCache', 'SQLiteCacheStore', 'MetricsRegistry', 'CallRecord', 'current_session', 'get_metrics', 'session_scope', 'end_session_trace', 'traced', 'traced_stream', 'tracing_enabled', 'RateLimiter', 'RateLimitConfig', 'DeadlineExceeded', 'LatencyPolicy', 'LatencyPolicyConfig', 'ModelRouter', 'RoutingConfig', 'LatencyModel', 'StubTransport', 'RecordingTransport', 'ReplayTransport']
@@ -1,15 +1,13 @@
 from autogen_agentchat.agents import AssistantAgent
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-from openai import OpenAI
+from .client_registry import get_registry
 
 class BaseAgent(AssistantAgent):
     """Base agent class with common functionality."""
     
     def __init__(self, name: str, system_message: str, model_client=None, **kwargs):
+        registry = get_registry()
         if model_client is None:
-            model_client = OpenAIChatCompletionClient(
-                model="gpt-4o-mini"
-            )
+            model_client = registry.get_model_client()
             
         super().__init__(
             name=name,
@@ -18,5 +16,6 @@ class BaseAgent(AssistantAgent):
             **kwargs
         )
         
-        # Create OpenAI client for direct API calls
-        self.client = OpenAI() 
\ No newline at end of file
+        # Shared, pooled async OpenAI client for direct API calls
+        self.client = registry.get_openai_client()
+        self.llm = registry.get_llm()
@@ -0,0 +1,239 @@
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+from openai import AsyncOpenAI
+
+from .llm_client import LLMClient, DEFAULT_MODEL
+from .response_cache import ResponseCache
+from .metrics import get_metrics
+from .model_transport import transport_from_env
+from .rate_limiter import RateLimitConfig, RateLimiter
+from .latency_policy import LatencyPolicy
+from .model_router import ModelRouter
+
+@dataclass
+class PoolConfig:
+    """Connection pool settings for the shared HTTP client."""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 60.0
+    timeout: float = 60.0
+    prewarm_connections: int = 0
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        """Build a pool configuration from ``AISCRIBE_*`` environment variables."""
+        return cls(
+            max_connections=int(os.getenv("AISCRIBE_MAX_CONNECTIONS", cls.max_connections)),
+            max_keepalive_connections=int(os.getenv("AISCRIBE_MAX_KEEPALIVE", cls.max_keepalive_connections)),
+            keepalive_expiry=float(os.getenv("AISCRIBE_KEEPALIVE_EXPIRY", cls.keepalive_expiry)),
+            timeout=float(os.getenv("AISCRIBE_HTTP_TIMEOUT", cls.timeout)),
+            prewarm_connections=int(os.getenv("AISCRIBE_PREWARM_CONNECTIONS", cls.prewarm_connections))
+        )
+
+class PoolStatsTransport(httpx.AsyncHTTPTransport):
+    """HTTP transport that records connection reuse and pool wait times."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = 0
+        self.in_flight = 0
+        self.connections_opened = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        waited = False
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            nonlocal waited
+            if event_name == "connection.connect_tcp.started":
+                self.connections_opened += 1
+            if not waited and (
+                event_name == "connection.connect_tcp.started"
+                or event_name.endswith("send_request_headers.started")
+            ):
+                waited = True
+                wait = time.perf_counter() - started
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+
+        request.extensions["trace"] = trace
+        self.requests += 1
+        self.in_flight += 1
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the pool statistics."""
+        connections = list(self._pool.connections)
+        active = sum(1 for connection in connections if not connection.is_idle())
+        reused = max(self.requests - self.connections_opened, 0)
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "connections_opened": self.connections_opened,
+            "active_connections": active,
+            "idle_connections": len(connections) - active,
+            "reuse_ratio": reused / self.requests if self.requests else 0.0,
+            "avg_wait_ms": 1000 * self.total_wait / self.requests if self.requests else 0.0,
+            "max_wait_ms": 1000 * self.max_wait
+        }
+
+class ClientRegistry:
+    """Process-wide registry handing the same pooled clients to every agent and session."""
+
+    def __init__(
+        self,
+        config: Optional[PoolConfig] = None,
+        cache: Optional[ResponseCache] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        limiter: Optional[RateLimiter] = None,
+        latency_policy: Optional[LatencyPolicy] = None,
+        router: Optional[ModelRouter] = None
+    ):
+        """
+        Args:
+            config: Connection pool settings; read from the environment by default
+            cache: Response cache; read from the environment by default
+            transport: Replaces the network transport, e.g. with a stub or replay transport;
+                selected by ``AISCRIBE_TRANSPORT`` by default
+            limiter: Rate limiter shared by every completion; configured from the environment by default
+            latency_policy: Per-stage deadlines and hedging; configured from the environment by default
+            router: Per-stage model routing; configured from the environment by default
+        """
+        self.config = config or PoolConfig.from_env()
+        self.cache = cache or ResponseCache.from_env()
+        if limiter is None:
+            rate_limit = RateLimitConfig.from_env()
+            limiter = RateLimiter(rate_limit) if rate_limit.enabled else None
+        self.limiter = limiter
+        if self.limiter is not None:
+            self.limiter.register_metrics(get_metrics())
+        self.latency_policy = latency_policy or LatencyPolicy()
+        self.latency_policy.register_metrics(get_metrics())
+        self.router = router or ModelRouter()
+        self.router.register_metrics(get_metrics())
+        self.transport = PoolStatsTransport(
+            limits=httpx.Limits(
+                max_connections=self.config.max_connections,
+                max_keepalive_connections=self.config.max_keepalive_connections,
+                keepalive_expiry=self.config.keepalive_expiry
+            )
+        )
+        # Record, replay or stub completions instead of (or around) the network
+        self.model_transport = transport or transport_from_env(self.transport)
+        self.http_client = httpx.AsyncClient(
+            transport=self.model_transport,
+            timeout=self.config.timeout
+        )
+        self._openai_client: Optional[AsyncOpenAI] = None
+        self._llm: Optional[LLMClient] = None
+        self._model_clients: Dict[str, OpenAIChatCompletionClient] = {}
+        self._lock = threading.Lock()
+
+    def get_openai_client(self) -> AsyncOpenAI:
+        """Get the shared async OpenAI client."""
+        with self._lock:
+            if self._openai_client is None:
+                options = {}
+                if self.limiter is not None:
+                    # The limiter retries with backoff shared across all callers instead
+                    options["max_retries"] = 0
+                self._openai_client = AsyncOpenAI(http_client=self.http_client, api_key=self._api_key(), **options)
+            return self._openai_client
+
+    def get_llm(self) -> LLMClient:
+        """Get the shared completion transport built on the pooled client."""
+        client = self.get_openai_client()
+        with self._lock:
+            if self._llm is None:
+                self._llm = LLMClient(
+                    client,
+                    cache=self.cache,
+                    metrics=get_metrics(),
+                    limiter=self.limiter,
+                    latency_policy=self.latency_policy,
+                    router=self.router
+                )
+            return self._llm
+
+    def get_model_client(self, model: str = DEFAULT_MODEL) -> OpenAIChatCompletionClient:
+        """Get the shared autogen model client for a model, reusing the pooled connections."""
+        with self._lock:
+            if model not in self._model_clients:
+                self._model_clients[model] = OpenAIChatCompletionClient(
+                    model=model,
+                    http_client=self.http_client,
+                    api_key=self._api_key()
+                )
+            return self._model_clients[model]
+
+    def _api_key(self) -> Optional[str]:
+        # Offline transports never reach the API, so they do not need a real key
+        if self.model_transport is not self.transport and not os.getenv("OPENAI_API_KEY"):
+            return "offline"
+        return None
+    
+    async def warm_up(self, connections: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Open pooled connections ahead of the first request.
+
+        Args:
+            connections: Number of connections to open (defaults to the configured value, at least 1)
+
+        Returns:
+            Pool statistics after warming up
+        """
+        count = connections if connections is not None else max(self.config.prewarm_connections, 1)
+        base_url = str(self.get_openai_client().base_url)
+
+        async def connect():
+            try:
+                await self.http_client.head(base_url)
+            except httpx.HTTPError:
+                pass
+
+        await asyncio.gather(*(connect() for _ in range(count)))
+        return self.pool_stats()
+
+    def rate_limit_stats(self) -> Optional[Dict[str, Any]]:
+        """Get the rate limiter's limit, queue depth and throttling counters, if it is enabled."""
+        return self.limiter.stats() if self.limiter is not None else None
+
+    def latency_stats(self) -> Dict[str, Any]:
+        """Get hedging and deadline counters and the current hedge thresholds."""
+        return self.latency_policy.stats()
+
+    def routing_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get each stage's current model tier, failure rate and latency."""
+        return self.router.stats()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Get statistics about the shared connection pool."""
+        return self.transport.stats()
+
+    async def aclose(self):
+        """Close the shared HTTP client and its connections."""
+        await self.http_client.aclose()
+
+_registry: Optional[ClientRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> ClientRegistry:
+    """Return the process-wide client registry, creating it on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ClientRegistry()
+        return _registry
@@ -0,0 +1,137 @@
+import asyncio
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set
+
+from .metrics import Histogram, MetricsRegistry
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """A completion did not finish within its stage's deadline."""
+
+    def __init__(self, stage: str, deadline: float):
+        super().__init__(f"{stage} completion exceeded its {deadline:g}s deadline")
+        self.stage = stage
+        self.deadline = deadline
+
+def _parse_stage_values(spec: str) -> Dict[str, float]:
+    """Parse ``stage=value,stage=value`` into a dict."""
+    values = {}
+    for part in spec.split(","):
+        stage, _, value = part.partition("=")
+        if stage.strip() and value.strip():
+            values[stage.strip()] = float(value)
+    return values
+
+@dataclass
+class LatencyPolicyConfig:
+    """Per-stage deadlines and request hedging settings."""
+
+    deadlines: Dict[str, float] = field(default_factory=dict)
+    default_deadline: float = 0.0
+    hedge_stages: Set[str] = field(default_factory=set)
+    hedge_quantile: float = 90.0
+    hedge_budget: float = 0.1
+    hedge_burst: float = 5.0
+    min_samples: int = 20
+
+    @classmethod
+    def from_env(cls) -> "LatencyPolicyConfig":
+        """
+        Build a configuration from ``AISCRIBE_*`` environment variables.
+
+        ``AISCRIBE_DEADLINES`` sets per-stage deadlines in seconds
+        (``question_generation=8,final_prompt=30``) and ``AISCRIBE_DEADLINE``
+        the deadline of every other stage; 0 means none. ``AISCRIBE_HEDGE``
+        lists the stages to hedge (or ``all``), ``AISCRIBE_HEDGE_QUANTILE`` the
+        latency percentile after which a duplicate is sent, and
+        ``AISCRIBE_HEDGE_BUDGET`` the extra requests hedging may add, as a
+        fraction of all requests.
+        """
+        hedge = os.getenv("AISCRIBE_HEDGE", "")
+        return cls(
+            deadlines=_parse_stage_values(os.getenv("AISCRIBE_DEADLINES", "")),
+            default_deadline=float(os.getenv("AISCRIBE_DEADLINE", cls.default_deadline)),
+            hedge_stages={stage.strip() for stage in hedge.split(",") if stage.strip()},
+            hedge_quantile=float(os.getenv("AISCRIBE_HEDGE_QUANTILE", cls.hedge_quantile)),
+            hedge_budget=float(os.getenv("AISCRIBE_HEDGE_BUDGET", cls.hedge_budget))
+        )
+
+class LatencyPolicy:
+    """
+    Decides each stage's deadline and when a slow completion gets a hedge.
+
+    A hedge is a duplicate of a call that has not returned by the stage's
+    observed latency percentile; the first of the two to finish is used.
+    Hedges are paid for from a budget that every call tops up by
+    ``hedge_budget``, so hedging can never add more than that fraction of
+    extra requests, even when the whole provider slows down at once.
+    """
+
+    def __init__(self, config: Optional[LatencyPolicyConfig] = None):
+        self.config = config or LatencyPolicyConfig.from_env()
+        self._latency: Dict[str, Histogram] = {}
+        self._thresholds: Dict[str, Optional[float]] = {}
+        self._budget = self.config.hedge_burst
+        self.calls = 0
+        self.hedges_issued = 0
+        self.hedges_won = 0
+        self.hedges_denied = 0
+        self.deadlines_exceeded = 0
+
+    def deadline(self, stage: str) -> Optional[float]:
+        """Get the stage's deadline in seconds, or None if it has none."""
+        deadline = self.config.deadlines.get(stage, self.config.default_deadline)
+        return deadline if deadline > 0 else None
+
+    def hedge_delay(self, stage: str) -> Optional[float]:
+        """
+        Count a call and get how long to wait before hedging it.
+
+        Returns:
+            Seconds after which to send a duplicate, or None if the call is not hedged
+        """
+        self.calls += 1
+        self._budget = min(self._budget + self.config.hedge_budget, self.config.hedge_burst)
+        if "all" not in self.config.hedge_stages and stage not in self.config.hedge_stages:
+            return None
+        return self._thresholds.get(stage)
+
+    def try_hedge(self) -> bool:
+        """Spend budget on a hedge; False if hedging has used up its share of traffic."""
+        if self._budget < 1.0:
+            self.hedges_denied += 1
+            return False
+        self._budget -= 1.0
+        self.hedges_issued += 1
+        return True
+
+    def observe(self, stage: str, latency: float, hedge_won: bool = False):
+        """Record how long a successful attempt took."""
+        histogram = self._latency.setdefault(stage, Histogram(window=512))
+        histogram.observe(latency)
+        if hedge_won:
+            self.hedges_won += 1
+        # Sorting the window on every call would cost more than it saves
+        if histogram.count >= self.config.min_samples and histogram.count % 16 == 0:
+            self._thresholds[stage] = histogram.percentile(self.config.hedge_quantile)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hedge and deadline counters and the current hedge thresholds."""
+        return {
+            "calls": self.calls,
+            "hedges_issued": self.hedges_issued,
+            "hedges_won": self.hedges_won,
+            "hedges_denied": self.hedges_denied,
+            "hedge_rate": self.hedges_issued / self.calls if self.calls else 0.0,
+            "deadlines_exceeded": self.deadlines_exceeded,
+            "hedge_thresholds_ms": {
+                stage: round(1000 * threshold, 1) for stage, threshold in self._thresholds.items() if threshold is not None
+            }
+        }
+
+    def register_metrics(self, metrics: MetricsRegistry):
+        """Expose the hedge and deadline counters in the metrics export."""
+        metrics.register_gauge("aiscribe_hedges_issued_total", lambda: self.hedges_issued, metric_type="counter")
+        metrics.register_gauge("aiscribe_hedges_won_total", lambda: self.hedges_won, metric_type="counter")
+        metrics.register_gauge("aiscribe_hedges_denied_total", lambda: self.hedges_denied, metric_type="counter")
+        metrics.register_gauge("aiscribe_deadlines_exceeded_total", lambda: self.deadlines_exceeded, metric_type="counter")
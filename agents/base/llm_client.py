@@ -0,0 +1,426 @@
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Type, TypeVar
+from openai import AsyncOpenAI
+from pydantic import BaseModel
+from .response_cache import ResponseCache
+from .metrics import CallRecord, MetricsRegistry, estimate_cost
+from .rate_limiter import Permit, RateLimiter
+from .latency_policy import DeadlineExceeded, LatencyPolicy
+from .model_router import DEFAULT_MODEL, ModelRouter
+from .tracing import record_call, recording_calls
+from ..utils.token_utils import count_message_tokens, count_tokens
+from ..utils.json_utils import StructuredOutputError, parse_model
+from ..utils.schemas import response_format
+
+M = TypeVar("M", bound=BaseModel)
+
+def _request_params(kwargs: Dict) -> Dict:
+    # The SDK walks typed parameters against their type hints on every request, which
+    # costs more than the call itself for a nested JSON schema; extra_body is sent as is
+    if "response_format" not in kwargs:
+        return kwargs
+    params = dict(kwargs)
+    params["extra_body"] = {**(params.get("extra_body") or {}), "response_format": params.pop("response_format")}
+    return params
+
+class LLMClient:
+    """Async chat-completion transport shared by all agents and their helpers."""
+
+    def __init__(
+        self,
+        client: Optional[AsyncOpenAI] = None,
+        cache: Optional[ResponseCache] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        limiter: Optional[RateLimiter] = None,
+        latency_policy: Optional[LatencyPolicy] = None,
+        router: Optional[ModelRouter] = None
+    ):
+        """
+        Args:
+            client: The async OpenAI client; its own retries should be off when a limiter retries instead
+            cache: Response cache for identical requests
+            metrics: Registry every call is recorded in
+            limiter: Shared rate limiter every attempt waits for
+            latency_policy: Per-stage deadlines and request hedging
+            router: Picks the model of calls that do not name one; configured from the environment by default
+        """
+        self.client = client or AsyncOpenAI()
+        self.cache = cache
+        self.metrics = metrics
+        self.limiter = limiter
+        self.latency_policy = latency_policy
+        self.router = router or ModelRouter()
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        stage: str = "completion",
+        agent: str = "unknown",
+        **kwargs
+    ) -> str:
+        """
+        Send a chat completion request without blocking the event loop.
+
+        Identical requests are answered from the response cache when one is
+        configured, and concurrent identical requests share a single call.
+        Every call is recorded in the metrics registry when one is configured.
+        With a latency policy, a call that outlives its stage's deadline raises
+        DeadlineExceeded, and a slow call may be hedged with a duplicate.
+
+        Args:
+            messages: The chat messages to send
+            model: The model to use for the completion; routed by stage when omitted
+            use_cache: Whether to read and write the response cache for this call
+            stage: Pipeline stage the call belongs to, used for accounting
+            agent: Name of the agent or helper making the call
+            **kwargs: Extra arguments passed through to the completions API
+
+        Returns:
+            The text content of the first choice
+        """
+        started = time.perf_counter()
+        model = model or self.router.model_for(stage)
+        if self.cache is None or not use_cache:
+            return await self._create_recorded(messages, model, stage, agent, started, **kwargs)
+
+        key = ResponseCache.make_key(model, messages, **kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._record(CallRecord(agent, stage, model, latency=time.perf_counter() - started, cached=True))
+            return cached
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            try:
+                content = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Only swallow the cancellation of the call we were sharing, never our own
+                task = asyncio.current_task()
+                if not pending.cancelled() or getattr(task, "cancelling", lambda: 0)():
+                    raise
+                return await self.complete(messages, model, use_cache, stage, agent, **kwargs)
+            self._record(CallRecord(agent, stage, model, latency=time.perf_counter() - started, cached=True))
+            return content
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            content = await self._create_recorded(messages, model, stage, agent, started, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else is waiting
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+        self.cache.set(key, content)
+        future.set_result(content)
+        return content
+
+    async def complete_structured(
+        self,
+        messages: List[Dict[str, str]],
+        response_model: Type[M],
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        stage: str = "completion",
+        agent: str = "unknown",
+        retries: int = 1,
+        **kwargs
+    ) -> M:
+        """
+        Request schema-constrained JSON and validate it into a result model.
+
+        The completion is constrained to the model's JSON schema. Output that
+        still does not validate (a refusal, a truncated reply) is dropped from
+        the cache and requested again up to ``retries`` times. Attempts, retries
+        and fallbacks are recorded per stage, and the outcome is reported to the
+        model router.
+
+        Args:
+            messages: The chat messages to send
+            response_model: The pydantic model to validate the completion into
+            model: The model to use for the completion; routed by stage when omitted
+            use_cache: Whether to read and write the response cache for this call
+            stage: Pipeline stage the call belongs to, used for accounting
+            agent: Name of the agent or helper making the call
+            retries: Extra attempts after a completion that does not validate
+            **kwargs: Extra arguments passed through to the completions API
+
+        Returns:
+            The validated result
+
+        Raises:
+            StructuredOutputError: No attempt produced a valid result
+        """
+        model = model or self.router.model_for(stage)
+        kwargs.setdefault("response_format", response_format(response_model))
+        attempts = 0
+        while True:
+            attempts += 1
+            text = await self.complete(messages, model, use_cache, stage, agent, **kwargs)
+            result = parse_model(text, response_model)
+            if result is not None:
+                break
+            if self.cache is not None and use_cache:
+                self.cache.discard(ResponseCache.make_key(model, messages, **kwargs))
+            if attempts > retries:
+                break
+        self.router.record_outcome(stage, result is not None)
+        if self.metrics is not None:
+            self.metrics.record_output(stage, attempts, result is not None)
+        if result is None:
+            raise StructuredOutputError(stage, text)
+        return result
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        stage: str = "completion",
+        agent: str = "unknown",
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion as text chunks while it is being generated.
+
+        A cached completion is yielded as a single chunk, and a fully streamed
+        completion is stored in the cache under the same key as ``complete``.
+
+        Args:
+            messages: The chat messages to send
+            model: The model to use for the completion; routed by stage when omitted
+            use_cache: Whether to read and write the response cache for this call
+            stage: Pipeline stage the call belongs to, used for accounting
+            agent: Name of the agent or helper making the call
+            **kwargs: Extra arguments passed through to the completions API
+
+        Yields:
+            Text chunks of the first choice
+        """
+        started = time.perf_counter()
+        model = model or self.router.model_for(stage)
+        key = None
+        if self.cache is not None and use_cache:
+            key = ResponseCache.make_key(model, messages, **kwargs)
+            cached = self.cache.get(key)
+            if cached is not None:
+                latency = time.perf_counter() - started
+                self._record(CallRecord(agent, stage, model, latency=latency, time_to_first_token=latency, cached=True))
+                yield cached
+                return
+
+        chunks = []
+        usage = None
+        first_token = None
+        # Once text is flowing the caller sees progress, so the deadline covers the first chunk
+        deadline = self.latency_policy.deadline(stage) if self.latency_policy is not None else None
+        attempt = 0
+        while True:
+            attempt += 1
+            response = None
+            permit = await self._before_deadline(self._acquire(messages, model, stage, kwargs), stage, started, deadline)
+            try:
+                response = await self._before_deadline(self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **_request_params(kwargs)
+                ), stage, started, deadline)
+                events = response.__aiter__()
+                while True:
+                    try:
+                        if first_token is None:
+                            event = await self._before_deadline(events.__anext__(), stage, started, deadline)
+                        else:
+                            event = await events.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    if event.usage is not None:
+                        usage = event.usage
+                    if not event.choices:
+                        continue
+                    content = event.choices[0].delta.content
+                    if content:
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                        chunks.append(content)
+                        yield content
+            except Exception as e:
+                if response is not None:
+                    await response.close()
+                # A stream can only be retried before any of it reached the caller
+                delay = self.limiter.release_error(permit, e, attempt) if permit is not None else None
+                if delay is not None and not chunks:
+                    await asyncio.sleep(delay)
+                    continue
+                self._record_usage(messages, model, stage, agent, started, "".join(chunks), usage, first_token, type(e).__name__)
+                raise
+            except BaseException:
+                if response is not None:
+                    await response.close()
+                if permit is not None:
+                    self.limiter.abandon(permit)
+                raise
+            if permit is not None:
+                self.limiter.release(permit, usage.total_tokens if usage is not None else None)
+            break
+
+        text = "".join(chunks)
+        self._record_usage(messages, model, stage, agent, started, text, usage, first_token)
+        if key is not None:
+            self.cache.set(key, text)
+
+    async def _create_recorded(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        stage: str,
+        agent: str,
+        started: float,
+        **kwargs
+    ) -> str:
+        try:
+            content, usage = await self._create_within_policy(messages, model, stage, started, **kwargs)
+        except Exception as e:
+            self._record_usage(messages, model, stage, agent, started, "", None, None, type(e).__name__)
+            raise
+        self._record_usage(messages, model, stage, agent, started, content, usage)
+        return content
+
+    async def _create_within_policy(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        stage: str,
+        started: float,
+        **kwargs
+    ) -> Tuple[str, object]:
+        if self.latency_policy is None:
+            return await self._create(messages, model, stage, **kwargs)
+        deadline = self.latency_policy.deadline(stage)
+        return await self._before_deadline(self._create_hedged(messages, model, stage, **kwargs), stage, started, deadline)
+
+    async def _create_hedged(self, messages: List[Dict[str, str]], model: str, stage: str, **kwargs) -> Tuple[str, object]:
+        policy = self.latency_policy
+        delay = policy.hedge_delay(stage)
+        started = time.perf_counter()
+        if delay is None:
+            result = await self._create(messages, model, stage, **kwargs)
+            policy.observe(stage, time.perf_counter() - started)
+            return result
+
+        attempts = [asyncio.ensure_future(self._create(messages, model, stage, **kwargs))]
+        starts = [started]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done and policy.try_hedge():
+                attempts.append(asyncio.ensure_future(self._create(messages, model, stage, **kwargs)))
+                starts.append(time.perf_counter())
+            # The first attempt to succeed wins; a failure only counts once both have failed
+            error = None
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for index, attempt in enumerate(attempts):
+                    if attempt not in done:
+                        continue
+                    if attempt.exception() is None:
+                        policy.observe(stage, time.perf_counter() - starts[index], hedge_won=index > 0)
+                        return attempt.result()
+                    error = error or attempt.exception()
+            raise error
+        finally:
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+
+    async def _before_deadline(self, awaitable, stage: str, started: float, deadline: Optional[float]):
+        """Await a step of a call, raising DeadlineExceeded once the stage's deadline has passed."""
+        if deadline is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, max(started + deadline - time.perf_counter(), 0.0))
+        except asyncio.TimeoutError:
+            self.latency_policy.deadlines_exceeded += 1
+            raise DeadlineExceeded(stage, deadline) from None
+
+    async def _create(self, messages: List[Dict[str, str]], model: str, stage: str, **kwargs) -> Tuple[str, object]:
+        attempt = 0
+        while True:
+            attempt += 1
+            permit = await self._acquire(messages, model, stage, kwargs)
+            try:
+                response = await self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    **_request_params(kwargs)
+                )
+            except Exception as e:
+                delay = self.limiter.release_error(permit, e, attempt) if permit is not None else None
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                if permit is not None:
+                    self.limiter.abandon(permit)
+                raise
+            if permit is not None:
+                self.limiter.release(permit, response.usage.total_tokens if response.usage is not None else None)
+            return response.choices[0].message.content or "", response.usage
+
+    async def _acquire(self, messages: List[Dict[str, str]], model: str, stage: str, kwargs: Dict) -> Optional[Permit]:
+        if self.limiter is None:
+            return None
+        tokens = self.limiter.estimate_tokens(messages, model, kwargs.get("max_tokens"))
+        return await self.limiter.acquire(tokens, stage)
+
+    def _record_usage(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        stage: str,
+        agent: str,
+        started: float,
+        content: str,
+        usage,
+        first_token: Optional[float] = None,
+        error: Optional[str] = None
+    ):
+        if error is None:
+            self.router.observe_latency(stage, model, time.perf_counter() - started)
+        if self.metrics is None and not recording_calls():
+            return
+        # Count tokens locally when the provider did not report usage
+        if usage is not None:
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+        else:
+            prompt_tokens = count_message_tokens(messages, model)
+            completion_tokens = count_tokens(content, model) if content else 0
+        self._record(CallRecord(
+            agent,
+            stage,
+            model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency=time.perf_counter() - started,
+            time_to_first_token=first_token,
+            cost=estimate_cost(model, prompt_tokens, completion_tokens),
+            error=error
+        ))
+
+    def _record(self, record: CallRecord):
+        record_call(record)
+        if self.metrics is not None:
+            self.metrics.record(record)
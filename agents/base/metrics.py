@@ -0,0 +1,294 @@
+import bisect
+import contextvars
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, field
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+# USD per million (prompt, completion) tokens
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00)
+}
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+
+current_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("aiscribe_session", default=None)
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimate the USD cost of a completion from the model price table."""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+@contextmanager
+def session_scope(session_id: Optional[str]) -> Iterator[None]:
+    """Attribute every completion made inside the block to a session."""
+    token = current_session.set(session_id)
+    try:
+        yield
+    finally:
+        current_session.reset(token)
+
+@dataclass
+class CallRecord:
+    """Accounting for a single completion call."""
+
+    agent: str
+    stage: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency: float = 0.0
+    time_to_first_token: Optional[float] = None
+    cost: float = 0.0
+    cached: bool = False
+    error: Optional[str] = None
+    session_id: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+class Histogram:
+    """Latency histogram with fixed buckets plus a window of recent samples for percentiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window: int = 2048):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the q-th percentile (0-100) of the recent samples."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+class _Aggregate:
+    def __init__(self):
+        self.calls = 0
+        self.cached = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.latency = Histogram()
+        self.time_to_first_token = Histogram()
+        # Structured outputs: validated first time, validated after a retry, given up on
+        self.parsed = 0
+        self.parse_retried = 0
+        self.parse_fallbacks = 0
+        self.wasted_calls = 0
+        # Session context sent in question prompts, and the tokens compacting it saved
+        self.context_tokens = 0
+        self.context_tokens_saved = 0
+
+    def add(self, record: CallRecord):
+        self.calls += 1
+        self.cached += int(record.cached)
+        self.errors += int(record.error is not None)
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        self.cost += record.cost
+        self.latency.observe(record.latency)
+        if record.time_to_first_token is not None:
+            self.time_to_first_token.observe(record.time_to_first_token)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "cached": self.cached,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost, 6),
+            "p50": self.latency.percentile(50),
+            "p95": self.latency.percentile(95),
+            "p99": self.latency.percentile(99),
+            "ttft_p50": self.time_to_first_token.percentile(50),
+            "parse_retries": self.parse_retried,
+            "parse_fallbacks": self.parse_fallbacks,
+            "wasted_calls": self.wasted_calls,
+            "context_tokens": self.context_tokens,
+            "context_tokens_saved": self.context_tokens_saved
+        }
+
+    def add_output(self, attempts: int, parsed: bool):
+        if parsed:
+            self.parsed += int(attempts == 1)
+            self.parse_retried += int(attempts > 1)
+            self.wasted_calls += attempts - 1
+        else:
+            self.parse_fallbacks += 1
+            self.wasted_calls += attempts
+
+class MetricsRegistry:
+    """Process-wide per-call token, latency and cost accounting."""
+
+    def __init__(self, max_records: int = 10_000, max_sessions: int = 10_000):
+        self.records: Deque[CallRecord] = deque(maxlen=max_records)
+        self.max_sessions = max_sessions
+        self._stages: Dict[str, _Aggregate] = {}
+        self._sessions: "OrderedDict[str, Dict[str, _Aggregate]]" = OrderedDict()
+        # name -> (Prometheus type, callback reading the current value)
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, record: CallRecord):
+        """Add a call record to the process and session aggregates."""
+        if record.session_id is None:
+            record.session_id = current_session.get()
+        with self._lock:
+            self.records.append(record)
+            self._stages.setdefault(record.stage, _Aggregate()).add(record)
+            if record.session_id is not None:
+                stages = self._sessions.setdefault(record.session_id, {})
+                self._sessions.move_to_end(record.session_id)
+                stages.setdefault(record.stage, _Aggregate()).add(record)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+
+    def record_output(self, stage: str, attempts: int, parsed: bool):
+        """
+        Record how a structured output was obtained.
+
+        Args:
+            stage: Pipeline stage of the completion
+            attempts: Completions made for it, including retries after invalid output
+            parsed: Whether a valid output was obtained; the caller fell back otherwise
+        """
+        session_id = current_session.get()
+        with self._lock:
+            self._stages.setdefault(stage, _Aggregate()).add_output(attempts, parsed)
+            if session_id is not None and session_id in self._sessions:
+                self._sessions[session_id].setdefault(stage, _Aggregate()).add_output(attempts, parsed)
+
+    def record_context(self, stage: str, context_tokens: int, tokens_saved: int):
+        """
+        Record the size of a compacted session context sent in a prompt.
+
+        Args:
+            stage: Pipeline stage of the completion the context is sent with
+            context_tokens: Tokens of the compacted context
+            tokens_saved: Tokens saved against sending the whole session state
+        """
+        session_id = current_session.get()
+        with self._lock:
+            aggregates = [self._stages.setdefault(stage, _Aggregate())]
+            if session_id is not None and session_id in self._sessions:
+                aggregates.append(self._sessions[session_id].setdefault(stage, _Aggregate()))
+            for aggregate in aggregates:
+                aggregate.context_tokens += context_tokens
+                aggregate.context_tokens_saved += tokens_saved
+
+    def register_gauge(self, name: str, callback: Callable[[], float], metric_type: str = "gauge"):
+        """
+        Export a value read at scrape time, such as a queue depth.
+
+        Args:
+            name: Prometheus metric name; registering a name again replaces it
+            callback: Returns the current value
+            metric_type: Prometheus type, ``gauge`` or ``counter``
+        """
+        with self._lock:
+            self._gauges[name] = (metric_type, callback)
+
+    def stage_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Get per-stage call counts, tokens, cost and latency percentiles for the process."""
+        with self._lock:
+            return {stage: aggregate.summary() for stage, aggregate in self._stages.items()}
+
+    def session_summary(self, session_id: str) -> Dict[str, Dict[str, Any]]:
+        """Get per-stage call counts, tokens, cost and latency percentiles for one session."""
+        with self._lock:
+            stages = self._sessions.get(session_id, {})
+            return {stage: aggregate.summary() for stage, aggregate in stages.items()}
+
+    def latency_histogram(self, stage: str) -> Optional[Histogram]:
+        """Get the latency histogram of a stage, if it has any calls."""
+        aggregate = self._stages.get(stage)
+        return aggregate.latency if aggregate else None
+
+    def to_jsonl(self) -> str:
+        """Export the retained call records as JSON lines."""
+        with self._lock:
+            records = list(self.records)
+        return "".join(json.dumps(asdict(record)) + "\n" for record in records)
+
+    def to_prometheus(self) -> str:
+        """Export the process aggregates in the Prometheus text exposition format."""
+        lines = [
+            "# TYPE aiscribe_llm_latency_seconds histogram",
+        ]
+        with self._lock:
+            stages = list(self._stages.items())
+        for stage, aggregate in stages:
+            histogram = aggregate.latency
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'aiscribe_llm_latency_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'aiscribe_llm_latency_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'aiscribe_llm_latency_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'aiscribe_llm_latency_seconds_count{{stage="{stage}"}} {histogram.count}')
+        lines.append("# TYPE aiscribe_llm_tokens_total counter")
+        for stage, aggregate in stages:
+            lines.append(f'aiscribe_llm_tokens_total{{stage="{stage}",type="prompt"}} {aggregate.prompt_tokens}')
+            lines.append(f'aiscribe_llm_tokens_total{{stage="{stage}",type="completion"}} {aggregate.completion_tokens}')
+        lines.append("# TYPE aiscribe_llm_cost_usd_total counter")
+        for stage, aggregate in stages:
+            lines.append(f'aiscribe_llm_cost_usd_total{{stage="{stage}"}} {aggregate.cost}')
+        lines.append("# TYPE aiscribe_llm_calls_total counter")
+        for stage, aggregate in stages:
+            lines.append(f'aiscribe_llm_calls_total{{stage="{stage}",result="cached"}} {aggregate.cached}')
+            lines.append(f'aiscribe_llm_calls_total{{stage="{stage}",result="error"}} {aggregate.errors}')
+            lines.append(f'aiscribe_llm_calls_total{{stage="{stage}",result="completed"}} {aggregate.calls - aggregate.cached - aggregate.errors}')
+        lines.append("# TYPE aiscribe_structured_outputs_total counter")
+        for stage, aggregate in stages:
+            if aggregate.parsed or aggregate.parse_retried or aggregate.parse_fallbacks:
+                lines.append(f'aiscribe_structured_outputs_total{{stage="{stage}",result="parsed"}} {aggregate.parsed}')
+                lines.append(f'aiscribe_structured_outputs_total{{stage="{stage}",result="retried"}} {aggregate.parse_retried}')
+                lines.append(f'aiscribe_structured_outputs_total{{stage="{stage}",result="fallback"}} {aggregate.parse_fallbacks}')
+        lines.append("# TYPE aiscribe_llm_wasted_calls_total counter")
+        for stage, aggregate in stages:
+            lines.append(f'aiscribe_llm_wasted_calls_total{{stage="{stage}"}} {aggregate.wasted_calls}')
+        lines.append("# TYPE aiscribe_context_tokens_saved_total counter")
+        for stage, aggregate in stages:
+            if aggregate.context_tokens:
+                lines.append(f'aiscribe_context_tokens_saved_total{{stage="{stage}"}} {aggregate.context_tokens_saved}')
+        with self._lock:
+            gauges = list(self._gauges.items())
+        for name, (metric_type, callback) in gauges:
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.append(f"{name} {callback()}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Drop all records and aggregates; registered gauges keep reporting."""
+        with self._lock:
+            self.records.clear()
+            self._stages.clear()
+            self._sessions.clear()
+
+_metrics: Optional[MetricsRegistry] = None
+_metrics_lock = threading.Lock()
+
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide metrics registry, creating it on first use."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+        return _metrics
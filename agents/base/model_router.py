@@ -0,0 +1,201 @@
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from .metrics import MetricsRegistry
+
+DEFAULT_MODEL = "gpt-4o-mini"
+LOCAL_TIER = "local"
+
+# Stages with an in-process heuristic that can stand in for the model
+LOCAL_STAGES = {"response_analysis", "question_generation"}
+
+def _parse_pairs(spec: str) -> Dict[str, str]:
+    """Parse ``key=value,key=value`` into a dict, keeping the order."""
+    pairs = {}
+    for part in spec.split(","):
+        key, _, value = part.partition("=")
+        if key.strip() and value.strip():
+            pairs[key.strip()] = value.strip()
+    return pairs
+
+@dataclass
+class RoutingConfig:
+    """Model tiers and the tier each pipeline stage starts on."""
+
+    # Model tiers from cheapest to most capable; "local" always comes first
+    tiers: Dict[str, str] = field(default_factory=lambda: {"small": DEFAULT_MODEL, "large": "gpt-4o"})
+    stages: Dict[str, str] = field(default_factory=dict)
+    default_tier: str = "small"
+    local_stages: Set[str] = field(default_factory=lambda: set(LOCAL_STAGES))
+    adaptive: bool = True
+    latency_budgets: Dict[str, float] = field(default_factory=dict)
+    max_failure_rate: float = 0.2
+    min_samples: int = 50
+
+    @classmethod
+    def from_env(cls) -> "RoutingConfig":
+        """
+        Build a configuration from ``AISCRIBE_*`` environment variables.
+
+        ``AISCRIBE_MODEL_TIERS`` names the model tiers from cheapest to most
+        capable (``small=gpt-4o-mini,large=gpt-4o``), ``AISCRIBE_ROUTES`` the
+        starting tier per stage (``response_analysis=local,final_prompt=large``)
+        and ``AISCRIBE_DEFAULT_TIER`` the tier of every other stage.
+        ``AISCRIBE_LATENCY_BUDGETS`` sets a p90 latency per stage in seconds
+        above which the stage is demoted, ``AISCRIBE_MAX_PARSE_FAILURES`` the
+        failure rate above which it is promoted, and
+        ``AISCRIBE_ADAPTIVE_ROUTING=off`` keeps every stage on its tier.
+        """
+        config = cls()
+        tiers = _parse_pairs(os.getenv("AISCRIBE_MODEL_TIERS", ""))
+        if tiers:
+            config.tiers = tiers
+        config.stages = _parse_pairs(os.getenv("AISCRIBE_ROUTES", ""))
+        config.default_tier = os.getenv("AISCRIBE_DEFAULT_TIER", next(iter(config.tiers)))
+        config.latency_budgets = {
+            stage: float(budget) for stage, budget in _parse_pairs(os.getenv("AISCRIBE_LATENCY_BUDGETS", "")).items()
+        }
+        config.max_failure_rate = float(os.getenv("AISCRIBE_MAX_PARSE_FAILURES", cls.max_failure_rate))
+        config.adaptive = os.getenv("AISCRIBE_ADAPTIVE_ROUTING", "on").lower() not in ("0", "off", "false", "no")
+        return config
+
+class _StageRoute:
+    """Current tier of one stage and the outcomes observed on it."""
+
+    def __init__(self, tier: int, floor: int, window: int):
+        self.tier = tier
+        self.floor = floor
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.promotions = 0
+        self.demotions = 0
+
+    def failure_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def latency_p90(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(0.9 * len(ordered)), len(ordered) - 1)]
+
+    def move(self, tier: int):
+        self.tier = tier
+        self.latencies.clear()
+        self.outcomes.clear()
+
+class ModelRouter:
+    """
+    Picks the model tier each pipeline stage runs on.
+
+    Stages start on their configured tier. The ``local`` tier answers from an
+    in-process heuristic (the relevance engine, the question templates) for the
+    stages that have one, and means the cheapest model for the others. With
+    adaptive routing a stage is promoted one tier when too many of its outputs
+    fail to parse and demoted one tier when its p90 latency is over budget; a
+    stage is never demoted back onto a tier it was promoted off.
+    """
+
+    def __init__(self, config: Optional[RoutingConfig] = None):
+        self.config = config or RoutingConfig.from_env()
+        self.tiers: List[str] = [LOCAL_TIER] + [tier for tier in self.config.tiers if tier != LOCAL_TIER]
+        self._routes: Dict[str, _StageRoute] = {}
+        self._lock = threading.Lock()
+
+    def tier(self, stage: str) -> str:
+        """Get the tier a stage currently runs on."""
+        return self.tiers[self._route(stage).tier]
+
+    def is_local(self, stage: str) -> bool:
+        """Whether the stage should be answered by its in-process heuristic."""
+        return self._route(stage).tier == 0
+
+    def model_for(self, stage: str) -> str:
+        """Get the model for a stage's next call; local stages get the cheapest model."""
+        return self.config.tiers[self.tiers[max(self._route(stage).tier, 1)]]
+
+    def observe_latency(self, stage: str, model: str, latency: float):
+        """
+        Record the latency of a completed, uncached call.
+
+        Calls made on a model the stage has since moved off are ignored.
+        """
+        with self._lock:
+            route = self._route(stage)
+            if route.tier == 0 or self.config.tiers[self.tiers[route.tier]] != model:
+                return
+            route.latencies.append(latency)
+            self._adapt(stage, route)
+
+    def record_outcome(self, stage: str, ok: bool):
+        """
+        Record whether a stage's output was usable.
+
+        Model stages report whether the response parsed; local heuristics report
+        whether they were confident enough to answer on their own.
+        """
+        with self._lock:
+            route = self._route(stage)
+            route.outcomes.append(ok)
+            self._adapt(stage, route)
+
+    def _route(self, stage: str) -> _StageRoute:
+        route = self._routes.get(stage)
+        if route is None:
+            name = self.config.stages.get(stage, self.config.default_tier)
+            tier = self.tiers.index(name) if name in self.tiers else 1
+            floor = 0 if stage in self.config.local_stages else 1
+            route = self._routes.setdefault(
+                stage,
+                _StageRoute(max(tier, floor), floor, window=self.config.min_samples)
+            )
+        return route
+
+    def _adapt(self, stage: str, route: _StageRoute):
+        if not self.config.adaptive:
+            return
+        if len(route.outcomes) >= self.config.min_samples and route.failure_rate() > self.config.max_failure_rate:
+            if route.tier + 1 < len(self.tiers):
+                # Never come back down to the tier that kept failing
+                route.floor = route.tier + 1
+                route.promotions += 1
+                route.move(route.tier + 1)
+            return
+        budget = self.config.latency_budgets.get(stage)
+        if budget is None or len(route.latencies) < self.config.min_samples or route.tier <= route.floor:
+            return
+        if route.latency_p90() > budget:
+            route.demotions += 1
+            route.move(route.tier - 1)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get each stage's tier, model, failure rate, p90 latency and tier changes."""
+        with self._lock:
+            stats = {}
+            for stage, route in self._routes.items():
+                p90 = route.latency_p90()
+                stats[stage] = {
+                    "tier": self.tiers[route.tier],
+                    "model": None if route.tier == 0 else self.config.tiers[self.tiers[route.tier]],
+                    "failure_rate": route.failure_rate(),
+                    "latency_p90_ms": round(1000 * p90, 1) if p90 is not None else None,
+                    "promotions": route.promotions,
+                    "demotions": route.demotions
+                }
+            return stats
+
+    def register_metrics(self, metrics: MetricsRegistry):
+        """Expose how often stages changed tier in the metrics export."""
+        metrics.register_gauge(
+            "aiscribe_route_promotions_total",
+            lambda: sum(route.promotions for route in list(self._routes.values())),
+            metric_type="counter"
+        )
+        metrics.register_gauge(
+            "aiscribe_route_demotions_total",
+            lambda: sum(route.demotions for route in list(self._routes.values())),
+            metric_type="counter"
+        )
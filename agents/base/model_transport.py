@@ -0,0 +1,291 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from .rate_limiter import TokenBucket
+
+# Request fields that do not change what the model is asked
+_VOLATILE_FIELDS = ("user", "stream_options")
+
+def request_key(body: Dict[str, Any]) -> str:
+    """Identify a completion request by everything that affects its response."""
+    stable = {key: value for key, value in body.items() if key not in _VOLATILE_FIELDS}
+    return hashlib.sha256(json.dumps(stable, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _request_body(request: httpx.Request) -> Dict[str, Any]:
+    try:
+        return json.loads(request.content or b"{}")
+    except ValueError:
+        return {}
+
+class LatencyModel:
+    """Distribution of simulated completion latencies in seconds."""
+
+    def __init__(self, kind: str = "fixed", a: float = 0.0, b: float = 0.0, seed: Optional[int] = None):
+        """
+        Args:
+            kind: ``fixed`` (a), ``uniform`` (a to b) or ``lognormal`` (median a, sigma b)
+            a: First parameter of the distribution
+            b: Second parameter of the distribution
+            seed: Seed for reproducible samples
+        """
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.a = a
+        self.b = b
+        self.random = random.Random(seed)
+
+    @classmethod
+    def parse(cls, spec: str, seed: Optional[int] = None) -> "LatencyModel":
+        """Build a model from ``fixed:<s>``, ``uniform:<low>:<high>`` or ``lognormal:<median>:<sigma>``."""
+        if not spec:
+            return cls(seed=seed)
+        kind, *params = spec.split(":")
+        values = [float(param) for param in params] + [0.0, 0.0]
+        return cls(kind, values[0], values[1], seed=seed)
+
+    def sample(self) -> float:
+        if self.kind == "uniform":
+            return self.random.uniform(self.a, self.b)
+        if self.kind == "lognormal":
+            return self.random.lognormvariate(0.0, self.b) * self.a
+        return self.a
+
+def default_reply(body: Dict[str, Any]) -> str:
+    """Produce a plausible reply for each pipeline stage from its request messages."""
+    messages = body.get("messages", [])
+    system = messages[0].get("content", "") if messages else ""
+    user = messages[-1].get("content", "") if messages else ""
+    if "Analyze each of the following" in user:
+        count = int(user.split("following ", 1)[1].split(" ", 1)[0])
+        analyses = [dict(_ANALYSIS, index=index) for index in range(count)]
+        # Schema-constrained batches wrap the array in an object
+        return json.dumps({"analyses": analyses} if "response_format" in body else analyses)
+    if "ask the first question" in system:
+        return json.dumps({"analysis": _ANALYSIS, "initial_question": _QUESTION})
+    if "analyzing text-to-image prompts" in system:
+        return json.dumps(_ANALYSIS)
+    if "selecting relevant modules" in system:
+        return json.dumps({"active_modules": ["character", "setting", "atmosphere"]})
+    if "analyze user responses and generate" in system:
+        return json.dumps({"relevance": _RELEVANCE, "next_question": _QUESTION})
+    if "identify relevant modules" in system:
+        return json.dumps(_RELEVANCE)
+    if "contextual questions" in system:
+        return json.dumps(_QUESTION)
+    return "A lone red-cloaked girl walks a misty forest path at dawn, soft volumetric light, painterly style."
+
+_ANALYSIS = {
+    "keywords": ["girl", "red cloak", "forest"],
+    "categorized_elements": {
+        "Characters": ["girl"],
+        "Places": ["forest"],
+        "Actions/Processes": ["walking"],
+        "Emotions/Style": []
+    },
+    "atmosphere": "mysterious",
+    "missing_elements": ["lighting", "time of day"]
+}
+_RELEVANCE = {"character": 0.8, "setting": 0.4, "atmosphere": 0.2, "action": 0.1}
+_QUESTION = {
+    "question": "What time of day should the scene take place?",
+    "options": ["Dawn", "Midday", "Dusk", "Night"],
+    "examples": ["At dawn, with mist rising between the trees"],
+    "module": "setting",
+    "category": "time"
+}
+
+def _completion_response(body: Dict[str, Any], content: str) -> httpx.Response:
+    model = body.get("model", "stub")
+    prompt_tokens = sum(len(str(message.get("content", ""))) for message in body.get("messages", [])) // 4
+    completion_tokens = len(content) // 4
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+    if body.get("stream"):
+        events = []
+        for start in range(0, len(content), 16):
+            events.append({
+                "id": "stub", "object": "chat.completion.chunk", "created": 0, "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[start:start + 16]}, "finish_reason": None}]
+            })
+        events.append({"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": model, "choices": [], "usage": usage})
+        stream = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+        return httpx.Response(200, content=stream.encode("utf-8"), headers={"content-type": "text/event-stream"})
+    return httpx.Response(200, json={
+        "id": "stub", "object": "chat.completion", "created": 0, "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": usage
+    })
+
+def _error_response(status: int, retry_after: float) -> httpx.Response:
+    if status == 429:
+        return httpx.Response(
+            429,
+            headers={"retry-after": f"{retry_after:.3f}"},
+            json={"error": {"message": "Rate limit reached (injected)", "type": "requests", "code": "rate_limit_exceeded"}}
+        )
+    return httpx.Response(status, json={"error": {"message": "Server error (injected)", "type": "server_error"}})
+
+class StubTransport(httpx.AsyncBaseTransport):
+    """Answers completion requests locally after a simulated latency, without any network access."""
+
+    def __init__(
+        self,
+        latency: Optional[LatencyModel] = None,
+        reply: Callable[[Dict[str, Any]], str] = default_reply,
+        error_rate: float = 0.0,
+        retry_after: float = 0.5,
+        seed: Optional[int] = None,
+        requests_per_minute: float = 0.0
+    ):
+        """
+        Args:
+            latency: Distribution of the simulated response time
+            reply: Builds the completion text for a request body
+            error_rate: Fraction of completions answered with a 429, 500 or 503 error
+            retry_after: Seconds advertised in the ``retry-after`` header of injected 429 errors
+            seed: Seed for reproducible error injection
+            requests_per_minute: Provider-style request limit; requests over it get a 429
+                advertising when the next one would be accepted
+        """
+        self.latency = latency or LatencyModel()
+        self.reply = reply
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.limit = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if not request.url.path.endswith("/chat/completions"):
+            return httpx.Response(200, json={})
+        if self.limit is not None:
+            wait = self.limit.wait_time(1, time.monotonic())
+            if wait > 0:
+                self.rate_limited += 1
+                return _error_response(429, wait)
+            self.limit.take(1)
+        delay = self.latency.sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            return _error_response(self.random.choice((429, 500, 503)), self.retry_after)
+        body = _request_body(request)
+        return _completion_response(body, self.reply(body))
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Forwards requests and appends every completion exchange to a JSONL fixture file."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, path: str):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.inner.handle_async_request(request)
+        if not request.url.path.endswith("/chat/completions"):
+            return response
+        # Streams are recorded whole and replayed as one body
+        content = await response.aread()
+        await response.aclose()
+        body = _request_body(request)
+        fixture = {
+            "key": request_key(body),
+            "request": body,
+            "status": response.status_code,
+            "content_type": response.headers.get("content-type", "application/json"),
+            "body": content.decode("utf-8")
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(fixture, ensure_ascii=False) + "\n")
+        return httpx.Response(
+            response.status_code,
+            headers={"content-type": fixture["content_type"]},
+            content=content
+        )
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Answers completion requests from a fixture file written by RecordingTransport."""
+
+    def __init__(self, path: str, latency: Optional[LatencyModel] = None):
+        """
+        Args:
+            path: JSONL fixture file
+            latency: Optional simulated response time; replay is immediate by default
+        """
+        self.path = path
+        self.latency = latency
+        self.fixtures: Dict[str, List[Dict[str, Any]]] = {}
+        self._served: Dict[str, int] = {}
+        self.misses = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    fixture = json.loads(line)
+                    self.fixtures.setdefault(fixture["key"], []).append(fixture)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not request.url.path.endswith("/chat/completions"):
+            return httpx.Response(200, json={})
+        key = request_key(_request_body(request))
+        recorded = self.fixtures.get(key)
+        if not recorded:
+            self.misses += 1
+            # A client error, so the SDK fails fast instead of retrying
+            return httpx.Response(400, json={"error": {
+                "message": f"No recorded completion for request {key[:12]} in {self.path}",
+                "type": "fixture_missing"
+            }})
+        # Repeated identical requests replay their recordings in order
+        served = self._served.get(key, 0)
+        self._served[key] = served + 1
+        fixture = recorded[min(served, len(recorded) - 1)]
+        if self.latency is not None:
+            delay = self.latency.sample()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        return httpx.Response(
+            fixture["status"],
+            headers={"content-type": fixture["content_type"]},
+            content=fixture["body"].encode("utf-8")
+        )
+
+def transport_from_env(inner: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+    """
+    Wrap or replace the network transport as selected by ``AISCRIBE_TRANSPORT``.
+
+    ``record:<fixtures.jsonl>`` records live completions, ``replay:<fixtures.jsonl>``
+    serves them back, and ``stub`` answers locally. ``AISCRIBE_STUB_LATENCY``
+    (e.g. ``lognormal:0.8:0.4``) sets the simulated latency of stub and replay modes,
+    and ``AISCRIBE_STUB_ERROR_RATE`` the fraction of stub completions that fail.
+
+    Args:
+        inner: The network transport
+
+    Returns:
+        The transport the HTTP client should use
+    """
+    mode, _, path = os.getenv("AISCRIBE_TRANSPORT", "").partition(":")
+    latency = os.getenv("AISCRIBE_STUB_LATENCY", "")
+    if mode == "record":
+        return RecordingTransport(inner, path or "completions.jsonl")
+    if mode == "replay":
+        return ReplayTransport(path or "completions.jsonl", LatencyModel.parse(latency) if latency else None)
+    if mode == "stub":
+        return StubTransport(LatencyModel.parse(latency), error_rate=float(os.getenv("AISCRIBE_STUB_ERROR_RATE", "0")))
+    return inner
@@ -0,0 +1,368 @@
+import asyncio
+import email.utils
+import os
+import random
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import openai
+
+from .metrics import MetricsRegistry, current_session
+from ..utils.token_utils import count_message_tokens
+
+@dataclass
+class RateLimitConfig:
+    """Provider limits and adaptive concurrency settings for the shared rate limiter."""
+
+    requests_per_minute: float = 0.0
+    tokens_per_minute: float = 0.0
+    initial_concurrency: int = 32
+    min_concurrency: int = 1
+    max_concurrency: int = 256
+    latency_tolerance: float = 2.0
+    completion_estimate: int = 500
+    max_retries: int = 4
+    enabled: bool = True
+
+    @classmethod
+    def from_env(cls) -> "RateLimitConfig":
+        """
+        Build a configuration from ``AISCRIBE_*`` environment variables.
+
+        ``AISCRIBE_RPM`` and ``AISCRIBE_TPM`` are the provider limits (0 leaves
+        them unenforced), ``AISCRIBE_CONCURRENCY``, ``AISCRIBE_MIN_CONCURRENCY``
+        and ``AISCRIBE_MAX_CONCURRENCY`` bound the adaptive concurrency, and
+        ``AISCRIBE_RATE_LIMIT=off`` turns the limiter off.
+        """
+        return cls(
+            requests_per_minute=float(os.getenv("AISCRIBE_RPM", cls.requests_per_minute)),
+            tokens_per_minute=float(os.getenv("AISCRIBE_TPM", cls.tokens_per_minute)),
+            initial_concurrency=int(os.getenv("AISCRIBE_CONCURRENCY", cls.initial_concurrency)),
+            min_concurrency=int(os.getenv("AISCRIBE_MIN_CONCURRENCY", cls.min_concurrency)),
+            max_concurrency=int(os.getenv("AISCRIBE_MAX_CONCURRENCY", cls.max_concurrency)),
+            latency_tolerance=float(os.getenv("AISCRIBE_LATENCY_TOLERANCE", cls.latency_tolerance)),
+            max_retries=int(os.getenv("AISCRIBE_LLM_RETRIES", cls.max_retries)),
+            enabled=os.getenv("AISCRIBE_RATE_LIMIT", "on").lower() not in ("off", "0", "false")
+        )
+
+class TokenBucket:
+    """Refills at a steady per-minute rate up to a burst capacity."""
+
+    def __init__(self, per_minute: float, burst_seconds: float = 6.0):
+        """
+        Args:
+            per_minute: Sustained rate in units per minute
+            burst_seconds: Seconds of sustained rate that may be spent at once
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate * burst_seconds, 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` can be taken; requests beyond the capacity wait for a full bucket."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """Give back an over-estimate, or charge an under-estimate as debt."""
+        self.level = min(self.capacity, self.level + amount)
+
+class _LatencyTracker:
+    """Smoothed latency of one stage against its uncongested baseline."""
+
+    def __init__(self):
+        self.samples = 0
+        self.smoothed: Optional[float] = None
+        self.baseline: Optional[float] = None
+
+    def observe(self, latency: float, tolerance: float) -> bool:
+        """Add a sample and report whether the stage looks congested."""
+        self.samples += 1
+        self.smoothed = latency if self.smoothed is None else self.smoothed + 0.2 * (latency - self.smoothed)
+        if self.baseline is None or self.smoothed < self.baseline:
+            self.baseline = self.smoothed
+        else:
+            # Follow lasting shifts, e.g. a slower model, without mistaking them for congestion forever
+            self.baseline += 0.01 * (self.smoothed - self.baseline)
+        return self.samples >= 10 and self.smoothed > self.baseline * tolerance
+
+class Permit:
+    """A granted slot for one completion attempt."""
+
+    __slots__ = ("session", "stage", "tokens", "queued_at", "granted_at")
+
+    def __init__(self, session: str, stage: str, tokens: int):
+        self.session = session
+        self.stage = stage
+        self.tokens = tokens
+        self.queued_at = time.monotonic()
+        self.granted_at = self.queued_at
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Read the server's requested delay in seconds from an API error's headers."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            when = email.utils.parsedate_to_datetime(value)
+            return max(when.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def classify_error(error: Exception) -> Tuple[bool, bool]:
+    """
+    Decide how the limiter treats a failed attempt.
+
+    Returns:
+        Tuple of (retryable, throttled)
+    """
+    if isinstance(error, openai.RateLimitError):
+        # An exhausted quota does not recover by waiting
+        return getattr(error, "code", None) != "insufficient_quota", True
+    if isinstance(error, (openai.InternalServerError, openai.APIConnectionError)):
+        return True, False
+    return False, False
+
+class RateLimiter:
+    """
+    Shared gate for every completion attempt.
+
+    Attempts wait for a concurrency slot, a request token and their estimated
+    prompt and completion tokens. Concurrency adapts AIMD-style: it grows by
+    one slot per window of successful calls and is cut when the provider
+    throttles (429) or a stage's latency climbs well above its baseline.
+    A 429 pauses every caller for the ``retry-after`` the provider asks for.
+    Waiting attempts are served round-robin across sessions, so one busy
+    session cannot starve the others.
+    """
+
+    def __init__(self, config: Optional[RateLimitConfig] = None):
+        self.config = config or RateLimitConfig.from_env()
+        self.limit = float(self.config.initial_concurrency)
+        self.requests = TokenBucket(self.config.requests_per_minute) if self.config.requests_per_minute > 0 else None
+        self.tokens = TokenBucket(self.config.tokens_per_minute) if self.config.tokens_per_minute > 0 else None
+        self.in_flight = 0
+        # session -> waiting attempts, in round-robin order
+        self._queues: "OrderedDict[str, Deque[Tuple[asyncio.Future, Permit]]]" = OrderedDict()
+        self._latency: Dict[str, _LatencyTracker] = {}
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.granted = 0
+        self.throttled = 0
+        self.retries = 0
+        self.decreases = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of attempts waiting for a slot."""
+        return sum(
+            1 for queue in self._queues.values() for future, _ in queue if not future.done()
+        )
+
+    def estimate_tokens(self, messages: List[Dict[str, str]], model: str, max_tokens: Optional[int] = None) -> int:
+        """Estimate the tokens a completion will count against the TPM limit."""
+        if self.tokens is None:
+            return 0
+        return count_message_tokens(messages, model) + (max_tokens or self.config.completion_estimate)
+
+    async def acquire(self, tokens: int = 0, stage: str = "completion") -> Permit:
+        """
+        Wait for a slot to make one completion attempt.
+
+        Args:
+            tokens: Estimated tokens of the attempt
+            stage: Pipeline stage, used to track latency per stage
+
+        Returns:
+            The permit to pass to release() once the attempt finishes
+        """
+        permit = Permit(current_session.get() or "", stage, tokens)
+        if not self._queues and self._admit(permit, time.monotonic()) == 0.0:
+            return permit
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(permit.session, deque()).append((future, permit))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller gave up
+                self._finish(permit)
+            raise
+        return permit
+
+    def release(self, permit: Permit, used_tokens: Optional[int] = None):
+        """
+        Return a slot after a successful attempt and adapt the concurrency limit.
+
+        Args:
+            permit: The permit from acquire()
+            used_tokens: Tokens the provider reported, to correct the estimate
+        """
+        now = time.monotonic()
+        if self.tokens is not None and used_tokens is not None:
+            self.tokens.adjust(permit.tokens - used_tokens)
+        tracker = self._latency.setdefault(permit.stage, _LatencyTracker())
+        if tracker.observe(now - permit.granted_at, self.config.latency_tolerance):
+            self._decrease(now, 0.9)
+        else:
+            self.limit = min(float(self.config.max_concurrency), self.limit + 1.0 / self.limit)
+        self._finish(permit)
+
+    def release_error(self, permit: Permit, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Return a slot after a failed attempt and decide whether to retry it.
+
+        Args:
+            permit: The permit from acquire()
+            error: The exception the attempt raised
+            attempt: Number of attempts made so far, starting at 1
+
+        Returns:
+            Seconds to wait before retrying, or None if the error should be raised
+        """
+        retryable, throttled = classify_error(error)
+        now = time.monotonic()
+        delay = None
+        if throttled:
+            self.throttled += 1
+            self._decrease(now, 0.5)
+            if retryable:
+                # Every caller waits out the pause, not only this one
+                pause = retry_after(error)
+                if pause is None:
+                    pause = min(2.0 ** attempt, 30.0)
+                self._paused_until = max(self._paused_until, now + pause)
+                delay = 0.0
+        elif retryable:
+            delay = min(0.5 * 2 ** (attempt - 1), 8.0) * random.uniform(0.5, 1.0)
+        self._finish(permit)
+        if delay is None or attempt > self.config.max_retries:
+            return None
+        self.retries += 1
+        return delay
+
+    def abandon(self, permit: Permit):
+        """Return a slot whose attempt was cancelled, without adapting the limit."""
+        self._finish(permit)
+
+    def _finish(self, permit: Permit):
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _decrease(self, now: float, factor: float):
+        # Calls already in flight were admitted under the old limit; cut at most once per second
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        self.decreases += 1
+        self.limit = max(float(self.config.min_concurrency), self.limit * factor)
+
+    def _admit(self, permit: Permit, now: float) -> float:
+        """Grant the permit if possible; otherwise return how long to wait (inf: until a slot frees)."""
+        if self.in_flight >= int(self.limit):
+            return float("inf")
+        if now < self._paused_until:
+            return self._paused_until - now
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.wait_time(1, now)
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(permit.tokens, now))
+        if wait > 0:
+            return wait
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(permit.tokens)
+        self.in_flight += 1
+        self.granted += 1
+        permit.granted_at = now
+        waited = now - permit.queued_at
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return 0.0
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._queues:
+            session, queue = next(iter(self._queues.items()))
+            while queue and queue[0][0].done():
+                queue.popleft()
+            if not queue:
+                del self._queues[session]
+                continue
+            future, permit = queue[0]
+            delay = self._admit(permit, now)
+            if delay > 0:
+                if delay != float("inf"):
+                    self._schedule(delay)
+                return
+            queue.popleft()
+            future.set_result(None)
+            # Round-robin: the session goes to the back of the line
+            if queue:
+                self._queues.move_to_end(session)
+            else:
+                del self._queues[session]
+
+    def _schedule(self, delay: float):
+        loop = asyncio.get_running_loop()
+        when = loop.time() + delay
+        if self._timer is not None:
+            if self._timer.when() <= when:
+                return
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the current limit, queue depth and throttling counters."""
+        return {
+            "concurrency_limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "waiting_sessions": len(self._queues),
+            "granted": self.granted,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "limit_decreases": self.decreases,
+            "paused_for": max(self._paused_until - time.monotonic(), 0.0),
+            "avg_wait_ms": 1000 * self.total_wait / self.granted if self.granted else 0.0,
+            "max_wait_ms": 1000 * self.max_wait
+        }
+
+    def register_metrics(self, metrics: MetricsRegistry):
+        """Expose the queue depth, limit, in-flight count and throttling counters in the metrics export."""
+        metrics.register_gauge("aiscribe_ratelimit_queue_depth", lambda: self.queue_depth)
+        metrics.register_gauge("aiscribe_ratelimit_concurrency_limit", lambda: int(self.limit))
+        metrics.register_gauge("aiscribe_ratelimit_in_flight", lambda: self.in_flight)
+        metrics.register_gauge("aiscribe_ratelimit_throttled_total", lambda: self.throttled, metric_type="counter")
+        metrics.register_gauge("aiscribe_ratelimit_retries_total", lambda: self.retries, metric_type="counter")
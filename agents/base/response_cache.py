@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+class SQLiteCacheStore:
+    """On-disk cache tier shared by every worker process that points at the same file.
+
+    Expired rows are purged when the store opens and every ``PURGE_EVERY``
+    writes, which also trims the table to its newest ``max_rows`` rows.
+    """
+
+    # Writes between purges of expired and excess rows
+    PURGE_EVERY = 256
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_rows: Optional[int] = 100_000):
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+        self.purge()
+
+    def get(self, key: str, ttl: Optional[float]) -> Optional[Tuple[str, float]]:
+        """Return the stored value and its creation time, or None if missing or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        if ttl is not None and time.time() - row[1] > ttl:
+            return None
+        return row[0], row[1]
+
+    def set(self, key: str, value: str, created: float):
+        """Store a value under the given key."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+                (key, value, created)
+            )
+            self._writes += 1
+            purge = self._writes % self.PURGE_EVERY == 0
+        if purge:
+            self.purge()
+
+    def purge(self) -> int:
+        """Delete expired rows and the oldest rows beyond ``max_rows``; return how many were deleted."""
+        removed = 0
+        with self._lock:
+            if self.ttl is not None:
+                removed += self._conn.execute(
+                    "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)
+                ).rowcount
+            if self.max_rows is not None:
+                removed += self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,)
+                ).rowcount
+        return removed
+
+    def delete(self, key: str):
+        """Remove the value stored under the given key, if any."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self):
+        """Remove all stored values."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+class ResponseCache:
+    """Content-addressed cache of completion texts with an in-memory LRU and optional disk tier."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = 3600.0,
+        disk_path: Optional[str] = None,
+        disk_max_entries: Optional[int] = 100_000
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = SQLiteCacheStore(disk_path, ttl=ttl, max_rows=disk_max_entries) if disk_path else None
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """Build a cache from ``AISCRIBE_CACHE_*`` environment variables."""
+        ttl = float(os.getenv("AISCRIBE_CACHE_TTL", "3600"))
+        disk_max_entries = int(os.getenv("AISCRIBE_CACHE_DISK_SIZE", "100000"))
+        return cls(
+            max_entries=int(os.getenv("AISCRIBE_CACHE_SIZE", "1024")),
+            ttl=ttl if ttl > 0 else None,
+            disk_path=os.getenv("AISCRIBE_CACHE_PATH") or None,
+            disk_max_entries=disk_max_entries if disk_max_entries > 0 else None
+        )
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], **params: Any) -> str:
+        """Hash the model, messages and request parameters into a cache key."""
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached completion.
+
+        Args:
+            key: A key from ``make_key``
+
+        Returns:
+            The cached completion text, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[1]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+
+        if self.disk is not None:
+            stored = self.disk.get(key, self.ttl)
+            if stored is not None:
+                with self._lock:
+                    self._remember(key, stored[0], stored[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                return stored[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: str):
+        """Store a completion in memory and, when configured, on disk."""
+        created = time.time()
+        with self._lock:
+            self._remember(key, value, created)
+        if self.disk is not None:
+            self.disk.set(key, value, created)
+
+    def discard(self, key: str):
+        """Forget a completion that turned out to be unusable, in memory and on disk."""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def _remember(self, key: str, value: str, created: float):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached completions and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters for the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries)
+        }
@@ -0,0 +1,201 @@
+import contextvars
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Optional
+
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
+
+from .metrics import CallRecord, current_session
+
+_tracer = trace.get_tracer("aiscribe")
+
+_MAX_OPEN_SESSIONS = 10_000
+
+class _SpanTotals:
+    """Completion counts for one stage span, including its nested stage spans."""
+
+    __slots__ = ("calls", "cache_hits", "prompt_tokens", "completion_tokens", "cost")
+
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+    def add(self, record: CallRecord):
+        self.calls += 1
+        self.cache_hits += int(record.cached)
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        self.cost += record.cost
+
+    def merge(self, other: "_SpanTotals"):
+        self.calls += other.calls
+        self.cache_hits += other.cache_hits
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cost += other.cost
+
+    def apply(self, span: trace.Span):
+        span.set_attributes({
+            "aiscribe.llm.calls": self.calls,
+            "aiscribe.llm.cache_hits": self.cache_hits,
+            "aiscribe.llm.prompt_tokens": self.prompt_tokens,
+            "aiscribe.llm.completion_tokens": self.completion_tokens,
+            "aiscribe.llm.cost_usd": self.cost
+        })
+
+_active_totals: contextvars.ContextVar[Optional[_SpanTotals]] = contextvars.ContextVar("aiscribe_span_totals", default=None)
+_session_spans: "OrderedDict[str, trace.Span]" = OrderedDict()
+_session_lock = threading.Lock()
+
+def tracing_enabled() -> bool:
+    """Whether an OpenTelemetry SDK tracer provider has been installed."""
+    return not isinstance(trace.get_tracer_provider(), (trace.ProxyTracerProvider, trace.NoOpTracerProvider))
+
+def _parent_context() -> Optional[otel_context.Context]:
+    # Nest under the active span, or under the root span of the current session
+    if trace.get_current_span().get_span_context().is_valid:
+        return None
+    session_id = current_session.get()
+    if session_id is None:
+        return None
+    with _session_lock:
+        root = _session_spans.get(session_id)
+        if root is None:
+            root = _tracer.start_span("aiscribe.session", attributes={"aiscribe.session_id": session_id})
+            _session_spans[session_id] = root
+            while len(_session_spans) > _MAX_OPEN_SESSIONS:
+                _session_spans.popitem(last=False)[1].end()
+    return trace.set_span_in_context(root)
+
+def end_session_trace(session_id: Optional[str] = None):
+    """
+    End the root span of a session's trace.
+
+    Args:
+        session_id: The session to end; defaults to the current session
+    """
+    session_id = session_id or current_session.get()
+    if session_id is None:
+        return
+    with _session_lock:
+        root = _session_spans.pop(session_id, None)
+    if root is not None:
+        root.end()
+
+def recording_calls() -> bool:
+    """Whether completions made now would be added to a stage span."""
+    return _active_totals.get() is not None
+
+def record_call(record: CallRecord):
+    """Add a completion to the totals of the enclosing stage span, if one is recording."""
+    totals = _active_totals.get()
+    if totals is None:
+        return
+    totals.add(record)
+    trace.get_current_span().add_event("llm.completion", {
+        "aiscribe.stage": record.stage,
+        "aiscribe.agent": record.agent,
+        "aiscribe.model": record.model,
+        "aiscribe.llm.prompt_tokens": record.prompt_tokens,
+        "aiscribe.llm.completion_tokens": record.completion_tokens,
+        "aiscribe.llm.cached": record.cached,
+        "aiscribe.llm.latency": record.latency
+    })
+
+def set_span_attribute(key: str, value: Any):
+    """Set an attribute on the active span when it is recording."""
+    span = trace.get_current_span()
+    if span.is_recording():
+        span.set_attribute(key, value)
+
+def traced(name: str, ends_session: bool = False) -> Callable:
+    """
+    Run a coroutine method in a child span of the session trace.
+
+    When no SDK is configured the method's coroutine is returned untouched.
+
+    Args:
+        name: The span name
+        ends_session: Whether the session trace is complete once the method returns
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if not tracing_enabled():
+                return method(*args, **kwargs)
+            return _run_in_span(name, method(*args, **kwargs), ends_session)
+        return wrapper
+    return decorator
+
+def traced_stream(name: str, ends_session: bool = False) -> Callable:
+    """
+    Run an async generator method in a child span of the session trace.
+
+    When no SDK is configured the method's generator is returned untouched.
+
+    Args:
+        name: The span name
+        ends_session: Whether the session trace is complete once the generator finishes
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if not tracing_enabled():
+                return method(*args, **kwargs)
+            return _iterate_in_span(name, method(*args, **kwargs), ends_session)
+        return wrapper
+    return decorator
+
+async def _run_in_span(name: str, coro, ends_session: bool):
+    totals = _SpanTotals()
+    outer = _active_totals.get()
+    try:
+        with _tracer.start_as_current_span(name, context=_parent_context()) as span:
+            token = _active_totals.set(totals)
+            try:
+                return await coro
+            finally:
+                _active_totals.reset(token)
+                totals.apply(span)
+                if outer is not None:
+                    outer.merge(totals)
+    finally:
+        if ends_session:
+            end_session_trace()
+
+async def _iterate_in_span(name: str, iterator: AsyncIterator, ends_session: bool) -> AsyncIterator:
+    # Each step may run in a different task, so the span is attached per step
+    totals = _SpanTotals()
+    outer = _active_totals.get()
+    span = _tracer.start_span(name, context=_parent_context())
+    try:
+        while True:
+            context_token = otel_context.attach(trace.set_span_in_context(span))
+            totals_token = _active_totals.set(totals)
+            try:
+                item = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                _active_totals.reset(totals_token)
+                otel_context.detach(context_token)
+            yield item
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+        raise
+    finally:
+        await iterator.aclose()
+        totals.apply(span)
+        if outer is not None:
+            outer.merge(totals)
+        span.end()
+        if ends_session:
+            end_session_trace()
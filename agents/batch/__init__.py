@@ -0,0 +1,14 @@
+from .policies import AnswerPolicy, FirstOptionPolicy, RandomOptionPolicy, ScriptedPolicy, get_policy
+from .runner import BatchRunner, iter_items, parse_item, completed_ids
+
+__all__ = [
+    'AnswerPolicy',
+    'FirstOptionPolicy',
+    'RandomOptionPolicy',
+    'ScriptedPolicy',
+    'get_policy',
+    'BatchRunner',
+    'iter_items',
+    'parse_item',
+    'completed_ids'
+]
@@ -0,0 +1,102 @@
+import json
+import random
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Union
+
+# Answer for a question that offers neither options nor examples
+DEFAULT_ANSWER = "No preference"
+
+class AnswerPolicy(ABC):
+    """Chooses the answer to a question on behalf of a user in headless sessions."""
+
+    @abstractmethod
+    def choose(self, question: Dict[str, Any], prompt: str, session_id: str) -> str:
+        """
+        Pick the answer to a question.
+
+        Args:
+            question: The question dict with question, options and optional module
+            prompt: The initial prompt of the session
+            session_id: ID of the session, which keys any per-session state
+
+        Returns:
+            The answer text
+        """
+
+    def finish(self, session_id: str):
+        """
+        Forget any per-session state once a session has ended.
+
+        Args:
+            session_id: ID of the finished session
+        """
+
+class FirstOptionPolicy(AnswerPolicy):
+    """Always answers with the first option."""
+
+    def choose(self, question: Dict[str, Any], prompt: str, session_id: str) -> str:
+        candidates = question.get("options") or question.get("examples") or [DEFAULT_ANSWER]
+        return candidates[0]
+
+class RandomOptionPolicy(AnswerPolicy):
+    """Answers with a random option, reproducibly when seeded."""
+
+    def __init__(self, seed: Optional[int] = None):
+        self.random = random.Random(seed)
+
+    def choose(self, question: Dict[str, Any], prompt: str, session_id: str) -> str:
+        options = question.get("options") or []
+        if not options:
+            return FirstOptionPolicy().choose(question, prompt, session_id)
+        return self.random.choice(options)
+
+class ScriptedPolicy(AnswerPolicy):
+    """Answers from a script of answers per module, falling back to another policy."""
+
+    def __init__(self, answers: Dict[str, Union[str, List[str]]], fallback: Optional[AnswerPolicy] = None):
+        """
+        Args:
+            answers: Answer, or answers used in turn, for each module name
+            fallback: Policy for modules without a scripted answer
+        """
+        self.answers = {module: [value] if isinstance(value, str) else list(value) for module, value in answers.items()}
+        self.fallback = fallback or FirstOptionPolicy()
+        # session ID -> module -> answers given so far
+        self._turns: Dict[str, Dict[str, int]] = {}
+
+    def choose(self, question: Dict[str, Any], prompt: str, session_id: str) -> str:
+        module = question.get("module")
+        answers = self.answers.get(module)
+        if not answers:
+            return self.fallback.choose(question, prompt, session_id)
+        # Each session walks through the module's answers from the start
+        turns = self._turns.setdefault(session_id, {})
+        turn = turns.get(module, 0)
+        turns[module] = turn + 1
+        return answers[turn % len(answers)]
+
+    def finish(self, session_id: str):
+        self._turns.pop(session_id, None)
+        self.fallback.finish(session_id)
+
+def get_policy(spec: str) -> AnswerPolicy:
+    """
+    Build an answer policy from a command-line spec.
+
+    Args:
+        spec: ``first``, ``random``, ``random:<seed>`` or ``scripted:<path to JSON>``
+
+    Returns:
+        The answer policy
+    """
+    name, _, argument = spec.partition(":")
+    if name == "first":
+        return FirstOptionPolicy()
+    if name == "random":
+        return RandomOptionPolicy(int(argument) if argument else None)
+    if name == "scripted":
+        if not argument:
+            raise ValueError("scripted policy needs a JSON file of answers per module")
+        with open(argument, encoding="utf-8") as f:
+            return ScriptedPolicy(json.load(f))
+    raise ValueError(f"Unknown answer policy: {spec}")
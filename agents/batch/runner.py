@@ -0,0 +1,254 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+
+from ..base.metrics import get_metrics, session_scope
+from ..prompt.prompt_analysis_agent import PromptAnalysisAgent
+from ..module.module_suggestion_agent import ModuleSuggestionAgent
+from ..question.dynamic_question_agent import DynamicQuestionAgent
+from .policies import AnswerPolicy, FirstOptionPolicy
+
+MAX_QUESTIONS = 5
+
+def parse_item(line: str, line_number: int) -> Optional[Dict[str, str]]:
+    """
+    Parse one input line into an item with an id and a prompt.
+
+    Lines may be JSON objects with a ``prompt`` (and optional ``id``) or plain prompt text.
+
+    Args:
+        line: The raw input line
+        line_number: Position of the line, used in generated ids
+
+    Returns:
+        Dict with id and prompt, or None for blank lines
+
+    Raises:
+        ValueError: If a JSON line is malformed or has no prompt text
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Line {line_number} is not valid JSON: {e}") from None
+        prompt = record.get("prompt") if isinstance(record, dict) else None
+        if not isinstance(prompt, str) or not prompt.strip():
+            raise ValueError(f"Line {line_number} has no 'prompt' text")
+        item_id = record.get("id")
+    else:
+        prompt, item_id = line, None
+    if item_id is None:
+        item_id = f"{line_number}-{hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:12]}"
+    return {"id": str(item_id), "prompt": prompt}
+
+def completed_ids(path: str) -> Set[str]:
+    """Read the ids of sessions that already finished successfully in an output file."""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interruption
+                continue
+            if not record.get("error"):
+                done.add(record["id"])
+    return done
+
+def _compact_output(path: str) -> Set[str]:
+    """
+    Drop failed and truncated records from an output file before resuming.
+
+    Failed sessions and unparseable input lines are run again and write a new
+    record, so keeping the old ones would leave duplicates in the output.
+
+    Returns:
+        The ids of sessions that already finished successfully
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    compacted = f"{path}.compact"
+    with open(path, encoding="utf-8") as source, open(compacted, "w", encoding="utf-8") as target:
+        for line in source:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interruption
+                continue
+            if record.get("error"):
+                continue
+            done.add(record["id"])
+            target.write(line if line.endswith("\n") else line + "\n")
+    os.replace(compacted, path)
+    return done
+
+class BatchRunner:
+    """Runs the full analyze, suggest, question and final prompt pipeline headlessly for many prompts."""
+
+    def __init__(
+        self,
+        policy: Optional[AnswerPolicy] = None,
+        concurrency: int = 8,
+        max_questions: int = MAX_QUESTIONS,
+        use_cache: bool = True,
+        question_agent_options: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Args:
+            policy: Chooses the answer to each question
+            concurrency: Maximum number of sessions in flight
+            max_questions: Questions answered per session, including the initial one
+            use_cache: Whether the response cache may serve or store the model calls
+            question_agent_options: Extra keyword arguments for each DynamicQuestionAgent
+        """
+        self.policy = policy or FirstOptionPolicy()
+        self.concurrency = concurrency
+        self.max_questions = max_questions
+        self.use_cache = use_cache
+        self.question_agent_options = question_agent_options or {}
+        # Analysis and suggestion agents keep no per-session state
+        self.analyzer = PromptAnalysisAgent()
+        self.suggester = ModuleSuggestionAgent()
+        self.completed = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+    async def run_session(self, item: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Run one prompt through the whole pipeline, answering with the policy.
+
+        Args:
+            item: Dict with the id and prompt of the session
+
+        Returns:
+            The result record; failed sessions carry an ``error`` message
+        """
+        started = time.perf_counter()
+        prompt = item["prompt"]
+        record: Dict[str, Any] = {"id": item["id"], "prompt": prompt}
+        if "error" in item:
+            # An input line that could not be parsed is reported instead of run
+            return {**item, "elapsed": 0.0}
+        with session_scope(item["id"]):
+            try:
+                questioner = DynamicQuestionAgent(**self.question_agent_options)
+                analysis = await self.analyzer.analyze_prompt(prompt, use_cache=self.use_cache)
+                suggestions = await self.suggester.process_prompt_analysis_lazy(analysis, use_cache=self.use_cache)
+                session = await questioner.process_module_suggestions(suggestions, use_cache=self.use_cache)
+
+                turns = []
+                question = session["initial_question"]
+                while question:
+                    answer = self.policy.choose(question, prompt, item["id"])
+                    questioner.record_response(question, answer)
+                    turns.append({
+                        "question": question.get("question"),
+                        "module": question.get("module"),
+                        "category": question.get("category"),
+                        "answer": answer
+                    })
+                    if len(turns) >= self.max_questions:
+                        break
+                    question = await questioner.generate_next_question({
+                        "question": question,
+                        "response": answer,
+                        "initial_prompt": prompt
+                    }, use_cache=self.use_cache)
+
+                record.update({
+                    "active_modules": [
+                        module for module, status in suggestions.get("active_modules", {}).items()
+                        if status.get("active")
+                    ],
+                    "turns": turns,
+                    "final_prompt": await questioner.generate_final_prompt(use_cache=self.use_cache, initial_prompt=prompt)
+                })
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+            finally:
+                self.policy.finish(item["id"])
+        record["elapsed"] = round(time.perf_counter() - started, 3)
+        return record
+
+    async def run(self, items: Iterable[Dict[str, str]], output_path: str, resume: bool = True) -> Dict[str, Any]:
+        """
+        Run sessions for all items, appending each result to a JSONL file as it finishes.
+
+        Args:
+            items: Dicts with the id and prompt of each session
+            output_path: JSONL file the results are appended to; it doubles as the checkpoint
+            resume: Whether to skip items already completed in the output file; failed
+                records are dropped from it and their items run again
+
+        Returns:
+            The run summary from summary()
+        """
+        done = _compact_output(output_path) if resume else set()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        started = time.perf_counter()
+
+        with open(output_path, "a" if resume else "w", encoding="utf-8") as output:
+            async def worker():
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        return
+                    record = await self.run_session(item)
+                    output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    output.flush()
+                    if "error" in record:
+                        self.failed += 1
+                    else:
+                        self.completed += 1
+
+            workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+            try:
+                # Feed lazily so huge corpora are never held in memory
+                for item in items:
+                    if item["id"] in done:
+                        continue
+                    await queue.put(item)
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+                self.elapsed += time.perf_counter() - started
+
+        return self.summary()
+
+    def summary(self) -> Dict[str, Any]:
+        """Get session counts, throughput and per-stage latency of the run so far."""
+        sessions = self.completed + self.failed
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "sessions_per_second": round(sessions / self.elapsed, 3) if self.elapsed else 0.0,
+            "stages": get_metrics().stage_summary()
+        }
+
+def iter_items(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Parse input lines into items, skipping blank lines.
+
+    A line that cannot be parsed becomes an item with an ``error`` instead of a
+    prompt, so it is written to the output as a failed record and the run goes on.
+    """
+    for line_number, line in enumerate(lines, 1):
+        try:
+            item = parse_item(line, line_number)
+        except ValueError as e:
+            item = {"id": f"line-{line_number}", "prompt": None, "error": str(e)}
+        if item is not None:
+            yield item
@@ -1,4 +1,4 @@
-from .module_suggestion_agent import ModuleSuggestionAgent
+from .module_suggestion_agent import ModuleSuggestionAgent, LazySuggestions
 from .module_config import MODULES
 
-__all__ = ['ModuleSuggestionAgent', 'MODULES'] 
\ No newline at end of file
+__all__ = ['ModuleSuggestionAgent', 'LazySuggestions', 'MODULES'] 
\ No newline at end of file
@@ -1,13 +1,74 @@
-from typing import Dict
+from typing import Awaitable, Callable, Dict, Generator, Optional
+import asyncio
 import json
+import os
 from ..base.base_agent import BaseAgent
-from ..utils.json_utils import extract_json_from_text, create_error_response
+from ..base.tracing import traced
+from ..utils.json_utils import StructuredOutputError, create_error_response
+from ..utils.schemas import ModuleSuggestions
 from .module_config import MODULES
 
+class LazySuggestions:
+    """
+    Module suggestions that are only generated once someone awaits them.
+    
+    The question flow only needs the locally computed active modules, so the
+    suggestion completion stays off the session's critical path: it runs on
+    first ``await``, or in the background after ``warm()``.
+    """
+    
+    def __init__(self, generate: Callable[[], Awaitable[Dict]]):
+        """
+        Args:
+            generate: Produces the suggestions; called at most once
+        """
+        self._generate = generate
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def started(self) -> bool:
+        """Whether generation has been started."""
+        return self._task is not None
+    
+    def done(self) -> bool:
+        """Whether the suggestions are ready without waiting."""
+        return self._task is not None and self._task.done()
+    
+    def warm(self) -> "LazySuggestions":
+        """Start generating in the background; must be called from a running event loop."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._generate())
+            self._task.add_done_callback(_retrieve_failure)
+        return self
+    
+    async def get(self) -> Dict:
+        """Get the suggestions, generating them on first access."""
+        # Shielded so one caller giving up does not cancel them for everyone else
+        return await asyncio.shield(self.warm()._task)
+    
+    def cancel(self):
+        """Stop a generation nobody is going to read."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+    
+    def __await__(self) -> Generator[None, None, Dict]:
+        return self.get().__await__()
+
+def _retrieve_failure(task: asyncio.Task):
+    # Failures of warmed suggestions nobody awaits must not be reported as unretrieved
+    if not task.cancelled():
+        task.exception()
+
 class ModuleSuggestionAgent(BaseAgent):
     """Agent responsible for determining which modules should be active and generating appropriate suggestions."""
     
-    def __init__(self, name: str = "module_suggester", model_client=None, **kwargs):
+    def __init__(
+        self,
+        name: str = "module_suggester",
+        model_client=None,
+        warm_suggestions: Optional[bool] = None,
+        **kwargs
+    ):
         self._suggestion_system_message = """You are a specialized agent for selecting relevant modules 
         and generating suggestions for text-to-image prompts. Your task is to analyze the prompt analysis
         results and determine which modules should be active and what questions should be asked to improve
@@ -32,6 +93,11 @@ class ModuleSuggestionAgent(BaseAgent):
         # Store module configurations
         self.modules = MODULES
         
+        # Generate suggestions in the background instead of on first access
+        if warm_suggestions is None:
+            warm_suggestions = os.getenv("AISCRIBE_WARM_SUGGESTIONS", "0") == "1"
+        self.warm_suggestions = warm_suggestions
+        
     def determine_active_modules(self, analysis_result: Dict) -> Dict:
         """
         Determines which modules should be active based on the analysis results.
@@ -82,12 +148,13 @@ class ModuleSuggestionAgent(BaseAgent):
             
         return active_modules
     
-    async def generate_suggestions(self, analysis_result: Dict) -> Dict:
+    async def generate_suggestions(self, analysis_result: Dict, use_cache: bool = True) -> Dict:
         """
         Generates module-specific suggestions and questions based on the analysis results.
         
         Args:
             analysis_result: The analysis results from the PromptAnalysisAgent
+            use_cache: Whether the response cache may serve or store this call
             
         Returns:
             Dict containing suggestions and questions for each active module
@@ -97,53 +164,81 @@ class ModuleSuggestionAgent(BaseAgent):
 Analysis: {json.dumps(analysis_result, indent=2)}
 
 Please provide:
-1. List of active modules
-2. For each active module:
-   - Relevant questions based on missing elements
-   - Specific suggestions for improvement
-3. Additional modules that should be considered
+1. active_modules: List of active modules
+2. modules: For each active module:
+   - questions: Relevant questions based on missing elements
+   - suggestions: Specific suggestions for improvement
+3. additional_modules: Additional modules that should be considered
 
 Format the response as a JSON object."""
 
         # Get suggestions from the model
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": self._suggestion_system_message},
-                {"role": "user", "content": suggestion_prompt}
-            ]
-        )
-        
         try:
-            suggestion_text = response.choices[0].message.content
-            suggestions = extract_json_from_text(suggestion_text)
-            if suggestions:
-                return suggestions
-            return create_error_response(
-                "Could not parse JSON from response",
-                suggestion_text
+            suggestions = await self.llm.complete_structured(
+                messages=[
+                    {"role": "system", "content": self._suggestion_system_message},
+                    {"role": "user", "content": suggestion_prompt}
+                ],
+                response_model=ModuleSuggestions,
+                use_cache=use_cache,
+                stage="suggestions",
+                agent=self.name
             )
-        except Exception as e:
+        except StructuredOutputError as e:
             return create_error_response(
-                f"Error parsing suggestions: {str(e)}",
-                response.choices[0].message.content
+                "Could not parse JSON from response",
+                e.text
             )
+        return suggestions.to_dict()
     
-    async def process_prompt_analysis(self, analysis_result: Dict) -> Dict:
+    @traced("aiscribe.process_prompt_analysis")
+    async def process_prompt_analysis(self, analysis_result: Dict, use_cache: bool = True) -> Dict:
         """
         Main method to process the analysis results and generate a complete module suggestion response.
         
         Args:
             analysis_result: The analysis results from the PromptAnalysisAgent
+            use_cache: Whether the response cache may serve or store the suggestion call
             
         Returns:
             Dict containing active modules, suggestions, and questions
         """
+        result = await self.process_prompt_analysis_lazy(analysis_result, use_cache=use_cache, warm=False)
+        result["suggestions"] = await result["suggestions"]
+        return result
+    
+    @traced("aiscribe.process_prompt_analysis_lazy")
+    async def process_prompt_analysis_lazy(
+        self,
+        analysis_result: Dict,
+        use_cache: bool = True,
+        warm: Optional[bool] = None
+    ) -> Dict:
+        """
+        Process the analysis results without waiting for the model's suggestions.
+        
+        Active modules and standard questions are computed locally. The model's
+        suggestions are returned as a LazySuggestions handle that generates them
+        when first awaited, so starting a question session does not wait for them.
+        
+        Args:
+            analysis_result: The analysis results from the PromptAnalysisAgent
+            use_cache: Whether the response cache may serve or store the suggestion call
+            warm: Start generating the suggestions in the background right away;
+                defaults to the agent's warm_suggestions setting
+            
+        Returns:
+            Dict containing active modules, the suggestions handle, and questions
+        """
         # Determine which modules should be active
         active_modules = self.determine_active_modules(analysis_result)
         
-        # Generate suggestions based on the analysis
-        suggestions = await self.generate_suggestions(analysis_result)
+        # Generate suggestions based on the analysis once somebody asks for them
+        suggestions = LazySuggestions(lambda: self.generate_suggestions(analysis_result, use_cache=use_cache))
+        if warm is None:
+            warm = self.warm_suggestions
+        if warm:
+            suggestions.warm()
         
         # Combine results
         return {
@@ -1,3 +1,5 @@
 from .prompt_analysis_agent import PromptAnalysisAgent
+from .prompt_index import PromptReuseIndex, get_prompt_index, normalize_prompt
+from .analysis_batcher import AnalysisBatcher, get_analysis_batcher
 
-__all__ = ['PromptAnalysisAgent'] 
\ No newline at end of file
+__all__ = ['PromptAnalysisAgent', 'PromptReuseIndex', 'get_prompt_index', 'normalize_prompt', 'AnalysisBatcher', 'get_analysis_batcher']
\ No newline at end of file
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+
+from ..base.client_registry import get_registry
+from ..base.llm_client import LLMClient
+from ..utils.json_utils import iter_json_values
+from ..utils.schemas import PromptAnalysis, PromptAnalysisBatch, response_format
+from .analysis_prompts import batch_analysis_messages
+
+class AnalysisBatcher:
+    """Coalesces concurrent prompt analyses into one multi-prompt completion.
+
+    A prompt arriving when no other prompt has arrived within the last window
+    is not held back: it is analyzed on its own right away, and batching only
+    starts once prompts arrive close together.
+    """
+
+    def __init__(self, llm: LLMClient, window: float = 0.05, max_batch: int = 8):
+        """
+        Args:
+            llm: Completion transport used for the batched calls
+            window: Seconds to collect requests after the first one arrives
+            max_batch: Maximum number of prompts per completion; a full batch is sent immediately
+        """
+        self.llm = llm
+        self.window = window
+        self.max_batch = max_batch
+        self._waiting: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._last_arrival = float("-inf")
+        # Running batches, referenced so they are not garbage-collected mid-call
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.batched_items = 0
+        self.single_items = 0
+        self.failed_items = 0
+
+    @classmethod
+    def from_env(cls, llm: LLMClient) -> "AnalysisBatcher":
+        """Build a batcher from ``AISCRIBE_ANALYSIS_BATCH_WINDOW`` (seconds) and ``AISCRIBE_ANALYSIS_BATCH_SIZE``."""
+        return cls(
+            llm,
+            window=float(os.getenv("AISCRIBE_ANALYSIS_BATCH_WINDOW", "0.05")),
+            max_batch=int(os.getenv("AISCRIBE_ANALYSIS_BATCH_SIZE", "8"))
+        )
+
+    async def submit(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Queue a prompt for the next batched analysis and wait for its result.
+
+        Args:
+            prompt: The text-to-image prompt to analyze
+
+        Returns:
+            The analysis, or None if the prompt was not batched with others or its
+            part of the batch failed, in which case the caller analyzes it alone
+        """
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        idle = not self._waiting and now - self._last_arrival > self.window
+        self._last_arrival = now
+        if idle:
+            # Nothing arrived recently, so waiting out the window would most likely be for nothing
+            self.single_items += 1
+            return None
+        future = loop.create_future()
+        self._waiting.append((prompt, future))
+        if len(self._waiting) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._waiting = self._waiting, []
+        batch = [(prompt, future) for prompt, future in batch if not future.done()]
+        if len(batch) == 1:
+            # Nothing to share the call with; the plain per-prompt call is also cacheable
+            self.single_items += 1
+            batch[0][1].set_result(None)
+        elif batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        self.batches += 1
+        self.batched_items += len(batch)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(batch)
+        try:
+            text = await self.llm.complete(
+                messages=batch_analysis_messages([prompt for prompt, _ in batch]),
+                model=self.llm.router.model_for("analysis"),
+                use_cache=False,
+                stage="analysis_batch",
+                agent="analysis_batcher",
+                response_format=response_format(PromptAnalysisBatch)
+            )
+            results = _split_results(text, len(batch))
+            for result in results:
+                self.llm.router.record_outcome("analysis", result is not None)
+            if self.llm.metrics is not None:
+                self.llm.metrics.record_output("analysis_batch", 1, any(result is not None for result in results))
+        except Exception:
+            # Every item falls back to its own call
+            pass
+        finally:
+            # Also runs on cancellation, so no caller is left waiting forever
+            for (_, future), result in zip(batch, results):
+                if result is None:
+                    self.failed_items += 1
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get batch counts, the average batch fill ratio and per-item fallbacks."""
+        return {
+            "batches": self.batches,
+            "batched_items": self.batched_items,
+            "single_items": self.single_items,
+            "failed_items": self.failed_items,
+            "calls_saved": self.batched_items - self.batches - self.failed_items,
+            "fill_ratio": self.batched_items / (self.batches * self.max_batch) if self.batches else 0.0
+        }
+
+def _split_results(text: str, count: int) -> List[Optional[Dict[str, Any]]]:
+    # Take the first JSON array, or an object wrapping one
+    results: List[Optional[Dict[str, Any]]] = [None] * count
+    items = None
+    for value in iter_json_values(text):
+        if isinstance(value, dict):
+            value = next((item for item in value.values() if isinstance(item, list)), None)
+        if isinstance(value, list):
+            items = value
+            break
+    if items is None:
+        return results
+
+    indexed = all(isinstance(item, dict) and isinstance(item.get("index"), int) for item in items)
+    if not indexed and len(items) != count:
+        # Without indices the order is the only link, and it is ambiguous
+        return results
+    for position, item in enumerate(items):
+        if not isinstance(item, dict) or not item or "error" in item:
+            continue
+        index = item["index"] if indexed else position
+        if 0 <= index < count and results[index] is None:
+            try:
+                results[index] = PromptAnalysis.model_validate(item).to_dict()
+            except ValidationError:
+                continue
+    return results
+
+_batcher: Optional[AnalysisBatcher] = None
+_batcher_lock = threading.Lock()
+
+def get_analysis_batcher() -> Optional[AnalysisBatcher]:
+    """
+    Return the process-wide analysis batcher when batching is enabled.
+
+    Batching is enabled by setting ``AISCRIBE_ANALYSIS_BATCH_WINDOW`` to a positive number of seconds.
+    """
+    global _batcher
+    if float(os.getenv("AISCRIBE_ANALYSIS_BATCH_WINDOW", "0")) <= 0:
+        return None
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = AnalysisBatcher.from_env(get_registry().get_llm())
+        return _batcher
@@ -0,0 +1,79 @@
+from typing import Dict, List
+
+ANALYSIS_SYSTEM_MESSAGE = """You are a specialized agent for analyzing text-to-image prompts.
+        Your task is to break down prompts into structured components and identify key elements
+        that make a prompt effective or areas where it could be improved.
+        
+        You analyze:
+        1. Keywords and phrases
+        2. Categories (Character, Place, Action, Emotion/Style)
+        3. Grammatical structure
+        4. Overall atmosphere
+        5. Missing or insufficient elements
+        
+        Provide your analysis in a clear, structured format."""
+
+ANALYSIS_CONTENTS = """1. Extracted keywords and phrases
+2. Categorized elements:
+   - Characters
+   - Places
+   - Actions/Processes
+   - Emotions/Style
+3. Overall atmosphere/tone
+4. Missing or insufficient elements
+5. Suggestions for improvement"""
+
+def analysis_messages(prompt: str) -> List[Dict[str, str]]:
+    """Build the messages that ask for the analysis of one prompt."""
+    analysis_prompt = f"""Analyze the following text-to-image prompt and break it down into its components:
+
+Prompt: "{prompt}"
+
+Please provide a detailed analysis including:
+{ANALYSIS_CONTENTS}
+
+Format the response as a JSON object."""
+    return [
+        {"role": "system", "content": ANALYSIS_SYSTEM_MESSAGE},
+        {"role": "user", "content": analysis_prompt}
+    ]
+
+def fast_start_messages(prompt: str) -> List[Dict[str, str]]:
+    """Build the messages that ask for the analysis of a prompt and the first question about it."""
+    fast_start_prompt = f"""Analyze the following text-to-image prompt and break it down into its components:
+
+Prompt: "{prompt}"
+
+Provide:
+- analysis: A detailed analysis including:
+{ANALYSIS_CONTENTS}
+- initial_question: The first question to ask the user to improve the prompt, with
+  - question: The question text
+  - options: List of 3-4 possible answers
+  - examples: List of example responses
+  - module: The module it relates to: character, setting, atmosphere or action,
+    preferring one whose elements the prompt already mentions
+  - category: The specific category within the module
+
+Format the response as a JSON object."""
+    return [
+        {"role": "system", "content": ANALYSIS_SYSTEM_MESSAGE + "\n\nYou also ask the first question that starts refining the prompt."},
+        {"role": "user", "content": fast_start_prompt}
+    ]
+
+def batch_analysis_messages(prompts: List[str]) -> List[Dict[str, str]]:
+    """Build the messages that ask for the analyses of several prompts in one completion."""
+    numbered = "\n".join(f'{index}. "{prompt}"' for index, prompt in enumerate(prompts))
+    analysis_prompt = f"""Analyze each of the following {len(prompts)} text-to-image prompts independently and break each one down into its components:
+
+{numbered}
+
+For every prompt, provide a detailed analysis including:
+{ANALYSIS_CONTENTS}
+
+Format the response as a JSON object whose "analyses" array holds exactly one analysis per prompt, in the same order.
+Each analysis must include an "index" field with the number of the prompt it analyzes."""
+    return [
+        {"role": "system", "content": ANALYSIS_SYSTEM_MESSAGE},
+        {"role": "user", "content": analysis_prompt}
+    ]
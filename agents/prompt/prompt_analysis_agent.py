@@ -1,23 +1,28 @@
-from typing import Dict
+from typing import Dict, Optional
+import copy
+import openai
 from ..base.base_agent import BaseAgent
-from ..utils.json_utils import extract_json_from_text, create_error_response
+from ..base.latency_policy import DeadlineExceeded
+from ..base.tracing import set_span_attribute, traced
+from ..utils.json_utils import StructuredOutputError, create_error_response
+from ..utils.schemas import PromptAnalysis
+from ..question.relevance_engine import get_relevance_engine
+from .prompt_index import PromptReuseIndex, get_prompt_index
+from .analysis_prompts import ANALYSIS_SYSTEM_MESSAGE, analysis_messages
+from .analysis_batcher import AnalysisBatcher, get_analysis_batcher
 
 class PromptAnalysisAgent(BaseAgent):
     """Agent responsible for analyzing text-to-image prompts and extracting structured information."""
     
-    def __init__(self, name: str = "prompt_analyzer", model_client=None, **kwargs):
-        self._analysis_system_message = """You are a specialized agent for analyzing text-to-image prompts.
-        Your task is to break down prompts into structured components and identify key elements
-        that make a prompt effective or areas where it could be improved.
-        
-        You analyze:
-        1. Keywords and phrases
-        2. Categories (Character, Place, Action, Emotion/Style)
-        3. Grammatical structure
-        4. Overall atmosphere
-        5. Missing or insufficient elements
-        
-        Provide your analysis in a clear, structured format."""
+    def __init__(
+        self,
+        name: str = "prompt_analyzer",
+        model_client=None,
+        reuse_index: Optional[PromptReuseIndex] = None,
+        batcher: Optional[AnalysisBatcher] = None,
+        **kwargs
+    ):
+        self._analysis_system_message = ANALYSIS_SYSTEM_MESSAGE
         
         super().__init__(
             name=name,
@@ -25,55 +30,60 @@ class PromptAnalysisAgent(BaseAgent):
             model_client=model_client,
             **kwargs
         )
+        
+        # Near-duplicate index of prior analyses, shared process-wide by default
+        self.reuse_index = reuse_index or get_prompt_index()
+        
+        # Coalesces concurrent analyses into one call when batching is enabled
+        self.batcher = batcher or get_analysis_batcher()
     
-    async def analyze_prompt(self, prompt: str) -> Dict:
+    @traced("aiscribe.analyze_prompt")
+    async def analyze_prompt(self, prompt: str, use_cache: bool = True) -> Dict:
         """
         Analyzes the given prompt and returns structured information.
         
         Args:
             prompt: The text-to-image prompt to analyze
+            use_cache: Whether cached or near-duplicate analyses may be reused
             
         Returns:
-            Dict containing the analysis results
+            Dict containing the analysis results; a local analysis of the recognized
+            words if the model missed the stage's deadline or the API call failed
         """
-        analysis_prompt = f"""Analyze the following text-to-image prompt and break it down into its components:
-
-Prompt: "{prompt}"
-
-Please provide a detailed analysis including:
-1. Extracted keywords and phrases
-2. Categorized elements:
-   - Characters
-   - Places
-   - Actions/Processes
-   - Emotions/Style
-3. Overall atmosphere/tone
-4. Missing or insufficient elements
-5. Suggestions for improvement
-
-Format the response as a JSON object."""
-
-        # Create a completion using OpenAI directly
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": self._analysis_system_message},
-                {"role": "user", "content": analysis_prompt}
-            ]
-        )
+        # Reuse the analysis of a near-identical prompt when one exists
+        if use_cache:
+            reused = self.reuse_index.lookup(prompt)
+            set_span_attribute("aiscribe.reuse_hit", reused is not None)
+            if reused is not None:
+                return copy.deepcopy(reused)
         
-        try:
-            # Extract the JSON from the response
-            analysis_text = response.choices[0].message.content
-            analysis_json = extract_json_from_text(analysis_text)
-            if analysis_json:
+        # Share one completion with other prompts arriving at the same time
+        if self.batcher is not None:
+            analysis_json = await self.batcher.submit(prompt)
+            set_span_attribute("aiscribe.batched", analysis_json is not None)
+            if analysis_json is not None:
+                self.reuse_index.add(prompt, copy.deepcopy(analysis_json))
                 return analysis_json
+        
+        # Create a schema-constrained completion without blocking the event loop
+        try:
+            analysis = await self.llm.complete_structured(
+                messages=analysis_messages(prompt),
+                response_model=PromptAnalysis,
+                use_cache=use_cache,
+                stage="analysis",
+                agent=self.name
+            )
+        except StructuredOutputError as e:
             return create_error_response(
                 "Could not parse JSON from response",
-                analysis_text
+                e.text
             )
-        except Exception as e:
-            return create_error_response(
-                f"Error parsing analysis: {str(e)}",
-                response.choices[0].message.content
-            ) 
\ No newline at end of file
+        except (DeadlineExceeded, openai.APIError):
+            # Not added to the reuse index, so the next similar prompt asks the model again
+            set_span_attribute("aiscribe.local_fallback", True)
+            return get_relevance_engine().local_analysis(prompt)
+        
+        analysis_json = analysis.to_dict()
+        self.reuse_index.add(prompt, copy.deepcopy(analysis_json))
+        return analysis_json
@@ -0,0 +1,169 @@
+import os
+import re
+import struct
+import threading
+import hashlib
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+_STOPWORDS = frozenset({
+    "a", "an", "the", "of", "in", "on", "at", "to", "into", "through", "with",
+    "and", "or", "by", "for", "from", "is", "are", "while", "its", "his", "her"
+})
+_SUFFIXES = ("ing", "ed", "es", "s")
+
+# Mersenne prime used for the universal hash family
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase a prompt and collapse its punctuation and whitespace."""
+    text = _PUNCTUATION.sub(" ", prompt.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+def _stem(token: str) -> str:
+    for suffix in _SUFFIXES:
+        if len(token) > len(suffix) + 2 and token.endswith(suffix):
+            return token[:-len(suffix)]
+    return token
+
+def prompt_shingles(prompt: str) -> FrozenSet[str]:
+    """Reduce a prompt to the set of stemmed content words used for similarity."""
+    tokens = [_stem(token) for token in normalize_prompt(prompt).split() if token not in _STOPWORDS]
+    return frozenset(tokens)
+
+def _token_hash(token: str) -> int:
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest()
+    return struct.unpack("<I", digest)[0]
+
+class PromptReuseIndex:
+    """MinHash/LSH index that finds previously analyzed prompts similar to a new one."""
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 32,
+        bands: int = 8,
+        max_entries: int = 500_000
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+
+        # Deterministic permutation parameters so signatures are stable across processes
+        seed = hashlib.sha256(b"aiscribe-minhash").digest()
+        self._perms: List[Tuple[int, int]] = []
+        for i in range(num_perm):
+            block = hashlib.sha256(seed + i.to_bytes(4, "little")).digest()
+            a = int.from_bytes(block[:8], "little") % (_PRIME - 1) + 1
+            b = int.from_bytes(block[8:16], "little") % _PRIME
+            self._perms.append((a, b))
+
+        self._entries: "OrderedDict[str, Tuple[FrozenSet[str], List[Tuple], Dict[str, Any]]]" = OrderedDict()
+        self._buckets: List[Dict[Tuple, Set[str]]] = [defaultdict(set) for _ in range(bands)]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "PromptReuseIndex":
+        """Build an index using ``AISCRIBE_PROMPT_SIMILARITY`` as the threshold."""
+        return cls(threshold=float(os.getenv("AISCRIBE_PROMPT_SIMILARITY", "0.8")))
+
+    def _band_keys(self, shingles: FrozenSet[str]) -> List[Tuple]:
+        hashes = [_token_hash(token) for token in shingles] or [0]
+        signature = [
+            min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH
+            for a, b in self._perms
+        ]
+        return [
+            tuple(signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+    def lookup(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Find the stored analysis of the most similar prior prompt.
+
+        Args:
+            prompt: The prompt about to be analyzed
+
+        Returns:
+            The stored analysis if a prompt above the similarity threshold exists, else None
+        """
+        key = normalize_prompt(prompt)
+        shingles = prompt_shingles(prompt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[2]
+
+            band_keys = self._band_keys(shingles)
+            candidates: Set[str] = set()
+            for band, band_key in enumerate(band_keys):
+                candidates.update(self._buckets[band].get(band_key, ()))
+
+            best, best_score = None, self.threshold
+            for candidate in candidates:
+                stored = self._entries[candidate][0]
+                union = len(shingles | stored)
+                score = len(shingles & stored) / union if union else 0.0
+                if score >= best_score:
+                    best, best_score = candidate, score
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._entries[best][2]
+
+    def add(self, prompt: str, analysis: Dict[str, Any]):
+        """Store an analysis so that similar prompts can reuse it."""
+        key = normalize_prompt(prompt)
+        shingles = prompt_shingles(prompt)
+        band_keys = self._band_keys(shingles)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (shingles, band_keys, analysis)
+            for band, band_key in enumerate(band_keys):
+                self._buckets[band][band_key].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        _, band_keys, _ = self._entries.pop(key)
+        for band, band_key in enumerate(band_keys):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get reuse counters for the index."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+_index: Optional[PromptReuseIndex] = None
+_index_lock = threading.Lock()
+
+def get_prompt_index() -> PromptReuseIndex:
+    """Return the process-wide prompt reuse index, creating it on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PromptReuseIndex.from_env()
+        return _index
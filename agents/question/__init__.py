@@ -1,13 +1,27 @@
-from .dynamic_question_agent import DynamicQuestionAgent
+from .dynamic_question_agent import DynamicQuestionAgent, PersonalizedStart
 from .question_generator import QuestionGenerator
 from .response_analyzer import ResponseAnalyzer
 from .session_manager import QuestionSession
 from .question_templates import QUESTION_TEMPLATES
+from .prefetcher import QuestionPrefetcher
+from .context_builder import ContextBuilder
+from .session_store import SessionStore, MemorySessionStore, SQLiteSessionStore, create_session_store
+from .relevance_engine import RelevanceEngine, LearnedTerms, get_relevance_engine
 
 __all__ = [
     'DynamicQuestionAgent',
+    'PersonalizedStart',
     'QuestionGenerator',
     'ResponseAnalyzer',
     'QuestionSession',
-    'QUESTION_TEMPLATES'
+    'QUESTION_TEMPLATES',
+    'QuestionPrefetcher',
+    'RelevanceEngine',
+    'LearnedTerms',
+    'get_relevance_engine',
+    'ContextBuilder',
+    'SessionStore',
+    'MemorySessionStore',
+    'SQLiteSessionStore',
+    'create_session_store'
 ] 
\ No newline at end of file
@@ -0,0 +1,100 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.token_utils import count_tokens
+
+class ContextBuilder:
+    """Serializes a question session compactly and within a token budget for question prompts."""
+
+    def __init__(self, token_budget: Optional[int] = None, recent_turns: Optional[int] = None, model: str = "gpt-4o-mini"):
+        """
+        Args:
+            token_budget: Most tokens the context may take; ``AISCRIBE_CONTEXT_TOKENS`` (800) by default
+            recent_turns: Turns kept in full before older ones are summarized;
+                ``AISCRIBE_CONTEXT_TURNS`` (3) by default
+            model: Model whose tokenizer counts the tokens
+        """
+        self.token_budget = token_budget if token_budget is not None else int(os.getenv("AISCRIBE_CONTEXT_TOKENS", 800))
+        self.recent_turns = recent_turns if recent_turns is not None else int(os.getenv("AISCRIBE_CONTEXT_TURNS", 3))
+        self.model = model
+
+    def build(self, context: Dict[str, Any]) -> Tuple[str, Dict[str, int]]:
+        """
+        Build the compact context text for a session.
+
+        Full question dicts are reduced to question, module, category and answer,
+        the duplicate ``responses`` map is dropped, and older turns are folded into
+        one-line summaries. If the result is still over budget, fewer turns are kept
+        in full and the oldest summaries are dropped.
+
+        Args:
+            context: The session state from QuestionSession.get_session_state()
+
+        Returns:
+            Tuple of (compact JSON text describing the session, stats); the stats hold
+            the context's tokens, an estimate of the tokens the whole session state
+            would take and the difference, and the turns kept in full and dropped
+        """
+        history = context.get("question_history", [])
+        recent = min(self.recent_turns, len(history))
+        dropped = 0
+        while True:
+            compact = self._serialize(context, history, recent, dropped)
+            tokens = count_tokens(compact, self.model)
+            if tokens <= self.token_budget:
+                break
+            if recent > 1:
+                recent -= 1
+            elif dropped < len(history) - recent:
+                dropped += 1
+            else:
+                break
+
+        # Scale by the characters per token just measured rather than tokenizing the whole state again
+        full = round(len(json.dumps(context, ensure_ascii=False)) * tokens / max(len(compact), 1))
+        return compact, {
+            "context_tokens": tokens,
+            "full_context_tokens": full,
+            "tokens_saved": max(full - tokens, 0),
+            "turns_in_full": recent,
+            "turns_dropped": dropped
+        }
+
+    def _serialize(self, context: Dict[str, Any], history: List[Dict[str, Any]], recent: int, dropped: int) -> str:
+        active_modules = {}
+        for module, status in context.get("active_modules", {}).items():
+            if status.get("active"):
+                active_modules[module] = status.get("existing_elements", [])
+
+        progress = {
+            module: f"{status['completed']}/{status['total']}"
+            for module, status in context.get("progress", {}).items()
+        }
+
+        older = history[dropped:len(history) - recent]
+        compact: Dict[str, Any] = {
+            "active_modules": active_modules,
+            "progress": progress
+        }
+        if older:
+            compact["earlier_answers"] = [self._summarize(turn) for turn in older]
+        if recent:
+            compact["recent_turns"] = [self._turn(turn) for turn in history[len(history) - recent:]]
+        return json.dumps(compact, separators=(",", ":"), ensure_ascii=False)
+
+    @staticmethod
+    def _turn(turn: Dict[str, Any]) -> Dict[str, Any]:
+        question = turn.get("question", {})
+        entry = {"q": question.get("question"), "a": turn.get("response")}
+        if question.get("module"):
+            entry["module"] = question["module"]
+        if question.get("category"):
+            entry["category"] = question["category"]
+        return entry
+
+    @staticmethod
+    def _summarize(turn: Dict[str, Any]) -> str:
+        question = turn.get("question", {})
+        topic = "/".join(part for part in (question.get("module"), question.get("category")) if part)
+        return f"{topic or question.get('question', '')}: {turn.get('response')}"
@@ -1,14 +1,94 @@
-from typing import Dict, Optional
+import asyncio
+import openai
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 from ..base.base_agent import BaseAgent
+from ..base.latency_policy import DeadlineExceeded
+from ..base.tracing import set_span_attribute, traced, traced_stream
 from .session_manager import QuestionSession
 from .response_analyzer import ResponseAnalyzer
 from .question_generator import QuestionGenerator
+from .context_builder import ContextBuilder
+from .prefetcher import QuestionPrefetcher
+from .relevance_engine import get_relevance_engine
+from ..utils.json_utils import create_error_response
+from ..utils.streaming_json import JSONEvent
 import json
+import time
+
+class PersonalizedStart:
+    """
+    The personalized first question of a session that started on a template question.
+    
+    The model's analysis and question are generated in a background task. Once
+    they are ready, ``apply`` swaps them into the session, but only while the
+    user has not answered the template question yet.
+    """
+    
+    def __init__(self, task: "asyncio.Future[Optional[Dict[str, Any]]]", adopt: Callable[[Dict[str, Any]], Optional[Dict]]):
+        """
+        Args:
+            task: Produces the model's analysis, module suggestions and initial question, or None
+            adopt: Re-initializes the session from that result and returns its question,
+                or returns None if the session has moved on
+        """
+        self._task = task
+        self._adopt = adopt
+        self._task.add_done_callback(_retrieve_failure)
+        self.applied = False
+    
+    def done(self) -> bool:
+        """Whether the personalized question is ready, or has failed, without waiting."""
+        return self._task.done()
+    
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the personalized question without cancelling it on timeout.
+        
+        Returns:
+            Whether it is ready
+        """
+        # Failures are reported by apply returning None rather than raised here
+        await asyncio.wait({self._task}, timeout=timeout)
+        return self._task.done()
+    
+    def apply(self) -> Optional[Dict]:
+        """
+        Swap the personalized question into the session if nothing was answered yet.
+        
+        Returns:
+            The personalized question to show instead of the template one, or None
+            if it is not ready, failed, was already applied or came too late
+        """
+        if self.applied or not self._task.done() or self._task.cancelled() or self._task.exception() is not None:
+            return None
+        result = self._task.result()
+        question = self._adopt(result) if result is not None else None
+        self.applied = question is not None
+        return question
+    
+    def cancel(self):
+        """Stop generating a question nobody is going to see."""
+        if not self._task.done():
+            self._task.cancel()
+
+def _retrieve_failure(task: asyncio.Future):
+    # Failures of personalization nobody applies must not be reported as unretrieved
+    if not task.cancelled():
+        task.exception()
 
 class DynamicQuestionAgent(BaseAgent):
     """Agent responsible for generating dynamic, context-sensitive questions and managing user responses."""
     
-    def __init__(self, name: str = "question_generator", model_client=None, **kwargs):
+    def __init__(
+        self,
+        name: str = "question_generator",
+        model_client=None,
+        speculative: bool = False,
+        speculative_budget: int = 12,
+        fused_turns: bool = False,
+        context_builder: Optional[ContextBuilder] = None,
+        **kwargs
+    ):
         self._question_system_message = """You are a specialized agent for generating dynamic, 
         context-sensitive questions about text-to-image prompts. Your task is to create an 
         interactive question flow that helps users provide detailed information for their prompts.
@@ -30,25 +110,46 @@ class DynamicQuestionAgent(BaseAgent):
         
         # Initialize components
         self.session = QuestionSession()
-        self.analyzer = ResponseAnalyzer(self.client)
-        self.generator = QuestionGenerator(self.client)
+        self.analyzer = ResponseAnalyzer(self.llm)
+        # Session context sent with question prompts; its budget comes from the environment by default
+        self.generator = QuestionGenerator(self.llm, context_builder)
+        
+        # Score the answer and generate the next question in one call when enabled
+        self.fused_turns = fused_turns
+        self.last_response_analysis: Optional[Dict[str, float]] = None
+        
+        # Latency of the most recent final prompt generation, in seconds
+        self.final_prompt_timing: Dict[str, float] = {}
+        
+        # Optional speculative generation of the next question for each option
+        self.speculative = speculative
+        self.prefetcher = QuestionPrefetcher(
+            self._run_turn,
+            budget=speculative_budget,
+            calls_per_option=1 if fused_turns else 2
+        )
     
-    async def process_module_suggestions(self, module_suggestions: Dict) -> Dict:
+    @traced("aiscribe.process_module_suggestions")
+    async def process_module_suggestions(self, module_suggestions: Dict, use_cache: bool = True) -> Dict:
         """
         Process module suggestions and initialize a question session.
         
         Args:
             module_suggestions: Output from ModuleSuggestionAgent
+            use_cache: Whether the response cache may serve or store the question call
             
         Returns:
             Dict containing initial question and session info
         """
         # Initialize new session
         self.session.initialize_session(module_suggestions)
+        self.prefetcher.reset()
+        self.analyzer.reset()
         
         # Generate initial question
         initial_question = await self.generator.generate_next_question(
-            context=self.session.get_session_state()
+            context=self.session.get_session_state(),
+            use_cache=use_cache
         )
         
         return {
@@ -56,6 +157,107 @@ class DynamicQuestionAgent(BaseAgent):
             "session_state": self.session.get_session_state()
         }
     
+    @traced("aiscribe.fast_start")
+    async def fast_start(self, prompt: str, suggester, use_cache: bool = True) -> Dict:
+        """
+        Analyze a prompt, choose its modules and generate the first question with one model call.
+        
+        The analysis and the initial question come from a single combined
+        completion; active modules are then chosen from the analysis exactly as
+        in the analyze, suggest, question path, so the session and the returned
+        dicts have the same shapes.
+        
+        Args:
+            prompt: The initial prompt that starts the session
+            suggester: The ModuleSuggestionAgent that chooses the active modules
+            use_cache: Whether the response cache may serve or store the model calls
+            
+        Returns:
+            Dict containing the analysis, module suggestions, initial question and session info
+        """
+        result = await self.generator.generate_fast_start(prompt, use_cache=use_cache)
+        if result is not None:
+            analysis, initial_question = result
+        else:
+            analysis, initial_question = create_error_response("Could not parse the fast-start response", ""), None
+        set_span_attribute("aiscribe.fast_start_parsed", result is not None)
+        
+        module_suggestions = await suggester.process_prompt_analysis_lazy(analysis, use_cache=use_cache)
+        self.session.initialize_session(module_suggestions)
+        self.prefetcher.reset()
+        self.analyzer.reset()
+        if initial_question is None:
+            initial_question = self.generator._get_fallback_question(self.session.get_session_state())
+        
+        return {
+            "analysis": analysis,
+            "module_suggestions": module_suggestions,
+            "initial_question": initial_question,
+            "session_state": self.session.get_session_state()
+        }
+    
+    @traced("aiscribe.instant_start")
+    async def instant_start(self, prompt: str, suggester, use_cache: bool = True) -> Dict:
+        """
+        Start a session on a template question right away and personalize it in the background.
+        
+        Active modules are chosen from the words of the prompt the local relevance
+        engine recognizes, and the first question comes from the templates of the
+        first active module, so no model call is waited on. The model's analysis
+        and initial question are generated in a background task; ``apply`` on the
+        returned handle switches the session over to them as long as the template
+        question has not been answered.
+        
+        Must be called from a running event loop; personalization continues in the background.
+        
+        Args:
+            prompt: The initial prompt that starts the session
+            suggester: The ModuleSuggestionAgent that chooses the active modules
+            use_cache: Whether the response cache may serve or store the model calls
+            
+        Returns:
+            Dict containing the local analysis, module suggestions, the template initial
+            question, session info, and the PersonalizedStart handle under "personalized"
+        """
+        analysis = get_relevance_engine().local_analysis(prompt)
+        module_suggestions = await suggester.process_prompt_analysis_lazy(analysis, use_cache=use_cache, warm=False)
+        self.session.initialize_session(module_suggestions)
+        self.prefetcher.reset()
+        self.analyzer.reset()
+        initial_question = self.generator._get_fallback_question(self.session.get_session_state())
+        
+        personalized = PersonalizedStart(
+            asyncio.ensure_future(self._personalize(prompt, suggester, use_cache)),
+            self._adopt_personalization
+        )
+        return {
+            "analysis": analysis,
+            "module_suggestions": module_suggestions,
+            "initial_question": initial_question,
+            "session_state": self.session.get_session_state(),
+            "personalized": personalized
+        }
+    
+    async def _personalize(self, prompt: str, suggester, use_cache: bool) -> Optional[Dict[str, Any]]:
+        """Generate the model's analysis and initial question without touching the session."""
+        result = await self.generator.generate_fast_start(prompt, use_cache=use_cache)
+        if result is None:
+            return None
+        analysis, initial_question = result
+        return {
+            "analysis": analysis,
+            "module_suggestions": await suggester.process_prompt_analysis_lazy(analysis, use_cache=use_cache),
+            "initial_question": initial_question
+        }
+    
+    def _adopt_personalization(self, result: Dict[str, Any]) -> Optional[Dict]:
+        """Re-initialize the session from the personalized start unless an answer was recorded."""
+        if self.session.current_session["question_history"]:
+            return None
+        self.session.initialize_session(result["module_suggestions"])
+        self.prefetcher.reset()
+        return result["initial_question"]
+    
     def record_response(self, question: Dict, response: str):
         """
         Record a user's response to a question.
@@ -66,12 +268,14 @@ class DynamicQuestionAgent(BaseAgent):
         """
         self.session.record_response(question, response)
     
-    async def generate_next_question(self, previous_response: Optional[Dict] = None) -> Optional[Dict]:
+    @traced("aiscribe.generate_next_question")
+    async def generate_next_question(self, previous_response: Optional[Dict] = None, use_cache: bool = True) -> Dict:
         """
         Generate the next appropriate question based on the current context and previous responses.
         
         Args:
             previous_response: The user's response to the previous question (if any)
+            use_cache: Whether the response cache may serve or store the model calls
             
         Returns:
             Dict containing the next question, options, and examples
@@ -79,25 +283,236 @@ class DynamicQuestionAgent(BaseAgent):
         # Get the initial prompt if provided
         initial_prompt = previous_response.get("initial_prompt") if previous_response else None
         
+        response = previous_response.get("response") if previous_response else None
+        question = previous_response.get("question") if previous_response else None
+        
+        # Serve a speculatively generated question for this answer if one exists
+        hit = False
+        if self.speculative and isinstance(question, dict):
+            hit, result = await self.prefetcher.take(question, response)
+            if hit:
+                next_question, self.last_response_analysis = result
+            set_span_attribute("aiscribe.prefetch_hit", hit)
+        
+        if not hit:
+            next_question, self.last_response_analysis = await self._run_turn(
+                self.session.get_session_state(),
+                response,
+                initial_prompt,
+                use_cache=use_cache
+            )
+        
+        # Answers to module questions extend the local relevance lexicon
+        if response is not None and isinstance(question, dict) and "module" in question:
+            self.analyzer.learn(response, question["module"])
+        
+        return next_question
+    
+    @traced_stream("aiscribe.generate_next_question")
+    async def stream_next_question(self, previous_response: Optional[Dict] = None, use_cache: bool = True) -> AsyncIterator[JSONEvent]:
+        """
+        Generate the next question, yielding its fields as soon as each one has streamed in.
+        
+        Speculative and fused turns already have (or fetch) the whole question at once,
+        so they only yield the final event.
+        
+        Args:
+            previous_response: The user's response to the previous question (if any)
+            use_cache: Whether the response cache may serve or store the model calls
+            
+        Yields:
+            (path, value) events from QuestionGenerator.stream_next_question; the last
+            event has an empty path and the complete question dict
+        """
+        if self.speculative or self.fused_turns:
+            yield (), await self.generate_next_question(previous_response, use_cache=use_cache)
+            return
+        
+        initial_prompt = previous_response.get("initial_prompt") if previous_response else None
+        response = previous_response.get("response") if previous_response else None
+        question = previous_response.get("question") if previous_response else None
+        
+        self.last_response_analysis = None
+        if response is not None:
+            self.last_response_analysis = await self.analyzer.analyze_response(response, use_cache=use_cache)
+        
+        async for event in self.generator.stream_next_question(
+            context=self.session.get_session_state(),
+            response_analysis=self.last_response_analysis,
+            initial_prompt=initial_prompt,
+            use_cache=use_cache
+        ):
+            yield event
+        
+        if response is not None and isinstance(question, dict) and "module" in question:
+            self.analyzer.learn(response, question["module"])
+    
+    async def _run_turn(
+        self,
+        context: Dict,
+        response: Optional[str],
+        initial_prompt: Optional[str],
+        use_cache: bool = True
+    ) -> Tuple[Optional[Dict], Optional[Dict[str, float]]]:
+        """
+        Score a response and generate the following question, fused or as two calls.
+        
+        Args:
+            context: Session state with the response already recorded
+            response: The user's response (if any)
+            initial_prompt: The initial prompt that started the session
+            use_cache: Whether the response cache may serve or store the model calls
+            
+        Returns:
+            Tuple of (next question, module relevance scores of the response)
+        """
+        # A local question tier has nothing to fuse the response analysis with
+        fused = self.fused_turns and not self.llm.router.is_local("question_generation")
+        if fused and response is not None:
+            try:
+                turn = await self.generator.generate_fused_turn(
+                    context=context,
+                    response=response,
+                    initial_prompt=initial_prompt,
+                    use_cache=use_cache
+                )
+            except DeadlineExceeded:
+                # The turn is already out of time, so answer locally instead of making two more calls
+                return self.generator._get_fallback_question(context), self.analyzer.analyze_batch([response])[0]
+            if turn is not None:
+                response_analysis, next_question = turn
+                return next_question, response_analysis
+        
         # Analyze the previous response if provided
         response_analysis = None
-        if previous_response and "response" in previous_response:
-            response_analysis = self.analyzer.analyze_response(previous_response["response"])
+        if response is not None:
+            response_analysis = await self.analyzer.analyze_response(
+                response,
+                use_cache=use_cache
+            )
         
         # Generate next question
-        return await self.generator.generate_next_question(
-            context=self.session.get_session_state(),
+        next_question = await self.generator.generate_next_question(
+            context=context,
             response_analysis=response_analysis,
-            initial_prompt=initial_prompt
+            initial_prompt=initial_prompt,
+            use_cache=use_cache
         )
+        return next_question, response_analysis
+    
+    async def prefetch_next_questions(self, question: Dict, initial_prompt: Optional[str] = None) -> int:
+        """
+        Start generating the next question for every option of the displayed question.
+        
+        Returns immediately; the generations continue in the background until
+        generate_next_question serves the matching one and discards the rest.
+        
+        Args:
+            question: The question currently shown to the user
+            initial_prompt: The initial prompt that started the session
+            
+        Returns:
+            Number of options being prefetched
+        """
+        if not self.speculative:
+            return 0
+        return self.prefetcher.start(self.session.get_session_state(), question, initial_prompt)
     
-    async def generate_final_prompt(self) -> str:
+    def get_prefetch_stats(self) -> Dict:
+        """Get speculative prefetch hit rate, saved latency and spend."""
+        return self.prefetcher.stats()
+    
+    @traced("aiscribe.generate_final_prompt", ends_session=True)
+    async def generate_final_prompt(self, use_cache: bool = True, initial_prompt: Optional[str] = None) -> str:
         """
         Generate the final enhanced prompt based on all responses.
         
+        Args:
+            use_cache: Whether the response cache may serve or store this call
+            initial_prompt: The initial prompt that started the session, used by the fallback
+        
         Returns:
-            The final enhanced prompt string
+            The final enhanced prompt string; the prompt and answers joined together
+            if the model missed the stage's deadline or the API call failed
         """
+        started = time.perf_counter()
+        try:
+            final_prompt = await self.llm.complete(
+                messages=self._final_prompt_messages(),
+                use_cache=use_cache,
+                stage="final_prompt",
+                agent=self.name
+            )
+        except (DeadlineExceeded, openai.APIError):
+            final_prompt = self._assemble_final_prompt(initial_prompt)
+        total = time.perf_counter() - started
+        self.final_prompt_timing = {"time_to_first_token": total, "total": total}
+        
+        return final_prompt.strip()
+    
+    @traced_stream("aiscribe.generate_final_prompt", ends_session=True)
+    async def stream_final_prompt(self, use_cache: bool = True, initial_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream the final enhanced prompt as it is generated.
+        
+        Time to first token and total latency are recorded in final_prompt_timing.
+        
+        Args:
+            use_cache: Whether the response cache may serve or store this call
+            initial_prompt: The initial prompt that started the session, used by the fallback
+        
+        Yields:
+            Text chunks that join to the same stripped text generate_final_prompt returns; the fallback of generate_final_prompt as
+            one chunk if the call fails before any text has streamed
+        """
+        started = time.perf_counter()
+        first_token = None
+        leading = True
+        # Whitespace at the end of the text so far, sent only once more text follows
+        trailing = ""
+        try:
+            async for chunk in self.llm.stream(
+                messages=self._final_prompt_messages(),
+                use_cache=use_cache,
+                stage="final_prompt",
+                agent=self.name
+            ):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                # Match generate_final_prompt, which strips surrounding whitespace
+                if leading:
+                    chunk = chunk.lstrip()
+                    if not chunk:
+                        continue
+                    leading = False
+                text = chunk.rstrip()
+                if not text:
+                    trailing += chunk
+                    continue
+                yield trailing + text
+                trailing = chunk[len(text):]
+        except (DeadlineExceeded, openai.APIError):
+            # Text already shown cannot be taken back, so only a stream that has not started falls back
+            if not leading:
+                raise
+            yield self._assemble_final_prompt(initial_prompt)
+        
+        total = time.perf_counter() - started
+        self.final_prompt_timing = {
+            "time_to_first_token": first_token if first_token is not None else total,
+            "total": total
+        }
+    
+    def _assemble_final_prompt(self, initial_prompt: Optional[str]) -> str:
+        """Join the initial prompt and the answers into a final prompt without a model call."""
+        parts = [initial_prompt or ""] + [str(turn["response"]) for turn in self.session.get_response_history()]
+        return ", ".join(dict.fromkeys(part.strip() for part in parts if part.strip()))
+    
+    def _final_prompt_messages(self) -> List[Dict[str, str]]:
+        """Build the messages that ask for the final prompt."""
+        # No further questions will be asked
+        self.prefetcher.cancel()
+        
         # Create a prompt to generate the final text
         history = self.session.get_response_history()
         prompt = f"""Based on these question-answer pairs, generate an enhanced image prompt:
@@ -113,12 +528,7 @@ Create a detailed, cohesive prompt that:
 
 Return only the final prompt text."""
 
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You create enhanced image prompts from user responses."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        return response.choices[0].message.content.strip() 
\ No newline at end of file
+        return [
+            {"role": "system", "content": "You create enhanced image prompts from user responses."},
+            {"role": "user", "content": prompt}
+        ]
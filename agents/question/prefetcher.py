@@ -0,0 +1,140 @@
+import asyncio
+import copy
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from .session_manager import QuestionSession
+
+# Scores a response and generates the next question: (context, response, initial_prompt) -> (question, scores)
+TurnRunner = Callable[[Dict[str, Any], str, Optional[str]], Awaitable[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, float]]]]]
+
+def _discard_result(task: asyncio.Task):
+    # Retrieve failures of speculation nobody ends up awaiting
+    if not task.cancelled():
+        task.exception()
+
+class QuestionPrefetcher:
+    """Speculatively generates the next question for every option while the user is still reading."""
+
+    def __init__(self, run_turn: TurnRunner, budget: int = 12, calls_per_option: int = 2):
+        self.run_turn = run_turn
+        self.budget = budget
+        # Model calls each speculated option costs, used to enforce the budget
+        self.calls_per_option = calls_per_option
+        self.spent = 0
+        self._question: Optional[str] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._started: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.saved_seconds = 0.0
+
+    def reset(self):
+        """Cancel outstanding speculation and restore the per-session budget."""
+        self.cancel()
+        self.spent = 0
+
+    def start(self, session_state: Dict[str, Any], question: Dict[str, Any], initial_prompt: Optional[str] = None) -> int:
+        """
+        Start next-question generation for each option of the displayed question.
+
+        Must be called from a running event loop; the work continues in background tasks.
+
+        Args:
+            session_state: The session state before the user answers
+            question: The question currently shown to the user
+            initial_prompt: The initial prompt that started the session
+
+        Returns:
+            Number of options for which speculation was started
+        """
+        if self._question == question["question"]:
+            return 0
+        self.cancel()
+        self._question = question["question"]
+
+        # Snapshot now: the real session changes as soon as the answer is recorded
+        snapshot = copy.deepcopy(session_state)
+        started = 0
+        for option in question.get("options", []):
+            if self.spent + self.calls_per_option > self.budget:
+                break
+            self.spent += self.calls_per_option
+            self._started[option] = time.perf_counter()
+            task = asyncio.create_task(
+                self._speculate(snapshot, question, option, initial_prompt)
+            )
+            task.add_done_callback(_discard_result)
+            self._tasks[option] = task
+            started += 1
+        return started
+
+    async def _speculate(
+        self,
+        session_state: Dict[str, Any],
+        question: Dict[str, Any],
+        option: str,
+        initial_prompt: Optional[str]
+    ) -> Tuple[Tuple[Optional[Dict[str, Any]], Dict[str, float]], float]:
+        started = time.perf_counter()
+        # Work on a private copy of the session as it will look once this option is recorded
+        session = QuestionSession()
+        session.current_session = copy.deepcopy(session_state)
+        session.record_response(question, option)
+
+        result = await self.run_turn(session.get_session_state(), option, initial_prompt)
+        return result, time.perf_counter() - started
+
+    async def take(self, question: Dict[str, Any], response: str) -> Tuple[bool, Any]:
+        """
+        Serve the speculative result for the submitted answer and discard the rest.
+
+        Args:
+            question: The question that was answered
+            response: The submitted answer
+
+        Returns:
+            Tuple of (hit, result) where result is (next_question, response_analysis) on a hit
+        """
+        task = None
+        if self._question == question.get("question"):
+            task = self._tasks.pop(response, None)
+        started = self._started.get(response)
+        self.cancel()
+        if task is None:
+            self.misses += 1
+            return False, None
+
+        submitted = time.perf_counter()
+        try:
+            result, duration = await task
+        except Exception:
+            self.misses += 1
+            return False, None
+        # Whatever already ran in the background is latency the user no longer waits for
+        self.hits += 1
+        self.saved_seconds += min(submitted - started, duration)
+        return True, result
+
+    def cancel(self):
+        """Cancel and forget all outstanding speculative generations."""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+                self.discarded += 1
+        self._tasks.clear()
+        self._started.clear()
+        self._question = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get prefetch hit rate, saved latency and speculative spend."""
+        served = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / served if served else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "discarded": self.discarded,
+            "speculative_calls": self.spent,
+            "budget": self.budget
+        }
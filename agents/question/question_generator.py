@@ -1,20 +1,29 @@
-from typing import Dict, Any, Optional
-import json
-from openai import OpenAI
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from ..base.llm_client import LLMClient
+from ..base.latency_policy import DeadlineExceeded
+from ..base.tracing import set_span_attribute
+from ..utils.json_utils import StructuredOutputError
+from ..prompt.analysis_prompts import fast_start_messages
+from ..utils.schemas import FastStart, FusedTurn, Question, response_format
+from ..utils.streaming_json import StreamingJSONParser, JSONEvent
 from .question_templates import QUESTION_TEMPLATES
+from .context_builder import ContextBuilder
 
 class QuestionGenerator:
     """Generates dynamic, context-sensitive questions based on user responses."""
     
-    def __init__(self, client: OpenAI):
-        self.client = client
+    def __init__(self, llm: LLMClient, context_builder: Optional[ContextBuilder] = None):
+        self.llm = llm
         self.templates = QUESTION_TEMPLATES
+        self.context_builder = context_builder or ContextBuilder()
     
     async def generate_next_question(
         self,
         context: Dict[str, Any],
         response_analysis: Optional[Dict[str, float]] = None,
-        initial_prompt: Optional[str] = None
+        initial_prompt: Optional[str] = None,
+        use_cache: bool = True
     ) -> Dict[str, Any]:
         """
         Generate the next appropriate question based on the current context and previous responses.
@@ -23,13 +32,183 @@ class QuestionGenerator:
             context: Current session context
             response_analysis: Analysis of the previous response (if any)
             initial_prompt: The initial prompt that started the session
+            use_cache: Whether the response cache may serve or store this call
             
         Returns:
-            Dict containing the next question, options, and examples
+            Dict containing the next question, options, and examples; the template
+            fallback if the model missed the stage's deadline or its reply was invalid
         """
-        prompt = f"""Based on the current context and keeping in mind the initial prompt: "{initial_prompt}", generate the next appropriate question.
+        if self.llm.router.is_local("question_generation"):
+            return self._get_fallback_question(context)
+        try:
+            question = await self.llm.complete_structured(
+                messages=self._question_messages(context, initial_prompt),
+                response_model=Question,
+                use_cache=use_cache,
+                stage="question_generation",
+                agent="question_generator"
+            )
+        except (DeadlineExceeded, StructuredOutputError):
+            # Fallback to template-based question
+            return self._get_fallback_question(context)
+        return question.to_dict()
+    
+    async def stream_next_question(
+        self,
+        context: Dict[str, Any],
+        response_analysis: Optional[Dict[str, float]] = None,
+        initial_prompt: Optional[str] = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[JSONEvent]:
+        """
+        Generate the next question, reporting each field as soon as it has streamed in.
+        
+        Args:
+            context: Current session context
+            response_analysis: Analysis of the previous response (if any)
+            initial_prompt: The initial prompt that started the session
+            use_cache: Whether the response cache may serve or store this call
+            
+        Yields:
+            (path, value) events such as (("question",), text) and (("options", 0), option);
+            the last event has an empty path and the complete question dict, which is
+            the template fallback if the stream could not be parsed or did not start
+            before the stage's deadline
+        """
+        if self.llm.router.is_local("question_generation"):
+            yield (), self._get_fallback_question(context)
+            return
+        parser = StreamingJSONParser()
+        try:
+            async for chunk in self.llm.stream(
+                messages=self._question_messages(context, initial_prompt),
+                use_cache=use_cache,
+                stage="question_generation",
+                agent="question_generator",
+                response_format=response_format(Question)
+            ):
+                for path, value in parser.feed(chunk):
+                    if path:
+                        yield path, value
+        except DeadlineExceeded:
+            yield (), self._get_fallback_question(context)
+            return
+        
+        try:
+            question = Question.model_validate(parser.close()).to_dict()
+        except ValidationError:
+            question = None
+        self.llm.router.record_outcome("question_generation", question is not None)
+        if self.llm.metrics is not None:
+            self.llm.metrics.record_output("question_generation", 1, question is not None)
+        yield (), question if question is not None else self._get_fallback_question(context)
+    
+    def _question_messages(self, context: Dict[str, Any], initial_prompt: Optional[str]) -> List[Dict[str, str]]:
+        """Build the messages that ask for the next question."""
+        prompt = f"""{self._build_question_instructions(context, initial_prompt, "question_generation")}
 
-Context: {json.dumps(context, indent=2)}
+Format the response as a JSON object with:
+- question: The question text
+- options: List of 3-4 possible answers
+- examples: List of example responses
+- module: The primary module this question relates to
+- category: The specific category within the module"""
+
+        return [
+            {"role": "system", "content": "You generate contextual questions for image prompts."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    async def generate_fused_turn(
+        self,
+        context: Dict[str, Any],
+        response: str,
+        initial_prompt: Optional[str] = None,
+        use_cache: bool = True
+    ) -> Optional[Tuple[Dict[str, float], Dict[str, Any]]]:
+        """
+        Score the previous response and generate the next question in a single model call.
+        
+        Args:
+            context: Current session context, including the recorded response
+            response: The user's latest response
+            initial_prompt: The initial prompt that started the session
+            use_cache: Whether the response cache may serve or store this call
+            
+        Returns:
+            Tuple of (module relevance scores, next question), or None if the
+            combined response could not be parsed
+        """
+        prompt = f"""{self._build_question_instructions(context, initial_prompt, "fused_turn")}
+
+The user's latest response was: "{response}"
+
+Also rate from 0.0 to 1.0 how relevant that response is to each module:
+character (appearance, expressions, clothing), setting (environment, weather, time),
+atmosphere (mood, lighting, feeling) and action (movement, interaction, poses).
+
+Format the response as a JSON object with:
+- relevance: Object with numeric "character", "setting", "atmosphere" and "action" scores
+- next_question: Object with
+  - question: The question text
+  - options: List of 3-4 possible answers
+  - examples: List of example responses
+  - module: The primary module this question relates to
+  - category: The specific category within the module"""
+
+        try:
+            turn = await self.llm.complete_structured(
+                messages=[
+                    {"role": "system", "content": "You analyze user responses and generate contextual questions for image prompts."},
+                    {"role": "user", "content": prompt}
+                ],
+                response_model=FusedTurn,
+                use_cache=use_cache,
+                stage="fused_turn",
+                agent="question_generator"
+            )
+        except StructuredOutputError:
+            return None
+        return turn.relevance.to_dict(), turn.next_question.to_dict()
+    
+    async def generate_fast_start(
+        self,
+        prompt: str,
+        use_cache: bool = True
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Analyze a new prompt and generate the first question about it in a single model call.
+        
+        Args:
+            prompt: The initial prompt that starts the session
+            use_cache: Whether the response cache may serve or store this call
+            
+        Returns:
+            Tuple of (prompt analysis, initial question), or None if the combined
+            response could not be parsed or missed the stage's deadline
+        """
+        try:
+            start = await self.llm.complete_structured(
+                messages=fast_start_messages(prompt),
+                response_model=FastStart,
+                use_cache=use_cache,
+                stage="fast_start",
+                agent="question_generator"
+            )
+        except (DeadlineExceeded, StructuredOutputError):
+            return None
+        return start.analysis.to_dict(), start.initial_question.to_dict()
+    
+    def _build_question_instructions(self, context: Dict[str, Any], initial_prompt: Optional[str], stage: str) -> str:
+        """Build the shared instructions for generating the next question, recording the context's token savings."""
+        compact, stats = self.context_builder.build(context)
+        set_span_attribute("aiscribe.context_tokens", stats["context_tokens"])
+        set_span_attribute("aiscribe.context_tokens_saved", stats["tokens_saved"])
+        if self.llm.metrics is not None:
+            self.llm.metrics.record_context(stage, stats["context_tokens"], stats["tokens_saved"])
+        return f"""Based on the current context and keeping in mind the initial prompt: "{initial_prompt}", generate the next appropriate question.
+
+Context: {compact}
 
 Special considerations:
 1. Ensure the question maintains relevance to the initial prompt theme
@@ -45,48 +224,26 @@ Special considerations:
 Generate a question that:
 1. Follows naturally from previous responses
 2. Is relevant to active modules and initial prompt theme
-3. Helps gather missing but important details
-
-Format the response as a JSON object with:
-- question: The question text
-- options: List of 3-4 possible answers
-- examples: List of example responses
-- module: The primary module this question relates to
-- category: The specific category within the module"""
-
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You generate contextual questions for image prompts."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        try:
-            question_text = response.choices[0].message.content
-            json_start = question_text.find('{')
-            json_end = question_text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                return json.loads(question_text[json_start:json_end])
-        except Exception:
-            # Fallback to template-based question
-            return self._get_fallback_question(context)
+3. Helps gather missing but important details"""
     
     def _get_fallback_question(self, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate a fallback question based on templates and context."""
-        # Find the first incomplete module
+        """Generate a fallback question based on templates and context, skipping categories already asked."""
+        asked = {
+            (turn["question"].get("module"), turn["question"].get("category"))
+            for turn in context.get("question_history", [])
+        }
+        # Find the first template category of an incomplete module that was not asked yet
         for module, status in context["progress"].items():
             if status["completed"] < status["total"]:
-                template = self.templates.get(module, {})
-                if template:
-                    first_category = next(iter(template))
-                    question_data = template[first_category]
+                for category, question_data in self._template_categories(module):
+                    if (module, category) in asked:
+                        continue
                     return {
                         "question": question_data["question"],
                         "options": question_data["options"],
                         "examples": [question_data["examples"]],
                         "module": module,
-                        "category": first_category
+                        "category": category
                     }
         
         # If all modules are complete or no templates available, return a general question
@@ -96,4 +253,10 @@ Format the response as a JSON object with:
             "examples": ["Add more intricate details to the background"],
             "module": "general",
             "category": "refinement"
-        } 
\ No newline at end of file
+        }
+    
+    def _template_categories(self, module: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield a module's template categories, each followed by its follow-up categories."""
+        for category, question_data in self.templates.get(module, {}).items():
+            yield category, question_data
+            yield from question_data.get("follow_up", {}).items()
@@ -0,0 +1,284 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..module.module_config import MODULES
+from .question_templates import QUESTION_TEMPLATES
+
+MODULE_ORDER = ("character", "setting", "atmosphere", "action")
+
+# Prompt analysis category holding each module's elements
+MODULE_CATEGORIES = {
+    "character": "Characters",
+    "setting": "Places",
+    "atmosphere": "Emotions/Style",
+    "action": "Actions/Processes"
+}
+
+_TOKEN = re.compile(r"[a-z]+")
+_STOPWORDS = frozenset({
+    "a", "an", "the", "of", "in", "on", "at", "to", "is", "are", "be", "should",
+    "what", "how", "which", "there", "any", "or", "and", "with", "it", "for",
+    "e", "g", "example", "by", "this", "that", "as", "like", "kind", "specific"
+})
+
+# Weights given to each source of lexicon terms
+_OPTION_WEIGHT = 3.0
+_EXAMPLE_WEIGHT = 1.0
+_QUESTION_WEIGHT = 1.0
+_SEED_WEIGHT = 3.0
+_LEARNED_WEIGHT = 0.5
+
+_MEMO_SIZE = 4096
+
+# Terms one session's answers may add before the oldest are forgotten
+_MAX_LEARNED_TERMS = 512
+
+# Keywords the original rule-based fallback matched on
+_SEED_TERMS = {
+    "character": ["character", "figure", "person", "face", "hair", "eyes", "wearing", "outfit"],
+    "setting": ["forest", "environment", "place", "landscape", "city", "sky", "season", "weather"],
+    "atmosphere": ["mood", "mysterious", "feeling", "lighting", "style", "tone", "colors"],
+    "action": ["standing", "moving", "motion", "movement", "pose", "gesture", "jumping", "flying"]
+}
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase, lightly stemmed content words."""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS or len(token) < 2:
+            continue
+        for suffix in ("ing", "ed", "ly", "es", "s"):
+            if len(token) > len(suffix) + 3 and token.endswith(suffix):
+                token = token[:-len(suffix)]
+                break
+        tokens.append(token)
+    return tokens
+
+class LearnedTerms:
+    """Module weights learned from one session's answers, capped at the most recently used terms."""
+
+    def __init__(self, max_terms: int = _MAX_LEARNED_TERMS):
+        self.max_terms = max_terms
+        self._weights: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def learn(self, response: str, module: str, weight: float = _LEARNED_WEIGHT):
+        """
+        Add the terms of an answered response to a module.
+
+        Args:
+            response: The user's response
+            module: The module of the question that was answered
+            weight: How strongly the response terms count towards the module
+        """
+        if module not in MODULE_ORDER:
+            return
+        column = MODULE_ORDER.index(module)
+        for token in tokenize(response):
+            row = self._weights.pop(token, None)
+            if row is None:
+                row = np.zeros(len(MODULE_ORDER), dtype=np.float64)
+            row[column] += weight
+            self._weights[token] = row
+        while len(self._weights) > self.max_terms:
+            self._weights.popitem(last=False)
+
+    def get(self, token: str) -> Optional[np.ndarray]:
+        """Get the learned module weights of a term, or None."""
+        return self._weights.get(token)
+
+    def clear(self):
+        """Forget every learned term."""
+        self._weights.clear()
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+class RelevanceEngine:
+    """Local, vectorized module-relevance scorer built from the module and template lexicon."""
+
+    def __init__(self, modules: Dict[str, Any] = MODULES, templates: Dict[str, Any] = QUESTION_TEMPLATES):
+        self._vocabulary: Dict[str, int] = {}
+        self._weights = np.zeros((256, len(MODULE_ORDER)), dtype=np.float64)
+        self._memo: Dict[str, Tuple[Dict[str, float], float]] = {}
+
+        for module, config in modules.items():
+            if module not in MODULE_ORDER:
+                continue
+            for question in config.get("questions", []):
+                self._add_terms(tokenize(question), module, _QUESTION_WEIGHT)
+        for module, categories in templates.items():
+            if module in MODULE_ORDER:
+                self._add_template_terms(categories, module)
+        for module, terms in _SEED_TERMS.items():
+            self._add_terms(tokenize(" ".join(terms)), module, _SEED_WEIGHT)
+
+        # The shared lexicon is fixed once built; answers are learned per session with LearnedTerms
+        weights = self._weights[:len(self._vocabulary)]
+        totals = weights.sum(axis=1, keepdims=True)
+        # Per-term probability of each module, so shared terms count less decisively
+        self._distribution = np.divide(weights, totals, out=np.zeros_like(weights), where=totals > 0)
+
+    def _add_template_terms(self, categories: Dict[str, Any], module: str):
+        for category, template in categories.items():
+            self._add_terms(tokenize(category.replace("_", " ")), module, _OPTION_WEIGHT)
+            self._add_terms(tokenize(template.get("question", "")), module, _QUESTION_WEIGHT)
+            self._add_terms(tokenize(" ".join(template.get("options", []))), module, _OPTION_WEIGHT)
+            self._add_terms(tokenize(template.get("examples", "")), module, _EXAMPLE_WEIGHT)
+            self._add_template_terms(template.get("follow_up", {}), module)
+
+    def _add_terms(self, tokens: Iterable[str], module: str, weight: float):
+        column = MODULE_ORDER.index(module)
+        for token in tokens:
+            row = self._vocabulary.get(token)
+            if row is None:
+                row = len(self._vocabulary)
+                if row == self._weights.shape[0]:
+                    grown = np.zeros((row * 2, len(MODULE_ORDER)), dtype=np.float64)
+                    grown[:row] = self._weights
+                    self._weights = grown
+                self._vocabulary[token] = row
+            self._weights[row, column] += weight
+
+    def score_batch(
+        self,
+        responses: List[str],
+        learned: Optional[LearnedTerms] = None
+    ) -> Tuple[List[Dict[str, float]], np.ndarray]:
+        """
+        Score many responses at once.
+
+        Args:
+            responses: The user responses to score
+            learned: Terms learned from the current session's answers, added to the shared lexicon
+
+        Returns:
+            Tuple of (per-response module scores, per-response confidence in [0, 1])
+        """
+        distribution = self._distribution
+        rows: List[int] = []
+        owners: List[int] = []
+        learned_rows: List[np.ndarray] = []
+        learned_owners: List[int] = []
+        token_counts = np.zeros(len(responses), dtype=np.float64)
+        for position, response in enumerate(responses):
+            tokens = tokenize(response)
+            token_counts[position] = len(tokens)
+            for token in tokens:
+                row = self._vocabulary.get(token)
+                known = row is not None
+                extra = learned.get(token) if learned else None
+                if extra is not None:
+                    weights = extra + self._weights[row] if known else extra
+                    learned_rows.append(weights / weights.sum())
+                    learned_owners.append(position)
+                elif known:
+                    rows.append(row)
+                    owners.append(position)
+
+        totals = np.zeros((len(responses), len(MODULE_ORDER)), dtype=np.float64)
+        matched = np.zeros(len(responses), dtype=np.float64)
+        if rows:
+            np.add.at(totals, np.asarray(owners), distribution[np.asarray(rows)])
+        if learned_rows:
+            np.add.at(totals, np.asarray(learned_owners), np.asarray(learned_rows))
+        if rows or learned_rows:
+            matched = np.bincount(np.asarray(owners + learned_owners), minlength=len(responses)).astype(np.float64)
+
+        peaks = totals.max(axis=1, keepdims=True)
+        scores = np.divide(totals, peaks, out=np.zeros_like(totals), where=peaks > 0)
+        coverage = np.divide(matched, token_counts, out=np.zeros_like(matched), where=token_counts > 0)
+        # Confidence combines how much of the answer is known with how decisive the top module is
+        top = np.sort(np.divide(totals, matched[:, None], out=np.zeros_like(totals), where=matched[:, None] > 0), axis=1)
+        margin = top[:, -1] - top[:, -2]
+        confidence = np.clip(coverage * (0.5 + margin), 0.0, 1.0)
+
+        results = [
+            {module: float(value) for module, value in zip(MODULE_ORDER, row)}
+            for row in np.round(scores, 3)
+        ]
+        return results, confidence
+
+    def categorize(self, text: str) -> Dict[str, List[str]]:
+        """
+        Assign each known word of a text to the module it most strongly belongs to.
+
+        Args:
+            text: A prompt or response
+
+        Returns:
+            Dict mapping modules to the words of the text assigned to them, in
+            text order; modules without any word are left out
+        """
+        words = list(dict.fromkeys(word for word in _TOKEN.findall(text.lower()) if tokenize(word)))
+        if not words:
+            return {}
+        scores, confidence = self.score_batch(words)
+        categories: Dict[str, List[str]] = {}
+        for word, word_scores, known in zip(words, scores, confidence):
+            if known > 0:
+                module = max(MODULE_ORDER, key=word_scores.__getitem__)
+                categories.setdefault(module, []).append(word)
+        return categories
+
+    def local_analysis(self, prompt: str) -> Dict[str, Any]:
+        """
+        Build a prompt analysis from the words the engine recognizes, without a model call.
+
+        Args:
+            prompt: The text-to-image prompt
+
+        Returns:
+            Dict with keywords and categorized_elements; when no word is recognized
+            every category is present, since nothing rules any module out
+        """
+        categories = self.categorize(prompt)
+        return {
+            "keywords": [word for words in categories.values() for word in words],
+            "categorized_elements": {
+                category: categories.get(module, [])
+                for module, category in MODULE_CATEGORIES.items()
+                if module in categories or not categories
+            }
+        }
+
+    def score(self, response: str, learned: Optional[LearnedTerms] = None) -> Tuple[Dict[str, float], float]:
+        """
+        Score a single response.
+
+        Args:
+            response: The user's response
+            learned: Terms learned from the current session's answers
+
+        Returns:
+            Tuple of ({module: score}, confidence)
+        """
+        if learned:
+            # Session-specific results cannot be shared through the memo
+            results, confidence = self.score_batch([response], learned)
+            return results[0], float(confidence[0])
+        # Answers are mostly repeated option words, so remember recent results
+        key = response.strip().lower()
+        memo = self._memo
+        cached = memo.get(key)
+        if cached is not None:
+            return dict(cached[0]), cached[1]
+        results, confidence = self.score_batch([response])
+        if len(memo) >= _MEMO_SIZE:
+            memo.clear()
+        memo[key] = (results[0], float(confidence[0]))
+        return dict(results[0]), float(confidence[0])
+
+_engine: Optional[RelevanceEngine] = None
+_engine_lock = threading.Lock()
+
+def get_relevance_engine() -> RelevanceEngine:
+    """Return the process-wide relevance engine, creating it on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RelevanceEngine()
+        return _engine
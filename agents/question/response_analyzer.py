@@ -1,22 +1,73 @@
-from typing import Dict
-from openai import OpenAI
+from typing import Dict, List, Optional
+from ..base.llm_client import LLMClient
+from ..base.tracing import set_span_attribute, traced
+from ..utils.schemas import ModuleRelevance
+from .relevance_engine import LearnedTerms, RelevanceEngine, get_relevance_engine
 
 class ResponseAnalyzer:
     """Analyzes user responses to determine relevance to different modules."""
     
-    def __init__(self, client: OpenAI):
-        self.client = client
+    def __init__(
+        self,
+        llm: LLMClient,
+        engine: Optional[RelevanceEngine] = None,
+        escalation_threshold: float = 0.5,
+        escalate: bool = True
+    ):
+        self.llm = llm
+        self.engine = engine or get_relevance_engine()
+        # Answers only adjust the scores of the session they were given in
+        self.learned = LearnedTerms()
+        self.escalation_threshold = escalation_threshold
+        self.escalate = escalate
     
-    def analyze_response(self, response: str) -> Dict[str, float]:
+    def analyze_batch(self, responses: List[str]) -> List[Dict[str, float]]:
+        """
+        Score many responses locally in one vectorized pass.
+        
+        Args:
+            responses: The user's response texts
+            
+        Returns:
+            List of module relevance scores, one per response
+        """
+        scores, _ = self.engine.score_batch(responses, self.learned)
+        return scores
+    
+    def learn(self, response: str, module: str):
+        """Teach this session's scoring that a response answered a question about a module."""
+        self.learned.learn(response, module)
+    
+    def reset(self):
+        """Forget what was learned from the previous session's answers."""
+        self.learned.clear()
+    
+    @traced("aiscribe.analyze_response")
+    async def analyze_response(self, response: str, use_cache: bool = True) -> Dict[str, float]:
         """
         Analyze the content of a response to determine which modules it relates to.
         
+        Responses are scored by the local relevance engine; the model is only
+        asked when the local confidence is below the escalation threshold and
+        the stage is not routed to the local tier.
+        
         Args:
             response: The user's response text
+            use_cache: Whether the response cache may serve or store the escalation call
             
         Returns:
             Dict containing detected modules and their relevance scores
         """
+        local_scores, confidence = self.engine.score(response, self.learned)
+        set_span_attribute("aiscribe.local_confidence", confidence)
+        confident = confidence >= self.escalation_threshold
+        if self.llm.router.is_local("response_analysis"):
+            # Unsure local answers count against the local tier so routing can promote it
+            self.llm.router.record_outcome("response_analysis", confident)
+            return local_scores
+        if not self.escalate or confident:
+            return local_scores
+        
         # Create a prompt to analyze the response
         analysis_prompt = f"""Analyze this response and determine which modules it relates to:
         Response: "{response}"
@@ -27,36 +78,20 @@ class ResponseAnalyzer:
         3. Atmosphere details (mood, lighting, feeling)
         4. Action details (movement, interaction, poses)
         
-        Return a JSON object with module relevance scores."""
+        Return a JSON object with "character", "setting", "atmosphere" and "action" scores."""
         
         try:
-            analysis_response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+            analysis = await self.llm.complete_structured(
                 messages=[
                     {"role": "system", "content": "You analyze text to identify relevant modules."},
                     {"role": "user", "content": analysis_prompt}
-                ]
+                ],
+                response_model=ModuleRelevance,
+                use_cache=use_cache,
+                stage="response_analysis",
+                agent="response_analyzer"
             )
-            
-            analysis_text = analysis_response.choices[0].message.content
-            json_start = analysis_text.find('{')
-            json_end = analysis_text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                analysis = eval(analysis_text[json_start:json_end])
-                # Convert to simple relevance scores if nested structure
-                if isinstance(analysis.get("character_details"), dict):
-                    return {
-                        "character": sum(1 for v in analysis["character_details"].values() if v) / 3 if analysis["character_details"] else 0.0,
-                        "setting": sum(1 for v in analysis["setting_details"].values() if v) / 3 if analysis["setting_details"] else 0.0,
-                        "atmosphere": sum(1 for v in analysis["atmosphere_details"].values() if v) / 3 if analysis["atmosphere_details"] else 0.0,
-                        "action": sum(1 for v in analysis["action_details"].values() if v) / 3 if analysis["action_details"] else 0.0
-                    }
-                return analysis
         except Exception:
-            # Fallback to basic keyword analysis
-            return {
-                "character": 1.0 if ("character" in response.lower() or "figure" in response.lower()) else 0.0,
-                "setting": 1.0 if ("forest" in response.lower() or "environment" in response.lower()) else 0.0,
-                "atmosphere": 1.0 if ("mood" in response.lower() or "mysterious" in response.lower()) else 0.0,
-                "action": 1.0 if ("standing" in response.lower() or "moving" in response.lower()) else 0.0
-            } 
\ No newline at end of file
+            # Fall back to the local scores
+            return local_scores
+        return analysis.to_dict()
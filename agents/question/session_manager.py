@@ -56,6 +56,15 @@ class QuestionSession:
             if module in self.current_session["progress"]:
                 self.current_session["progress"][module]["completed"] += 1
     
+    def load_state(self, state: Dict[str, Any]):
+        """
+        Continue a session from a state saved with get_session_state().
+        
+        Args:
+            state: The saved session state
+        """
+        self.current_session = state
+    
     def get_session_state(self) -> Dict[str, Any]:
         """Get the current session state."""
         return self.current_session
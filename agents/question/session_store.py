@@ -0,0 +1,270 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+def split_record(record: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Split a session record into its header and its turns.
+
+    The turns are the session's question history; the ``responses`` map is left
+    out because it is rebuilt from the turns on load.
+
+    Args:
+        record: Session record holding QuestionSession state under ``state``
+
+    Returns:
+        Tuple of (header without the turns, list of turns)
+    """
+    state = record.get("state", {})
+    header = {key: value for key, value in record.items() if key != "state"}
+    header["state"] = {
+        key: value for key, value in state.items()
+        if key not in ("question_history", "responses")
+    }
+    return header, state.get("question_history", [])
+
+def join_record(header: Dict[str, Any], turns: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Rebuild a session record from its header and turns."""
+    record = dict(header)
+    state = dict(header.get("state", {}))
+    state["question_history"] = turns
+    state["responses"] = {turn["question"].get("question"): turn["response"] for turn in turns}
+    record["state"] = state
+    return record
+
+def _rewritten(stored_prompt: Any, stored_last: Optional[str], stored_count: int, record: Dict[str, Any], turns: List[Dict[str, Any]]) -> bool:
+    """Whether a saved history no longer extends the stored one and has to be written in full."""
+    if stored_count == 0:
+        return False
+    if record.get("prompt") != stored_prompt or len(turns) < stored_count:
+        return True
+    return _dumps(turns[stored_count - 1]) != stored_last
+
+class SessionStore(ABC):
+    """Storage for question sessions addressed by session ID.
+
+    Records hold QuestionSession state under ``state``. Turns are normally only
+    appended, so saving a session writes just the turns added since it was last
+    saved; a history that was reset, shortened or replaced, or a record with a
+    different prompt, is written in full instead. Sessions idle for longer than
+    the TTL are evicted.
+    """
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a stored session.
+
+        Args:
+            session_id: The session's ID
+
+        Returns:
+            The session record, or None if it does not exist or has expired
+        """
+
+    @abstractmethod
+    def save(self, session_id: str, record: Dict[str, Any]):
+        """
+        Store a session's header and any turns added since the last save.
+
+        Args:
+            session_id: The session's ID
+            record: JSON-serializable session record
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Remove a session if it exists."""
+
+    @abstractmethod
+    def evict_expired(self) -> int:
+        """Remove idle sessions past the TTL and return how many were removed."""
+
+class MemorySessionStore(SessionStore):
+    """Sessions kept in this process's memory, bounded by an LRU and an idle TTL."""
+
+    def __init__(self, max_sessions: int = 10_000, ttl: Optional[float] = 86_400.0):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        # session ID -> [encoded header, encoded turns, last access, prompt]
+        self._sessions: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, touched: float, now: float) -> bool:
+        return self.ttl is not None and now - touched > self.ttl
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if self._expired(entry[2], now):
+                del self._sessions[session_id]
+                return None
+            entry[2] = now
+            self._sessions.move_to_end(session_id)
+            header, turns = entry[0], list(entry[1])
+        # Entries are stored encoded, so callers never share mutable state with the store
+        return join_record(json.loads(header), [json.loads(turn) for turn in turns])
+
+    def save(self, session_id: str, record: Dict[str, Any]):
+        header, turns = split_record(record)
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = self._sessions[session_id] = ["", [], now, None]
+            stored = entry[1]
+            if _rewritten(entry[3], stored[-1] if stored else None, len(stored), record, turns):
+                stored.clear()
+            stored.extend(_dumps(turn) for turn in turns[len(stored):])
+            entry[0] = _dumps(header)
+            entry[2] = now
+            entry[3] = record.get("prompt")
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def evict_expired(self) -> int:
+        with self._lock:
+            return self._evict(time.time())
+
+    def _evict(self, now: float) -> int:
+        # Least recently used sessions come first, so only the front needs checking
+        removed = 0
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and not self._expired(entry[2], now):
+                break
+            del self._sessions[session_id]
+            removed += 1
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a SQLite database in WAL mode, shared by every process that opens the same file."""
+
+    # Saves between sweeps of idle sessions
+    EVICT_EVERY = 256
+
+    def __init__(self, path: str, ttl: Optional[float] = 86_400.0):
+        self.path = path
+        self.ttl = ttl
+        self._saves = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, header TEXT NOT NULL, turns INTEGER NOT NULL, touched REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_turns ("
+            "session_id TEXT NOT NULL, position INTEGER NOT NULL, turn TEXT NOT NULL, "
+            "PRIMARY KEY (session_id, position)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_touched ON sessions (touched)")
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT header, touched FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and now - row[1] > self.ttl:
+                self._delete(session_id)
+                return None
+            turns = self._conn.execute(
+                "SELECT turn FROM session_turns WHERE session_id = ? ORDER BY position", (session_id,)
+            ).fetchall()
+            self._conn.execute("UPDATE sessions SET touched = ? WHERE id = ?", (now, session_id))
+        return join_record(json.loads(row[0]), [json.loads(turn) for turn, in turns])
+
+    def save(self, session_id: str, record: Dict[str, Any]):
+        header, turns = split_record(record)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT header, turns FROM sessions WHERE id = ?", (session_id,)).fetchone()
+                stored = row[1] if row else 0
+                if stored:
+                    last = self._conn.execute(
+                        "SELECT turn FROM session_turns WHERE session_id = ? AND position = ?", (session_id, stored - 1)
+                    ).fetchone()
+                    if _rewritten(json.loads(row[0]).get("prompt"), last[0] if last else None, stored, record, turns):
+                        self._conn.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+                        stored = 0
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO session_turns (session_id, position, turn) VALUES (?, ?, ?)",
+                    [(session_id, position, _dumps(turns[position])) for position in range(stored, len(turns))]
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sessions (id, header, turns, touched) VALUES (?, ?, ?, ?)",
+                    (session_id, _dumps(header), len(turns), now)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._saves += 1
+            sweep = self._saves % self.EVICT_EVERY == 0
+        if sweep:
+            self.evict_expired()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._delete(session_id)
+
+    def _delete(self, session_id: str):
+        self._conn.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+        self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def evict_expired(self) -> int:
+        if self.ttl is None:
+            return 0
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "DELETE FROM session_turns WHERE session_id IN (SELECT id FROM sessions WHERE touched < ?)",
+                    (cutoff,)
+                )
+                removed = self._conn.execute("DELETE FROM sessions WHERE touched < ?", (cutoff,)).rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return removed
+
+def create_session_store() -> SessionStore:
+    """
+    Build the session store configured by the environment.
+
+    ``AISCRIBE_SESSION_DB`` selects a SQLite database shared across processes;
+    otherwise sessions stay in memory, bounded by ``AISCRIBE_SESSION_MAX``.
+    ``AISCRIBE_SESSION_TTL`` is the idle time in seconds before a session is evicted.
+    """
+    ttl = float(os.getenv("AISCRIBE_SESSION_TTL", "86400")) or None
+    path = os.getenv("AISCRIBE_SESSION_DB")
+    if path:
+        return SQLiteSessionStore(path, ttl=ttl)
+    return MemorySessionStore(max_sessions=int(os.getenv("AISCRIBE_SESSION_MAX", "10000")), ttl=ttl)
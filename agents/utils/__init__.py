@@ -1,3 +1,6 @@
-from .json_utils import extract_json_from_text, create_error_response
+from .json_utils import extract_json_from_text, create_error_response, iter_json_values, parse_model, StructuredOutputError
+from .schemas import PromptAnalysis, ModuleSuggestions, Question, ModuleRelevance, FusedTurn, FastStart, response_format
+from .streaming_json import StreamingJSONParser
+from .async_utils import run_async, get_background_loop, iterate_async
 
-__all__ = ['extract_json_from_text', 'create_error_response'] 
\ No newline at end of file
+__all__ = ['extract_json_from_text', 'create_error_response', 'iter_json_values', 'parse_model', 'StructuredOutputError', 'PromptAnalysis', 'ModuleSuggestions', 'Question', 'ModuleRelevance', 'FusedTurn', 'FastStart', 'response_format', 'run_async', 'get_background_loop', 'iterate_async', 'StreamingJSONParser']
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide event loop, starting its thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=_loop.run_forever,
+                name="aiscribe-event-loop",
+                daemon=True
+            )
+            thread.start()
+        return _loop
+
+def run_async(coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+    """
+    Run a coroutine on the shared background loop and wait for its result.
+    
+    Unlike ``asyncio.run``, the loop outlives the call, so async HTTP
+    connections and in-flight tasks from other sessions are preserved.
+    
+    Args:
+        coro: The coroutine to run
+        timeout: Optional number of seconds to wait for the result
+        
+    Returns:
+        The coroutine's result
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_background_loop())
+    return future.result(timeout)
+
+def iterate_async(iterator: AsyncIterator[T]) -> Iterator[T]:
+    """
+    Consume an async iterator from synchronous code, one item at a time.
+    
+    Each item is pulled on the shared background loop, so the caller can
+    render items as soon as they arrive.
+    
+    Args:
+        iterator: The async iterator to consume
+        
+    Yields:
+        The iterator's items
+    """
+    async def next_item():
+        try:
+            return False, await iterator.__anext__()
+        except StopAsyncIteration:
+            return True, None
+    
+    while True:
+        done, item = run_async(next_item())
+        if done:
+            return
+        yield item
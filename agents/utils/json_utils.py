@@ -1,20 +1,74 @@
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+M = TypeVar("M", bound=BaseModel)
+
+_decoder = json.JSONDecoder()
+
+class StructuredOutputError(ValueError):
+    """A completion could not be validated into the requested result model."""
+
+    def __init__(self, stage: str, text: str):
+        super().__init__(f"{stage} completion did not match its schema")
+        self.stage = stage
+        self.text = text
+
+def iter_json_values(text: str, openers: str = "{[") -> Iterator[Any]:
+    """
+    Yield every complete JSON value embedded in text, outermost first.
+
+    Unlike slicing from the first ``{`` to the last ``}``, stray braces in the
+    surrounding prose and several objects in one response are handled.
+
+    Args:
+        text: Text with embedded JSON
+        openers: Characters a value may start with; ``{`` for objects only
+    """
+    position = 0
+    while True:
+        starts = [index for index in (text.find(opener, position) for opener in openers) if index >= 0]
+        if not starts:
+            return
+        start = min(starts)
+        try:
+            value, end = _decoder.raw_decode(text, start)
+        except ValueError:
+            position = start + 1
+            continue
+        yield value
+        position = end
 
 def extract_json_from_text(text: str) -> Optional[Dict[str, Any]]:
     """Extract JSON object from text response."""
+    return next(iter_json_values(text, "{"), None)
+
+def parse_model(text: str, model: Type[M]) -> Optional[M]:
+    """
+    Validate a completion into a result model.
+
+    Args:
+        text: The completion text; a bare JSON document or JSON embedded in prose
+        model: The pydantic model to validate into
+
+    Returns:
+        The first embedded object that validates, or None if none does
+    """
     try:
-        json_start = text.find('{')
-        json_end = text.rfind('}') + 1
-        if json_start >= 0 and json_end > json_start:
-            return json.loads(text[json_start:json_end])
-        return None
-    except Exception:
-        return None
+        return model.model_validate_json(text)
+    except ValidationError:
+        pass
+    for value in iter_json_values(text, "{"):
+        try:
+            return model.model_validate(value)
+        except ValidationError:
+            continue
+    return None
 
 def create_error_response(error_msg: str, raw_response: str) -> Dict[str, str]:
     """Create standardized error response."""
     return {
         "error": error_msg,
         "raw_response": raw_response
-    } 
\ No newline at end of file
+    }
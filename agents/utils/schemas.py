@@ -0,0 +1,133 @@
+import copy
+from typing import Any, Dict, List, Type
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+MODULE_NAMES = ("character", "setting", "atmosphere", "action")
+
+class _Output(BaseModel):
+    """Base of every model the completions are validated into."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Dump to the plain dict shape the pipeline passes around."""
+        return self.model_dump(by_alias=True)
+
+class CategorizedElements(_Output):
+    """Prompt elements grouped by the module that covers them."""
+
+    characters: List[str] = Field(default_factory=list, alias="Characters")
+    places: List[str] = Field(default_factory=list, alias="Places")
+    actions: List[str] = Field(default_factory=list, alias="Actions/Processes")
+    emotions_style: List[str] = Field(default_factory=list, alias="Emotions/Style")
+
+class PromptAnalysis(_Output):
+    """Structured breakdown of a text-to-image prompt."""
+
+    keywords: List[str] = Field(default_factory=list)
+    categorized_elements: CategorizedElements = Field(default_factory=CategorizedElements)
+    atmosphere: str = ""
+    missing_elements: List[str] = Field(default_factory=list)
+    suggestions: List[str] = Field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Module activation keys off which categories are present, so leave out empty ones
+        data = super().to_dict()
+        data["categorized_elements"] = {name: elements for name, elements in data["categorized_elements"].items() if elements}
+        return data
+
+class IndexedPromptAnalysis(PromptAnalysis):
+    """Analysis of one prompt in a batch, tagged with the prompt's position."""
+
+    index: int
+
+class PromptAnalysisBatch(_Output):
+    """Analyses of several prompts answered in one completion."""
+
+    analyses: List[IndexedPromptAnalysis] = Field(default_factory=list)
+
+class ModuleSuggestion(_Output):
+    """Questions and suggestions for one active module."""
+
+    module: str
+    questions: List[str] = Field(default_factory=list)
+    suggestions: List[str] = Field(default_factory=list)
+
+class ModuleSuggestions(_Output):
+    """Modules to activate and what to ask in each of them."""
+
+    active_modules: List[str] = Field(default_factory=list)
+    modules: List[ModuleSuggestion] = Field(default_factory=list)
+    additional_modules: List[str] = Field(default_factory=list)
+
+class Question(_Output):
+    """A question shown to the user, with answer options and examples."""
+
+    question: str
+    options: List[str] = Field(default_factory=list)
+    examples: List[str] = Field(default_factory=list)
+    module: str = "general"
+    category: str = "general"
+
+class ModuleRelevance(_Output):
+    """How relevant a response is to each module, from 0.0 to 1.0."""
+
+    character: float = 0.0
+    setting: float = 0.0
+    atmosphere: float = 0.0
+    action: float = 0.0
+
+    @field_validator(*MODULE_NAMES)
+    @classmethod
+    def _clamp(cls, value: float) -> float:
+        return min(max(value, 0.0), 1.0)
+
+class FusedTurn(_Output):
+    """Relevance of the latest response together with the next question."""
+
+    relevance: ModuleRelevance
+    next_question: Question
+
+class FastStart(_Output):
+    """Analysis of a new prompt together with the first question to ask about it."""
+
+    analysis: PromptAnalysis
+    initial_question: Question
+
+def _strict(schema: Any):
+    # Structured outputs require every property and reject unknown ones
+    if isinstance(schema, dict):
+        schema.pop("default", None)
+        if schema.get("type") == "object" and "properties" in schema:
+            schema["additionalProperties"] = False
+            schema["required"] = list(schema["properties"])
+            for value in schema["properties"].values():
+                _strict(value)
+        for key, value in schema.items():
+            if key != "properties":
+                _strict(value)
+    elif isinstance(schema, list):
+        for value in schema:
+            _strict(value)
+
+_formats: Dict[Type[BaseModel], Dict[str, Any]] = {}
+
+def response_format(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Build the ``response_format`` that constrains a completion to a model's JSON schema.
+
+    Args:
+        model: The pydantic model the completion is validated into
+
+    Returns:
+        A strict ``json_schema`` response format for the completions API
+    """
+    if model not in _formats:
+        schema = copy.deepcopy(model.model_json_schema(by_alias=True))
+        _strict(schema)
+        _formats[model] = {
+            "type": "json_schema",
+            "json_schema": {"name": model.__name__, "schema": schema, "strict": True}
+        }
+    return _formats[model]
@@ -0,0 +1,252 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+# A completed value and its location: a path of object keys and array indices from the root
+JSONEvent = Tuple[Tuple[Any, ...], Any]
+
+_WHITESPACE = " \t\r\n"
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+class _Frame:
+    __slots__ = ("container", "path", "key", "expect")
+
+    def __init__(self, container: Any, path: Tuple[Any, ...]):
+        self.container = container
+        self.path = path
+        self.key: Optional[str] = None
+        # Objects expect: key, colon, value, comma; arrays expect: value, comma
+        self.expect = "key" if isinstance(container, dict) else "value"
+
+class StreamingJSONParser:
+    """Incremental parser that reports JSON values as soon as each one is complete.
+
+    Text before the object and after its matching ``}`` is ignored, so model
+    prose around the object does not matter. The object starts at the first
+    ``{`` followed, after optional whitespace, by a ``"`` or ``}``, so braces
+    in the prose are skipped. Only the value currently being
+    read is buffered; completed values are placed straight into the result.
+    """
+
+    def __init__(self, max_depth: int = 2):
+        self.max_depth = max_depth
+        self.result: Optional[Any] = None
+        self.error: Optional[str] = None
+        self.done = False
+        self._started = False
+        # Whether the last significant character before the object was a "{"
+        self._candidate = False
+        self._stack: List[_Frame] = []
+        self._offset = 0
+        self._in_string = False
+        self._escape: Optional[str] = None
+        # High half of a surrogate pair waiting for its low half
+        self._high_surrogate: Optional[int] = None
+        self._buffer: List[str] = []
+        self._scalar: List[str] = []
+
+    @property
+    def failed(self) -> bool:
+        """Whether the stream contained invalid JSON."""
+        return self.error is not None
+
+    def feed(self, chunk: str) -> List[JSONEvent]:
+        """
+        Consume the next chunk of streamed text.
+
+        Args:
+            chunk: The next piece of the response
+
+        Returns:
+            Events for values completed within this chunk, innermost first; the
+            root object is reported with an empty path
+        """
+        events: List[JSONEvent] = []
+        for char in chunk:
+            if self.done or self.error is not None:
+                break
+            self._offset += 1
+            if not self._started:
+                if char == "{":
+                    self._candidate = True
+                elif self._candidate and char in '"}':
+                    self._started = True
+                    self._open({}, events)
+                    self._structural_char(char, events)
+                elif char not in _WHITESPACE:
+                    self._candidate = False
+                continue
+            if self._in_string:
+                self._string_char(char, events)
+                continue
+            self._structural_char(char, events)
+        return events
+
+    def close(self) -> Optional[Any]:
+        """
+        Finish parsing once the stream has ended.
+
+        Returns:
+            The parsed root object, or None if it is missing or incomplete (see ``error``)
+        """
+        if not self.done and self.error is None:
+            self.error = "JSON object was not closed" if self._started else "No JSON object found"
+        return self.result if self.done else None
+
+    def _fail(self, message: str):
+        self.error = f"{message} at offset {self._offset}"
+
+    def _string_char(self, char: str, events: List[JSONEvent]):
+        if self._escape is not None:
+            if self._escape == "":
+                if char == "u":
+                    self._escape = "u"
+                    return
+                if char not in _ESCAPES:
+                    self._fail(f"Invalid escape '\\{char}'")
+                    return
+                self._flush_surrogate()
+                self._buffer.append(_ESCAPES[char])
+                self._escape = None
+                return
+            # Collecting the four hex digits of a \\u escape
+            self._escape += char
+            if len(self._escape) == 5:
+                try:
+                    self._code_point(int(self._escape[1:], 16))
+                except ValueError:
+                    self._fail("Invalid unicode escape")
+                self._escape = None
+            return
+        if char == "\\":
+            self._escape = ""
+            return
+        self._flush_surrogate()
+        if char == '"':
+            self._in_string = False
+            text = "".join(self._buffer)
+            self._buffer = []
+            frame = self._stack[-1]
+            if frame.expect == "key":
+                frame.key = text
+                frame.expect = "colon"
+            else:
+                self._value(text, events)
+        else:
+            self._buffer.append(char)
+
+    def _code_point(self, code: int):
+        high = self._high_surrogate
+        if high is not None and 0xDC00 <= code <= 0xDFFF:
+            # Characters outside the BMP arrive as a pair of \\u escapes
+            self._high_surrogate = None
+            self._buffer.append(chr(0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00)))
+            return
+        self._flush_surrogate()
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = code
+        else:
+            self._buffer.append(chr(code))
+
+    def _flush_surrogate(self):
+        # An unpaired high surrogate is kept as is, like json.loads does
+        if self._high_surrogate is not None:
+            self._buffer.append(chr(self._high_surrogate))
+            self._high_surrogate = None
+
+    def _structural_char(self, char: str, events: List[JSONEvent]):
+        frame = self._stack[-1]
+        if char in _WHITESPACE:
+            self._end_scalar(events)
+        elif char == '"':
+            # A scalar still being read, e.g. the 1 in [1"x"], must end before a string
+            if frame.expect not in ("key", "value") or self._scalar:
+                self._fail("Unexpected string")
+                return
+            self._in_string = True
+        elif char == ":":
+            if frame.expect != "colon":
+                self._fail("Unexpected ':'")
+                return
+            frame.expect = "value"
+        elif char == ",":
+            self._end_scalar(events)
+            if self.error is None and self._stack[-1].expect != "comma":
+                self._fail("Unexpected ','")
+                return
+            frame = self._stack[-1]
+            frame.expect = "key" if isinstance(frame.container, dict) else "value"
+        elif char in "{[":
+            if frame.expect != "value" or self._scalar:
+                self._fail(f"Unexpected '{char}'")
+                return
+            self._open({} if char == "{" else [], events)
+        elif char in "}]":
+            self._end_scalar(events)
+            if self.error is None:
+                self._close(char, events)
+        else:
+            if frame.expect != "value":
+                self._fail(f"Unexpected '{char}'")
+                return
+            self._scalar.append(char)
+
+    def _end_scalar(self, events: List[JSONEvent]):
+        if not self._scalar:
+            return
+        text = "".join(self._scalar)
+        self._scalar = []
+        try:
+            value = json.loads(text)
+        except ValueError:
+            self._fail(f"Invalid literal '{text}'")
+            return
+        self._value(value, events)
+
+    def _child_path(self) -> Tuple[Any, ...]:
+        frame = self._stack[-1]
+        if isinstance(frame.container, dict):
+            return frame.path + (frame.key,)
+        return frame.path + (len(frame.container),)
+
+    def _attach(self, value: Any):
+        frame = self._stack[-1]
+        if isinstance(frame.container, dict):
+            frame.container[frame.key] = value
+        else:
+            frame.container.append(value)
+        frame.expect = "comma"
+
+    def _open(self, container: Any, events: List[JSONEvent]):
+        if not self._stack:
+            self.result = container
+            self._stack.append(_Frame(container, ()))
+            return
+        path = self._child_path()
+        self._attach(container)
+        self._stack.append(_Frame(container, path))
+
+    def _close(self, char: str, events: List[JSONEvent]):
+        frame = self._stack[-1]
+        is_object = isinstance(frame.container, dict)
+        if (char == "}") != is_object:
+            self._fail(f"Mismatched '{char}'")
+            return
+        # Empty containers close while expecting their first key or value; an
+        # object waiting for the value after a ':' holds nothing yet but is not empty
+        empty = not frame.container and frame.expect == ("key" if is_object else "value")
+        if frame.expect != "comma" and not empty:
+            self._fail(f"Unexpected '{char}'")
+            return
+        self._stack.pop()
+        self._emit(frame.path, frame.container, events)
+        if not self._stack:
+            self.done = True
+
+    def _value(self, value: Any, events: List[JSONEvent]):
+        path = self._child_path()
+        self._attach(value)
+        self._emit(path, value, events)
+
+    def _emit(self, path: Tuple[Any, ...], value: Any, events: List[JSONEvent]):
+        if len(path) <= self.max_depth:
+            events.append((path, value))
@@ -0,0 +1,49 @@
+import threading
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken is listed in requirements.txt
+    tiktoken = None
+
+_encodings: Dict[str, Optional["tiktoken.Encoding"]] = {}
+_lock = threading.Lock()
+
+# Rough characters-per-token ratio used when no tokenizer is available
+_CHARS_PER_TOKEN = 4
+
+def get_encoding(model: str) -> Optional["tiktoken.Encoding"]:
+    """
+    Get the tiktoken encoding for a model, or None if it cannot be loaded.
+    
+    Loading can fail when tiktoken is missing or its BPE files cannot be
+    downloaded; the failure is remembered so it is not retried on every call.
+    """
+    with _lock:
+        if model in _encodings:
+            return _encodings[model]
+        encoding = None
+        if tiktoken is not None:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                try:
+                    encoding = tiktoken.get_encoding("o200k_base")
+                except Exception:
+                    encoding = None
+            except Exception:
+                encoding = None
+        _encodings[model] = encoding
+        return encoding
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Count the tokens in a text, estimating from its length if no tokenizer is available."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+def count_message_tokens(messages: List[Dict[str, str]], model: str = "gpt-4o-mini") -> int:
+    """Count the prompt tokens of a chat message list, including per-message overhead."""
+    # Each message carries a few tokens of role and separator framing
+    return sum(count_tokens(message.get("content") or "", model) + 4 for message in messages) + 2
@@ -0,0 +1,9 @@
+import os
+from dotenv import load_dotenv
+from agents.api import create_app
+
+# Load environment variables
+load_dotenv()
+
+# Serve with any ASGI server, e.g. `uvicorn api:app --workers 4`
+app = create_app(max_questions=int(os.getenv("AISCRIBE_MAX_QUESTIONS", "5")))
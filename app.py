@@ -1,15 +1,43 @@
 import streamlit as st
-import asyncio
 from dotenv import load_dotenv
 import os
+import uuid
 from agents.prompt import PromptAnalysisAgent
 from agents.module import ModuleSuggestionAgent
-from agents.question import DynamicQuestionAgent
+from agents.question import DynamicQuestionAgent, create_session_store
+from agents.base import get_registry, get_metrics, current_session, end_session_trace
+from agents.utils import run_async, iterate_async, get_background_loop
 
 # Load environment variables
 load_dotenv()
 os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
 
+@st.cache_resource
+def warm_up_clients():
+    """Pre-connect the shared client pool once per process."""
+    registry = get_registry()
+    if registry.config.prewarm_connections:
+        run_async(registry.warm_up())
+    return registry
+
+warm_up_clients()
+
+@st.cache_resource
+def get_session_store():
+    """Open the session store once per process."""
+    return create_session_store()
+
+def save_session():
+    """Persist the session so a reload, restart or another worker can resume it."""
+    get_session_store().save(st.session_state.session_id, {
+        "prompt": st.session_state.initial_prompt,
+        "state": st.session_state.agents['questioner'].session.get_session_state(),
+        "question": st.session_state.current_question,
+        "question_count": st.session_state.question_count,
+        "final_prompt": st.session_state.final_prompt
+    })
+    st.query_params["session"] = st.session_state.session_id
+
 # Custom CSS
 st.markdown("""
     <style>
@@ -98,20 +126,50 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize session state
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+# Attribute every completion made during this run to the browser session
+current_session.set(st.session_state.session_id)
 if 'current_question' not in st.session_state:
     st.session_state.current_question = None
 if 'agents' not in st.session_state:
     st.session_state.agents = {
         'analyzer': PromptAnalysisAgent(),
         'suggester': ModuleSuggestionAgent(),
-        'questioner': DynamicQuestionAgent()
+        'questioner': DynamicQuestionAgent(
+            speculative=os.getenv("AISCRIBE_SPECULATIVE", "0") == "1",
+            fused_turns=os.getenv("AISCRIBE_FUSED_TURNS", "0") == "1"
+        )
     }
 if 'responses' not in st.session_state:
     st.session_state.responses = []
 if 'final_prompt' not in st.session_state:
     st.session_state.final_prompt = None
+if 'final_prompt_pending' not in st.session_state:
+    st.session_state.final_prompt_pending = False
 if 'question_count' not in st.session_state:
     st.session_state.question_count = 0
+if 'personalization' not in st.session_state:
+    st.session_state.personalization = None
+
+# Resume the session named in the URL when this browser session is new
+if 'restored' not in st.session_state:
+    st.session_state.restored = True
+    saved_id = st.query_params.get("session")
+    saved = get_session_store().load(saved_id) if saved_id else None
+    if saved:
+        st.session_state.session_id = saved_id
+        current_session.set(saved_id)
+        st.session_state.agents['questioner'].session.load_state(saved["state"])
+        st.session_state.initial_prompt = saved["prompt"]
+        st.session_state.current_question = saved["question"]
+        st.session_state.question_count = saved["question_count"]
+        st.session_state.final_prompt = saved["final_prompt"]
+        st.session_state.final_prompt_pending = saved["question"] is None and saved["final_prompt"] is None
+        st.session_state.responses = [
+            {'question': turn["question"].get("question"), 'answer': turn["response"]}
+            for turn in saved["state"]["question_history"]
+        ]
 
 # Constants
 MAX_QUESTIONS = 5
@@ -137,16 +195,48 @@ with col2:
         if st.button("🚀 Start Generation", use_container_width=True):
             with st.spinner("🔮 Analyzing your prompt..."):
                 async def initialize_session():
+                    if os.getenv("AISCRIBE_INSTANT_START", "0") == "1":
+                        # Template question now, personalized question once the model answers
+                        return await st.session_state.agents['questioner'].instant_start(
+                            initial_prompt,
+                            st.session_state.agents['suggester']
+                        )
+                    if os.getenv("AISCRIBE_FAST_START", "0") == "1":
+                        # One combined call for the analysis and the first question
+                        return await st.session_state.agents['questioner'].fast_start(
+                            initial_prompt,
+                            st.session_state.agents['suggester']
+                        )
                     analysis = await st.session_state.agents['analyzer'].analyze_prompt(initial_prompt)
-                    suggestions = await st.session_state.agents['suggester'].process_prompt_analysis(analysis)
-                    session = await st.session_state.agents['questioner'].process_module_suggestions(suggestions)
-                    return session['initial_question']
+                    suggestions = await st.session_state.agents['suggester'].process_prompt_analysis_lazy(analysis)
+                    return await st.session_state.agents['questioner'].process_module_suggestions(suggestions)
                 
+                # Every generation is a new stored session, so resuming never mixes in earlier turns
+                st.session_state.session_id = uuid.uuid4().hex
+                current_session.set(st.session_state.session_id)
+                st.session_state.responses = []
+                st.session_state.final_prompt = None
+                st.session_state.final_prompt_pending = False
+                session = run_async(initialize_session())
                 st.session_state.initial_prompt = initial_prompt
-                st.session_state.current_question = asyncio.run(initialize_session())
+                st.session_state.current_question = session['initial_question']
+                st.session_state.personalization = session.get('personalized')
                 st.session_state.question_count = 1
+                save_session()
                 st.rerun()
 
+# Show the personalized first question once it is ready, unless the user already picked an option
+pending = st.session_state.personalization
+if pending is not None and (pending.done() or st.session_state.get(f"radio_{st.session_state.question_count}") is not None):
+    st.session_state.personalization = None
+    if st.session_state.get(f"radio_{st.session_state.question_count}") is None:
+        personalized = pending.apply()
+        if personalized:
+            st.session_state.current_question = personalized
+            save_session()
+    else:
+        get_background_loop().call_soon_threadsafe(pending.cancel)
+
 # Display current question and options
 if st.session_state.current_question:
     st.markdown(f"""
@@ -169,6 +259,13 @@ if st.session_state.current_question:
         key=f"radio_{st.session_state.question_count}"
     )
     
+    # Start generating the follow-up for each option while the user reads
+    if st.session_state.question_count < MAX_QUESTIONS and st.session_state.personalization is None:
+        run_async(st.session_state.agents['questioner'].prefetch_next_questions(
+            st.session_state.current_question,
+            st.session_state.initial_prompt
+        ))
+    
     # Show example
     with st.expander("💡 See example response"):
         st.write(st.session_state.current_question['examples'][0])
@@ -179,44 +276,54 @@ if st.session_state.current_question:
         if st.button("✨ Submit Answer", key=f"submit_{st.session_state.question_count}", use_container_width=True):
             if selected_option:
                 with st.spinner("🔮 Processing your answer..."):
-                    async def process_answer():
-                        st.session_state.agents['questioner'].record_response(
-                            st.session_state.current_question,
-                            selected_option
-                        )
-                        
-                        if st.session_state.question_count < MAX_QUESTIONS:
-                            next_question = await st.session_state.agents['questioner'].generate_next_question({
-                                "question": st.session_state.current_question,
-                                "response": selected_option,
-                                "initial_prompt": st.session_state.initial_prompt
-                            })
-                        else:
-                            next_question = None
-                        
-                        return next_question
+                    st.session_state.agents['questioner'].record_response(
+                        st.session_state.current_question,
+                        selected_option
+                    )
                     
                     st.session_state.responses.append({
                         'question': st.session_state.current_question['question'],
                         'answer': selected_option
                     })
                     
-                    next_q = asyncio.run(process_answer())
+                    next_q = None
+                    if st.session_state.question_count < MAX_QUESTIONS:
+                        # Show the question text and each option as soon as they stream in
+                        preview = st.empty()
+                        partial = {'question': '', 'options': []}
+                        for path, value in iterate_async(st.session_state.agents['questioner'].stream_next_question({
+                            "question": st.session_state.current_question,
+                            "response": selected_option,
+                            "initial_prompt": st.session_state.initial_prompt
+                        })):
+                            if not path:
+                                next_q = value
+                                continue
+                            if path == ('question',):
+                                partial['question'] = value
+                            elif path[0] == 'options' and len(path) == 2:
+                                partial['options'].append(value)
+                            else:
+                                continue
+                            preview.markdown(
+                                f"### 💭 {partial['question']}\n\n"
+                                + "\n".join(f"- {option}" for option in partial['options'])
+                            )
+                    
                     if next_q and st.session_state.question_count < MAX_QUESTIONS:
                         st.session_state.current_question = next_q
                         st.session_state.question_count += 1
                     else:
                         st.session_state.current_question = None
-                        async def get_final_prompt():
-                            return await st.session_state.agents['questioner'].generate_final_prompt()
-                        
-                        st.session_state.final_prompt = asyncio.run(get_final_prompt())
+                        # The final prompt is streamed in when the page reruns
+                        st.session_state.final_prompt_pending = True
+                    save_session()
                     st.rerun()
             else:
                 st.warning("⚠️ Please select an option before submitting.")
 
 # Display final prompt
-if st.session_state.final_prompt:
+if st.session_state.final_prompt or st.session_state.final_prompt_pending:
     st.markdown("""
         <div style="text-align: center; margin: 2rem 0;">
             <h2>🎨 Your Generated Prompt</h2>
@@ -224,15 +331,26 @@ if st.session_state.final_prompt:
     """, unsafe_allow_html=True)
     
     st.markdown('<div class="success-box">', unsafe_allow_html=True)
-    st.markdown(f"✨ {st.session_state.final_prompt}", unsafe_allow_html=True)
+    if st.session_state.final_prompt_pending:
+        # Render the final prompt token by token as it is generated
+        st.session_state.final_prompt = st.write_stream(
+            iterate_async(st.session_state.agents['questioner'].stream_final_prompt(initial_prompt=st.session_state.initial_prompt))
+        )
+        st.session_state.final_prompt_pending = False
+        save_session()
+    else:
+        st.markdown(f"✨ {st.session_state.final_prompt}", unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Reset button
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         if st.button("🔄 Start Over", use_container_width=True):
+            end_session_trace(st.session_state.session_id)
             for key in st.session_state.keys():
                 del st.session_state[key]
+            st.query_params.clear()
+            st.session_state.restored = True
             st.rerun()
 
 # Display response history
@@ -244,4 +362,48 @@ if st.session_state.responses:
                     <strong>Q{i}:</strong> {qa['question']}<br>
                     <strong>A{i}:</strong> {qa['answer']}
                 </div>
-            """, unsafe_allow_html=True) 
\ No newline at end of file
+            """, unsafe_allow_html=True) 
+
+# Optional operator view of per-stage latency, tokens and cost
+if os.getenv("AISCRIBE_ADMIN", "0") == "1":
+    with st.sidebar:
+        st.markdown("### 📊 Completion Metrics")
+        metrics = get_metrics()
+        stages = metrics.stage_summary()
+        if stages:
+            st.table({
+                stage: {
+                    "calls": summary["calls"],
+                    "cached": summary["cached"],
+                    "p50 (s)": round(summary["p50"], 3),
+                    "p95 (s)": round(summary["p95"], 3),
+                    "p99 (s)": round(summary["p99"], 3),
+                    "tokens": summary["prompt_tokens"] + summary["completion_tokens"],
+                    "cost ($)": summary["cost_usd"],
+                    "wasted": summary["wasted_calls"]
+                }
+                for stage, summary in stages.items()
+            })
+        else:
+            st.write("No completions recorded yet.")
+        st.markdown("#### This session")
+        st.json(metrics.session_summary(st.session_state.session_id), expanded=False)
+        st.markdown("#### Pool and cache")
+        st.json({
+            "pool": get_registry().pool_stats(),
+            "cache": get_registry().cache.stats(),
+            "rate_limit": get_registry().rate_limit_stats(),
+            "latency": get_registry().latency_stats(),
+            "routing": get_registry().routing_stats(),
+            "prefetch": st.session_state.agents['questioner'].get_prefetch_stats(),
+            "analysis_batching": batcher.stats() if (batcher := st.session_state.agents['analyzer'].batcher) else None
+        }, expanded=False)
+        st.download_button("Prometheus metrics", metrics.to_prometheus(), file_name="aiscribe_metrics.prom")
+        st.download_button("Call records (JSONL)", metrics.to_jsonl(), file_name="aiscribe_calls.jsonl")
+
+# Wait for the personalized first question in short slices, so any interaction reruns the page right away
+if st.session_state.personalization is not None and st.session_state.current_question:
+    heartbeat = st.empty()
+    while not run_async(st.session_state.personalization.wait(0.1)):
+        heartbeat.empty()
+    st.rerun()
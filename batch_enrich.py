@@ -0,0 +1,57 @@
+import argparse
+import asyncio
+import sys
+from dotenv import load_dotenv
+from agents.batch import BatchRunner, get_policy, iter_items
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Enrich a corpus of prompts through the full agent pipeline without the UI.")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL or plain-text file of prompts, or '-' for stdin")
+    parser.add_argument("-o", "--output", default="enriched_prompts.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("-p", "--policy", default="first", help="Answer policy: first, random[:seed] or scripted:<answers.json>")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Maximum number of sessions in flight")
+    parser.add_argument("-q", "--max-questions", type=int, default=5, help="Questions answered per session")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of skipping completed prompts")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the response cache")
+    parser.add_argument("--fused-turns", action="store_true", help="Analyze each answer and generate the next question in one call")
+    return parser.parse_args()
+
+def print_summary(summary):
+    print(f"\nCompleted: {summary['completed']}  Failed: {summary['failed']}  "
+          f"Elapsed: {summary['elapsed_seconds']:.1f}s  Throughput: {summary['sessions_per_second']:.2f} sessions/s",
+          file=sys.stderr)
+    print(f"\n{'stage':<22}{'calls':>8}{'cached':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'tokens':>10}{'cost $':>10}", file=sys.stderr)
+    for stage, stats in summary["stages"].items():
+        print(f"{stage:<22}{stats['calls']:>8}{stats['cached']:>8}"
+              f"{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['p99']:>9.3f}"
+              f"{stats['prompt_tokens'] + stats['completion_tokens']:>10}{stats['cost_usd']:>10.4f}",
+              file=sys.stderr)
+
+async def main():
+    args = parse_args()
+    load_dotenv()
+    
+    runner = BatchRunner(
+        policy=get_policy(args.policy),
+        concurrency=args.concurrency,
+        max_questions=args.max_questions,
+        use_cache=not args.no_cache,
+        question_agent_options={"fused_turns": args.fused_turns}
+    )
+    
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        summary = await runner.run(iter_items(source), args.output, resume=not args.no_resume)
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("\nInterrupted; rerun the same command to resume.", file=sys.stderr)
+        summary = runner.summary()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print_summary(summary)
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        sys.exit(130)
@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import os
+import sys
+import threading
+from typing import Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.base.model_transport import LatencyModel, StubTransport
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+class FakeCompletionServer:
+    """
+    Local HTTP server speaking the chat completions API, answered by a StubTransport.
+
+    Unlike the in-process stub, requests go through real sockets and the shared
+    connection pool, so load tests see connection reuse, pool waits and retries
+    the way they happen against the live API.
+    """
+
+    def __init__(self, transport: StubTransport, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            transport: Produces the responses, with their latency and injected errors
+            host: Interface to listen on
+            port: Port to listen on; 0 picks a free one
+        """
+        self.transport = transport
+        self.host = host
+        self.port = port
+        self.connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def base_url(self) -> str:
+        """URL to use as ``OPENAI_BASE_URL``."""
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self):
+        """Start listening on the current event loop."""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stop listening and close the server."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def start_in_thread(self) -> str:
+        """
+        Serve from a daemon thread with its own event loop.
+
+        Returns:
+            The server's base URL
+        """
+        started = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=serve, name="fake-completion-server", daemon=True).start()
+        started.wait()
+        return self.base_url
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            # Keep-alive: serve requests on this connection until the client closes it
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+
+                request = httpx.Request(method, f"http://{self.host}:{self.port}{target}", headers=headers, content=body)
+                response = await self.transport.handle_async_request(request)
+                content = await response.aread()
+                head = [f"HTTP/1.1 {response.status_code} {_REASONS.get(response.status_code, 'Unknown')}"]
+                head += [f"{name}: {value}" for name, value in response.headers.items() if name.lower() != "content-length"]
+                head.append(f"content-length: {len(content)}")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + content)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve canned chat completions locally with simulated latency and errors.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="lognormal:0.8:0.4", help="Completion latency, e.g. fixed:0.5 or lognormal:0.8:0.4")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of completions failing with 429, 500 or 503")
+    parser.add_argument("--rpm", type=float, default=0.0, help="Request limit; requests over it get a 429 with retry-after")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="retry-after seconds sent with 429 errors")
+    args = parser.parse_args()
+
+    server = FakeCompletionServer(
+        StubTransport(
+            LatencyModel.parse(args.latency),
+            error_rate=args.error_rate,
+            retry_after=args.retry_after,
+            requests_per_minute=args.rpm
+        ),
+        host=args.host,
+        port=args.port
+    )
+
+    async def serve():
+        await server.start()
+        print(f"Serving fake completions at {server.base_url} (set OPENAI_BASE_URL to use it)")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.base import client_registry, get_metrics, get_registry, session_scope
+from agents.base.model_transport import LatencyModel, StubTransport
+from agents.batch import AnswerPolicy, RandomOptionPolicy
+from agents.module import ModuleSuggestionAgent
+from agents.prompt import PromptAnalysisAgent
+from agents.question import DynamicQuestionAgent
+from fake_completion_server import FakeCompletionServer
+
+MAX_QUESTIONS = 5
+
+SUBJECTS = ["an old lighthouse keeper", "a fox in a winter coat", "a cyberpunk street vendor", "twin astronauts",
+            "a samurai at rest", "a child with a paper kite", "a clockwork dragon", "a desert caravan"]
+PLACES = ["on a stormy coast", "in a neon-lit alley", "under a glass dome on Mars", "in a bamboo forest",
+          "at a floating market", "inside a sunken cathedral", "on a frozen lake", "in a rooftop garden"]
+STYLES = ["watercolor", "cinematic still", "ukiyo-e print", "low-poly render", "oil painting", "35mm photograph"]
+
+def make_prompt(rng: random.Random, number: int) -> str:
+    """Build a varied prompt so sessions do not share cached analyses."""
+    return f"{rng.choice(SUBJECTS)} {rng.choice(PLACES)}, {rng.choice(STYLES)}, scene {number}"
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+class AgentDriver:
+    """Drives the agent classes directly, the way the Streamlit app does."""
+
+    def __init__(self, max_questions: int, use_cache: bool):
+        self.max_questions = max_questions
+        self.use_cache = use_cache
+        self.analyzer = PromptAnalysisAgent()
+        self.suggester = ModuleSuggestionAgent()
+
+    async def start(self, prompt: str) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        questioner = DynamicQuestionAgent()
+        analysis = await self.analyzer.analyze_prompt(prompt, use_cache=self.use_cache)
+        suggestions = await self.suggester.process_prompt_analysis_lazy(analysis, use_cache=self.use_cache)
+        session = await questioner.process_module_suggestions(suggestions, use_cache=self.use_cache)
+        return (questioner, prompt), session["initial_question"]
+
+    async def answer(self, state: Any, question: Dict[str, Any], answer: str, number: int) -> Optional[Dict[str, Any]]:
+        questioner, prompt = state
+        questioner.record_response(question, answer)
+        if number >= self.max_questions:
+            return None
+        return await questioner.generate_next_question(
+            {"question": question, "response": answer, "initial_prompt": prompt},
+            use_cache=self.use_cache
+        )
+
+    async def final(self, state: Any) -> str:
+        questioner, prompt = state
+        return await questioner.generate_final_prompt(use_cache=self.use_cache, initial_prompt=prompt)
+
+    async def aclose(self):
+        pass
+
+class APIDriver:
+    """Drives the HTTP API, either in this process or on a running worker."""
+
+    def __init__(self, max_questions: int, url: Optional[str] = None):
+        if url:
+            self.client = httpx.AsyncClient(base_url=url, timeout=120)
+        else:
+            from agents.api import create_app
+            app = create_app(max_questions=max_questions)
+            self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api", timeout=120)
+
+    async def _call(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        response = await self.client.request(method, path, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def start(self, prompt: str) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        session = await self._call("POST", "/sessions", json={"prompt": prompt})
+        return session["session_id"], session["question"]
+
+    async def answer(self, state: Any, question: Dict[str, Any], answer: str, number: int) -> Optional[Dict[str, Any]]:
+        session = await self._call("POST", f"/sessions/{state}/answers", json={"answer": answer, "question_number": number})
+        return session["question"]
+
+    async def final(self, state: Any) -> str:
+        return (await self._call("GET", f"/sessions/{state}/final-prompt"))["final_prompt"]
+
+    async def aclose(self):
+        await self.client.aclose()
+
+class StepStats:
+    """Turn latencies, completed sessions and errors of one ramp step."""
+
+    def __init__(self, users: int):
+        self.users = users
+        self.turns: Dict[str, List[float]] = {"start": [], "answer": [], "final": []}
+        self.sessions = 0
+        self.errors: Dict[str, int] = {}
+        self.loop_lag: List[float] = []
+        self.elapsed = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        every_turn = [latency for latencies in self.turns.values() for latency in latencies]
+        result = {
+            "users": self.users,
+            "sessions_per_second": self.sessions / self.elapsed if self.elapsed else 0.0,
+            "turns_per_second": len(every_turn) / self.elapsed if self.elapsed else 0.0,
+            "turn_p50_ms": 1000 * percentile(every_turn, 0.5),
+            "turn_p99_ms": 1000 * percentile(every_turn, 0.99),
+            "errors": sum(self.errors.values()),
+            "error_types": self.errors,
+            "loop_lag_p99_ms": 1000 * percentile(self.loop_lag, 0.99),
+            "loop_lag_max_ms": 1000 * max(self.loop_lag, default=0.0)
+        }
+        for kind, latencies in self.turns.items():
+            result[f"{kind}_p50_ms"] = 1000 * percentile(latencies, 0.5)
+            result[f"{kind}_p99_ms"] = 1000 * percentile(latencies, 0.99)
+        return result
+
+async def virtual_user(
+    driver: Any,
+    stats: StepStats,
+    policy: AnswerPolicy,
+    think: LatencyModel,
+    max_questions: int,
+    rng: random.Random,
+    first_session: int,
+    deadline: float
+):
+    """Run sessions back to back until the deadline: prompt, answers with think time, then the final prompt."""
+    def record(kind: str, started: float):
+        finished = time.perf_counter()
+        # Turns finishing after the deadline are drained but not counted
+        if finished <= deadline:
+            stats.turns[kind].append(finished - started)
+
+    async def think_time() -> bool:
+        await asyncio.sleep(min(think.sample(), max(deadline - time.perf_counter(), 0.0)))
+        return time.perf_counter() < deadline
+
+    number = first_session
+    while time.perf_counter() < deadline:
+        number += 1
+        prompt = make_prompt(rng, number)
+        # Attributes calls to the session, so the rate limiter queues sessions fairly
+        session_id = f"load-{number}"
+        scope = session_scope(session_id)
+        scope.__enter__()
+        try:
+            started = time.perf_counter()
+            state, question = await driver.start(prompt)
+            record("start", started)
+            asked = 1 if question else 0
+            while question:
+                if not await think_time():
+                    return
+                answer = policy.choose(question, prompt, session_id)
+                started = time.perf_counter()
+                question = await driver.answer(state, question, answer, asked)
+                record("answer", started)
+                if question:
+                    asked += 1
+                    if asked > max_questions:
+                        break
+            if not await think_time():
+                return
+            started = time.perf_counter()
+            await driver.final(state)
+            record("final", started)
+            if time.perf_counter() <= deadline:
+                stats.sessions += 1
+        except Exception as e:
+            name = type(e).__name__
+            stats.errors[name] = stats.errors.get(name, 0) + 1
+        finally:
+            policy.finish(session_id)
+            scope.__exit__(None, None, None)
+
+async def monitor_loop_lag(samples: List[float], interval: float = 0.05):
+    """Record how late the event loop wakes a sleeping task."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(time.perf_counter() - started - interval, 0.0))
+
+async def run_step(driver: Any, users: int, duration: float, args, seed: int) -> StepStats:
+    stats = StepStats(users)
+    get_metrics().reset()
+    monitor = asyncio.create_task(monitor_loop_lag(stats.loop_lag))
+    started = time.perf_counter()
+    deadline = started + duration
+    # Users stop at the deadline instead of being cancelled mid-request,
+    # which would measure connection teardown rather than the pipeline
+    await asyncio.gather(*(
+        virtual_user(
+            driver, stats, RandomOptionPolicy(seed + index), LatencyModel.parse(args.think, seed=seed + index),
+            args.max_questions, random.Random(seed + index), (seed + index) * 100_000, deadline
+        )
+        for index in range(users)
+    ))
+    stats.elapsed = duration
+    monitor.cancel()
+    return stats
+
+def find_saturation(steps: List[Dict[str, Any]], min_scaling: float, p99_slo: Optional[float]) -> Optional[int]:
+    """
+    Find the last user count before throughput stops scaling or the p99 turn latency breaks the SLO.
+
+    Scaling compares each step's throughput growth with its growth in users; a step
+    whose throughput grows by less than ``min_scaling`` of that is saturated.
+
+    Returns:
+        The user count at the saturation point, or None if every step still scaled
+    """
+    for previous, step in zip(steps, steps[1:]):
+        expected = step["users"] / previous["users"]
+        actual = step["turns_per_second"] / previous["turns_per_second"] if previous["turns_per_second"] else 0.0
+        scaling = (actual - 1) / (expected - 1) if expected > 1 else 1.0
+        if scaling < min_scaling or (p99_slo and step["turn_p99_ms"] > 1000 * p99_slo):
+            return previous["users"]
+    if steps and p99_slo and steps[0]["turn_p99_ms"] > 1000 * p99_slo:
+        return 0
+    return None
+
+def print_report(steps: List[Dict[str, Any]], saturation: Optional[int], server: Optional[FakeCompletionServer]):
+    columns = ["users", "sess/s", "turns/s", "p50 ms", "p99 ms", "start p99", "answer p99", "final p99", "errors", "lag p99", "lag max"]
+    print("\n" + "".join(f"{column:>12}" for column in columns))
+    for step in steps:
+        values = [step["users"], step["sessions_per_second"], step["turns_per_second"], step["turn_p50_ms"],
+                  step["turn_p99_ms"], step["start_p99_ms"], step["answer_p99_ms"], step["final_p99_ms"],
+                  step["errors"], step["loop_lag_p99_ms"], step["loop_lag_max_ms"]]
+        print("".join(f"{value:>12}" if isinstance(value, int) else f"{value:>12.2f}" for value in values))
+    if server is not None:
+        transport = server.transport
+        print(f"\nFake server: {transport.requests} requests, {transport.errors} injected errors, "
+              f"{transport.rate_limited} over its rate limit, {server.connections} connections")
+    if saturation is None:
+        print(f"Saturation point: not reached; throughput still scaled at {steps[-1]['users']} users")
+    else:
+        print(f"Saturation point: about {saturation} concurrent users per worker")
+
+async def run_load_test(args) -> Dict[str, Any]:
+    driver = APIDriver(args.max_questions, args.api_url) if args.target == "api" else AgentDriver(args.max_questions, args.cache)
+    try:
+        # One untimed session warms up clients and lazily built indexes
+        await run_step(driver, 1, args.warmup, args, seed=0)
+        steps = []
+        for index, users in enumerate(args.ramp):
+            stats = await run_step(driver, users, args.duration, args, seed=(index + 1) * 1000)
+            step = stats.summary()
+            step["pool"] = get_registry().pool_stats()
+            step["rate_limit"] = get_registry().rate_limit_stats()
+            step["stages"] = {
+                stage: {"p50_ms": 1000 * summary["p50"], "p99_ms": 1000 * summary["p99"], "calls": summary["calls"]}
+                for stage, summary in get_metrics().stage_summary().items()
+            }
+            steps.append(step)
+            print(f"{users:>4} users: {step['turns_per_second']:.2f} turns/s, p99 {step['turn_p99_ms']:.0f} ms, "
+                  f"{step['errors']} errors, loop lag p99 {step['loop_lag_p99_ms']:.1f} ms", flush=True)
+    finally:
+        await driver.aclose()
+    return {"steps": steps, "saturation_users": find_saturation(steps, args.min_scaling, args.p99_slo)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Ramp virtual users through the question flow against a local model stand-in.")
+    parser.add_argument("--ramp", default="1,2,4,8,16,32,64", help="Comma-separated concurrent user counts, one step each")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per ramp step")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds of single-user warm-up before the ramp")
+    parser.add_argument("--think", default="uniform:0.5:2.0", help="Think time before each answer, e.g. fixed:1 or uniform:0.5:2")
+    parser.add_argument("--max-questions", type=int, default=MAX_QUESTIONS, help="Questions answered per session")
+    parser.add_argument("--target", choices=["agents", "api"], default="agents", help="Drive the agent classes or the HTTP API")
+    parser.add_argument("--api-url", help="Base URL of a running API worker; the API runs in-process by default")
+    parser.add_argument("--cache", action="store_true", help="Let the response cache serve repeated completions")
+    parser.add_argument("--latency", default="lognormal:0.8:0.4", help="Completion latency of the fake server")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Fraction of completions failing with 429, 500 or 503")
+    parser.add_argument("--server-rpm", type=float, default=0.0, help="Request limit of the fake server; requests over it get a 429")
+    parser.add_argument("--server-url", help="Use this completion endpoint instead of starting a fake server")
+    parser.add_argument("--min-scaling", type=float, default=0.5, help="Throughput growth, relative to user growth, below which a step is saturated")
+    parser.add_argument("--p99-slo", type=float, help="p99 turn latency in seconds above which a step is saturated")
+    parser.add_argument("--output", help="Write the full results as JSON")
+    args = parser.parse_args()
+    args.ramp = [int(users) for users in args.ramp.split(",")]
+
+    server = None
+    if args.server_url:
+        base_url = args.server_url
+    else:
+        # The server runs on its own thread and loop so it does not add to the measured loop lag
+        server = FakeCompletionServer(StubTransport(
+            LatencyModel.parse(args.latency, seed=1),
+            error_rate=args.error_rate,
+            seed=1,
+            requests_per_minute=args.server_rpm
+        ))
+        base_url = server.start_in_thread()
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "load-test")
+    os.environ.pop("AISCRIBE_TRANSPORT", None)
+    client_registry._registry = client_registry.ClientRegistry()
+
+    results = asyncio.run(run_load_test(args))
+    print_report(results["steps"], results["saturation_users"], server)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.base import client_registry, get_metrics
+from agents.base.model_transport import LatencyModel, ReplayTransport, StubTransport
+from agents.batch import BatchRunner, RandomOptionPolicy
+from agents.module import ModuleSuggestionAgent
+from agents.prompt import PromptAnalysisAgent
+from agents.question import DynamicQuestionAgent, QuestionSession
+from agents.utils import extract_json_from_text
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+SAMPLE_REPLY = """Here is the analysis of your prompt:
+
+```json
+{"keywords": ["girl", "red cloak", "forest"], "categorized_elements": {"Characters": ["little girl"],
+ "Places": ["dark forest"], "Actions/Processes": ["walking"], "Emotions/Style": ["mysterious"]},
+ "atmosphere": "eerie but whimsical", "missing_elements": ["lighting", "time of day", "camera angle"]}
+```
+
+Let me know if you want more detail."""
+
+SAMPLE_SUGGESTIONS = {
+    "active_modules": {
+        "character": {"active": True, "existing_elements": ["little girl"]},
+        "setting": {"active": True, "existing_elements": ["dark forest"]}
+    },
+    "standard_questions": {"character": ["a", "b", "c"], "setting": ["a", "b"]}
+}
+
+SAMPLE_QUESTION = {
+    "question": "What is the character wearing?",
+    "options": ["A red cloak", "A blue dress", "Armor", "Rags"],
+    "examples": ["A red hooded cloak over a white dress"],
+    "module": "character",
+    "category": "clothing"
+}
+
+def micro(function, repeat: int = 5) -> float:
+    """Return the median time of one call in microseconds."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return statistics.median(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+def run_micro_benchmarks():
+    analysis = extract_json_from_text(SAMPLE_REPLY)
+    suggester = ModuleSuggestionAgent()
+
+    def record_responses():
+        session = QuestionSession()
+        session.initialize_session(SAMPLE_SUGGESTIONS)
+        for _ in range(5):
+            session.record_response(SAMPLE_QUESTION, "A red cloak")
+
+    return {
+        "extract_json_from_text_us": micro(lambda: extract_json_from_text(SAMPLE_REPLY)),
+        "determine_active_modules_us": micro(lambda: suggester.determine_active_modules(analysis)),
+        # Five answers per session, reported per answer
+        "record_response_us": micro(record_responses) / 5
+    }
+
+async def run_sessions(sessions: int, concurrency: int, max_questions: int):
+    runner = BatchRunner(policy=RandomOptionPolicy(seed=7), concurrency=concurrency, max_questions=max_questions, use_cache=False)
+    queue = [{"id": f"bench-{index}", "prompt": f"A traveller number {index} crossing a misty mountain pass"} for index in range(sessions)]
+    semaphore = asyncio.Semaphore(concurrency)
+    durations = []
+
+    async def one(item):
+        async with semaphore:
+            record = await runner.run_session(item)
+            if "error" in record:
+                raise RuntimeError(record["error"])
+            durations.append(record["elapsed"])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(item) for item in queue))
+    elapsed = time.perf_counter() - started
+    durations.sort()
+    return {
+        "sessions_per_second": sessions / elapsed,
+        "session_p50_ms": 1000 * durations[len(durations) // 2],
+        "session_p95_ms": 1000 * durations[min(int(len(durations) * 0.95), len(durations) - 1)]
+    }
+
+def run_session_benchmark(args):
+    if args.fixtures:
+        transport = ReplayTransport(args.fixtures, LatencyModel.parse(args.latency, seed=1) if args.latency else None)
+    else:
+        transport = StubTransport(LatencyModel.parse(args.latency, seed=1))
+    client_registry._registry = client_registry.ClientRegistry(transport=transport)
+
+    async def measure():
+        # Warm up imports, clients and lazily built indexes before measuring
+        await run_sessions(args.concurrency, args.concurrency, args.max_questions)
+        get_metrics().reset()
+        return await run_sessions(args.sessions, args.concurrency, args.max_questions)
+
+    results = asyncio.run(measure())
+    for stage, summary in get_metrics().stage_summary().items():
+        results[f"stage_{stage}_p50_ms"] = 1000 * summary["p50"]
+        results[f"stage_{stage}_p95_ms"] = 1000 * summary["p95"]
+    return results
+
+async def time_first_questions(start, starts: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    durations = []
+
+    async def one(index):
+        async with semaphore:
+            started = time.perf_counter()
+            question = await start(f"A lighthouse keeper number {index} on a stormy coast")
+            durations.append(time.perf_counter() - started)
+            if not question:
+                raise RuntimeError("session started without a question")
+
+    await asyncio.gather(*(one(index) for index in range(starts)))
+    durations.sort()
+    return 1000 * durations[len(durations) // 2], 1000 * durations[min(int(len(durations) * 0.95), len(durations) - 1)]
+
+def run_first_question_benchmark(args):
+    # A fixed per-call latency makes the number of sequential round trips visible
+    transport = StubTransport(LatencyModel.parse(args.first_question_latency, seed=2))
+    client_registry._registry = client_registry.ClientRegistry(transport=transport)
+    analyzer = PromptAnalysisAgent()
+    suggester = ModuleSuggestionAgent()
+
+    async def three_step(prompt):
+        questioner = DynamicQuestionAgent()
+        analysis = await analyzer.analyze_prompt(prompt, use_cache=False)
+        suggestions = await suggester.process_prompt_analysis_lazy(analysis, use_cache=False)
+        session = await questioner.process_module_suggestions(suggestions, use_cache=False)
+        return session["initial_question"]
+
+    async def fast_start(prompt):
+        session = await DynamicQuestionAgent().fast_start(prompt, suggester, use_cache=False)
+        return session["initial_question"]
+
+    personalizations = []
+
+    async def instant(prompt):
+        session = await DynamicQuestionAgent().instant_start(prompt, suggester, use_cache=False)
+        personalizations.append(session["personalized"])
+        return session["initial_question"]
+
+    async def measure():
+        results = {}
+        for name, start in (("three_step", three_step), ("fast_start", fast_start), ("instant", instant)):
+            await time_first_questions(start, args.concurrency, args.concurrency)
+            p50, p95 = await time_first_questions(start, args.first_questions, args.concurrency)
+            results[f"first_question_{name}_p50_ms"] = p50
+            results[f"first_question_{name}_p95_ms"] = p95
+        # Let the background personalization finish before the loop closes
+        await asyncio.gather(*(personalized.wait() for personalized in personalizations))
+        return results
+
+    return asyncio.run(measure())
+
+def compare(results, baseline, tolerance, min_delta_ms=2.0, min_delta_us=2.0):
+    regressions = []
+    print(f"\n{'benchmark':<40}{'current':>14}{'baseline':>14}{'change':>10}")
+    for name, value in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:<40}{value:>14.3f}{'-':>14}{'':>10}")
+            continue
+        # Throughput is better when higher; every other figure is a time
+        higher_is_better = name.endswith("per_second")
+        change = (value - previous) / previous if previous else 0.0
+        worse = -change if higher_is_better else change
+        # Timings of a few micro- or milliseconds swing by more than the tolerance from run to run
+        floor = min_delta_ms if name.endswith("_ms") else min_delta_us if name.endswith("_us") else 0.0
+        noise = abs(value - previous) < floor
+        flag = "  REGRESSION" if worse > tolerance and not noise else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<40}{value:>14.3f}{previous:>14.3f}{change:>+10.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the prompt pipeline without calling the live API.")
+    parser.add_argument("--sessions", type=int, default=200, help="Full sessions to run")
+    parser.add_argument("--concurrency", type=int, default=20, help="Sessions in flight at once")
+    parser.add_argument("--max-questions", type=int, default=5, help="Questions answered per session")
+    parser.add_argument("--latency", default="", help="Simulated completion latency, e.g. fixed:0.05 or lognormal:0.8:0.4")
+    parser.add_argument("--first-questions", type=int, default=100, help="Sessions started per path in the time-to-first-question benchmark")
+    parser.add_argument("--first-question-latency", default="fixed:0.05", help="Simulated completion latency for the time-to-first-question benchmark")
+    parser.add_argument("--fixtures", help="Replay completions recorded with AISCRIBE_TRANSPORT=record:<file> instead of stubbing")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a result counts as a regression")
+    parser.add_argument("--repeat", type=int, default=3, help="Run the suite this many times and report the median of each result")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Smallest slowdown in milliseconds that counts as a regression")
+    parser.add_argument("--min-delta-us", type=float, default=2.0, help="Smallest slowdown in microseconds that counts as a regression")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+    runs = []
+    for _ in range(max(args.repeat, 1)):
+        run = run_micro_benchmarks()
+        run.update(run_session_benchmark(args))
+        run.update(run_first_question_benchmark(args))
+        runs.append(run)
+    # The median across runs keeps one slow or fast run from setting the result
+    results = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms, args.min_delta_us)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({name: round(value, 3) for name, value in results.items()}, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
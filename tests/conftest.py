@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+from agents.base import client_registry
+from agents.base.model_transport import StubTransport
+
+@pytest.fixture
+def stub_registry(monkeypatch):
+    """Route every completion through a StubTransport instead of the API."""
+    monkeypatch.setenv("OPENAI_API_KEY", os.getenv("OPENAI_API_KEY", "offline"))
+
+    def install(**transport_options):
+        registry = client_registry.ClientRegistry(transport=StubTransport(**transport_options))
+        monkeypatch.setattr(client_registry, "_registry", registry)
+        return registry
+
+    return install
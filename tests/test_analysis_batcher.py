@@ -0,0 +1,53 @@
+import asyncio
+
+from agents.base import client_registry
+from agents.prompt.analysis_batcher import AnalysisBatcher
+
+def _batcher(window=0.05, max_batch=8):
+    return AnalysisBatcher(client_registry.get_registry().get_llm(), window=window, max_batch=max_batch)
+
+def test_lone_prompt_is_not_held_for_the_window(stub_registry):
+    stub_registry()
+    batcher = _batcher(window=5.0)
+
+    async def run():
+        return await asyncio.wait_for(batcher.submit("a fox in the snow"), 1.0)
+
+    assert asyncio.run(run()) is None
+    assert batcher.stats()["single_items"] == 1
+
+def test_concurrent_prompts_share_one_call(stub_registry):
+    stub_registry()
+    batcher = _batcher()
+
+    async def run():
+        # The first arrival goes alone; the burst behind it is batched
+        await batcher.submit("warm up")
+        return await asyncio.gather(*(batcher.submit(f"prompt {index}") for index in range(4)))
+
+    results = asyncio.run(run())
+    assert all(result is not None and "keywords" in result for result in results)
+    assert batcher.stats()["batches"] == 1 and batcher.stats()["batched_items"] == 4
+    assert not batcher._tasks
+
+def test_cancelled_batch_releases_its_callers(stub_registry):
+    stub_registry()
+    batcher = _batcher()
+
+    async def run():
+        started = asyncio.Event()
+
+        async def hang(*args, **kwargs):
+            started.set()
+            await asyncio.sleep(3600)
+
+        batcher.llm.complete = hang
+        await batcher.submit("warm up")
+        waiting = asyncio.gather(*(batcher.submit(f"prompt {index}") for index in range(3)))
+        await started.wait()
+        for task in list(batcher._tasks):
+            task.cancel()
+        return await asyncio.wait_for(waiting, 1.0)
+
+    assert asyncio.run(run()) == [None, None, None]
+    assert batcher.stats()["failed_items"] == 3
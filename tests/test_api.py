@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from agents.api import create_app
+from agents.question import MemorySessionStore
+
+async def _request(app, method, path, body=None):
+    messages = []
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+        sent = True
+        return {"type": "http.request", "body": json.dumps(body).encode() if body is not None else b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app({"type": "http", "method": method, "path": path}, receive, send)
+    return messages
+
+def _json(messages):
+    return messages[0]["status"], json.loads(b"".join(message.get("body", b"") for message in messages[1:]))
+
+def test_failing_stream_ends_the_started_response(stub_registry):
+    stub_registry()
+    app = create_app(store=MemorySessionStore())
+
+    async def run():
+        status, session = _json(await _request(app, "POST", "/sessions", {"prompt": "a fox in the snow"}))
+        assert status == 201
+
+        async def broken(*args, **kwargs):
+            yield "A fox"
+            raise RuntimeError("provider went away")
+
+        # Requests for the session reuse its agent, so the failure happens mid-stream
+        app._question_agent(session["session_id"]).stream_final_prompt = broken
+        return await _request(app, "GET", f"/sessions/{session['session_id']}/final-prompt/stream")
+
+    messages = asyncio.run(run())
+    assert [message["type"] for message in messages].count("http.response.start") == 1
+    assert messages[-1]["type"] == "http.response.body" and not messages[-1].get("more_body")
+    assert b"event: error" in messages[-1]["body"]
+    assert b"provider went away" not in messages[-1]["body"]
+
+def test_prefetched_question_serves_the_answer(stub_registry):
+    stub_registry()
+    app = create_app(store=MemorySessionStore(), question_agent_options={"speculative": True})
+
+    async def run():
+        _, session = _json(await _request(app, "POST", "/sessions", {"prompt": "a fox in the snow"}))
+        questioner = app._question_agent(session["session_id"])
+        # Let the speculation started after the response finish
+        await asyncio.gather(*questioner.prefetcher._tasks.values())
+        status, answered = _json(await _request(
+            app, "POST", f"/sessions/{session['session_id']}/answers",
+            {"answer": session["question"]["options"][0]}
+        ))
+        assert status == 200 and answered["question_number"] == 2
+        return questioner.get_prefetch_stats()
+
+    assert asyncio.run(run())["hits"] == 1
+
+def test_unknown_session_is_a_json_404(stub_registry):
+    stub_registry()
+    status, payload = _json(asyncio.run(_request(create_app(store=MemorySessionStore()), "GET", "/sessions/abc")))
+    assert status == 404 and "abc" in payload["error"]
+
+def test_unexpected_errors_are_not_sent_to_the_client(stub_registry, caplog):
+    stub_registry()
+    app = create_app(store=MemorySessionStore())
+
+    async def broken(*args, **kwargs):
+        raise RuntimeError("secret upstream detail")
+
+    app.analyzer.analyze_prompt = broken
+    status, body = _json(asyncio.run(_request(app, "POST", "/sessions", {"prompt": "a fox in the snow"})))
+    assert status == 500 and body == {"error": "internal error"}
+    assert "secret upstream detail" in caplog.text
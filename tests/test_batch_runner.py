@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+import pytest
+
+from agents.batch import AnswerPolicy, BatchRunner, FirstOptionPolicy, ScriptedPolicy, iter_items
+from agents.batch.policies import DEFAULT_ANSWER
+
+def test_unparseable_lines_become_error_items():
+    items = list(iter_items([
+        "a fox in the snow",
+        "",
+        '{"prompt": "a ship at sea", "id": "ship"}',
+        '{"prompt": "broken',
+        '{"id": "no-prompt"}',
+        '["not", "an", "object"]'
+    ]))
+    assert [item["id"] for item in items[:2]] == [items[0]["id"], "ship"]
+    assert "error" not in items[0] and "error" not in items[1]
+    assert [item["id"] for item in items[2:4]] == ["line-4", "line-5"]
+    assert "not valid JSON" in items[2]["error"]
+    assert "no 'prompt'" in items[3]["error"]
+    # A line that does not start with "{" is prompt text
+    assert items[4]["prompt"] == '["not", "an", "object"]'
+
+def test_run_survives_bad_lines(stub_registry, tmp_path):
+    stub_registry()
+    output = tmp_path / "results.jsonl"
+    runner = BatchRunner(concurrency=2, max_questions=2, use_cache=False)
+    lines = ["a fox in the snow", "{oops", '{"id": "x"}', "a ship at sea"]
+    summary = asyncio.run(runner.run(iter_items(lines), str(output)))
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert summary["completed"] == 2 and summary["failed"] == 2
+    assert sorted(record["id"] for record in records if "error" in record) == ["line-2", "line-3"]
+    assert all(len(record["turns"]) == 2 for record in records if "error" not in record)
+
+def test_answer_policy_is_abstract():
+    with pytest.raises(TypeError):
+        AnswerPolicy()
+
+def test_resume_replaces_error_records(stub_registry, tmp_path):
+    stub_registry()
+    output = tmp_path / "results.jsonl"
+    lines = ["a fox in the snow", "{oops"]
+    asyncio.run(BatchRunner(concurrency=1, max_questions=1, use_cache=False).run(iter_items(lines), str(output)))
+    with open(output, "a", encoding="utf-8") as f:
+        f.write('{"id": "cut')
+    runner = BatchRunner(concurrency=1, max_questions=1, use_cache=False)
+    summary = asyncio.run(runner.run(iter_items(lines), str(output)))
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert summary["completed"] == 0 and summary["failed"] == 1
+    assert sorted(record["id"] for record in records) == sorted([records[0]["id"], "line-2"])
+
+def test_scripted_policy_forgets_finished_sessions():
+    policy = ScriptedPolicy({"character": ["red cloak", "blue dress"]})
+    question = {"question": "Wearing?", "options": ["armor"], "module": "character"}
+    assert policy.choose(question, "a fox", "s1") == "red cloak"
+    assert policy.choose(question, "a fox", "s1") == "blue dress"
+    policy.finish("s1")
+    assert policy._turns == {}
+    assert policy.choose(question, "a fox", "s1") == "red cloak"
+
+def test_scripted_policy_keeps_sessions_with_the_same_prompt_apart():
+    policy = ScriptedPolicy({"character": ["red cloak", "blue dress"]})
+    question = {"question": "Wearing?", "options": ["armor"], "module": "character"}
+    assert policy.choose(question, "a fox", "s1") == "red cloak"
+    assert policy.choose(question, "a fox", "s2") == "red cloak"
+    policy.finish("s1")
+    assert policy.choose(question, "a fox", "s2") == "blue dress"
+
+def test_first_option_policy_falls_back_without_options_or_examples():
+    policy = FirstOptionPolicy()
+    assert policy.choose({"question": "Anything?", "options": [], "examples": []}, "a fox", "s1") == DEFAULT_ANSWER
+    assert policy.choose({"question": "Anything?", "examples": ["dusk"]}, "a fox", "s1") == "dusk"
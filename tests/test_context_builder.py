@@ -0,0 +1,47 @@
+import asyncio
+
+from agents.base import get_metrics
+from agents.question import ContextBuilder, DynamicQuestionAgent
+
+def _context(turns):
+    history = [
+        {"question": {"question": f"Question {i}?", "module": "character", "category": f"c{i}", "options": ["a", "b", "c"]}, "response": f"answer {i}"}
+        for i in range(turns)
+    ]
+    return {
+        "active_modules": {"character": {"active": True, "existing_elements": ["girl"]}},
+        "progress": {"character": {"completed": turns, "total": 9}},
+        "question_history": history,
+        "responses": {turn["question"]["question"]: turn["response"] for turn in history}
+    }
+
+def test_build_returns_its_stats():
+    compact, stats = ContextBuilder(recent_turns=2).build(_context(5))
+    assert stats["turns_in_full"] == 2 and stats["turns_dropped"] == 0
+    assert stats["tokens_saved"] == stats["full_context_tokens"] - stats["context_tokens"] > 0
+    assert '"earlier_answers"' in compact
+
+def test_budget_drops_turns():
+    _, stats = ContextBuilder(token_budget=60).build(_context(8))
+    assert stats["context_tokens"] <= 60 or stats["turns_in_full"] == 1
+    assert stats["turns_dropped"] > 0
+
+def test_budget_comes_from_the_environment(monkeypatch):
+    monkeypatch.setenv("AISCRIBE_CONTEXT_TOKENS", "123")
+    monkeypatch.setenv("AISCRIBE_CONTEXT_TURNS", "1")
+    builder = ContextBuilder()
+    assert (builder.token_budget, builder.recent_turns) == (123, 1)
+
+def test_savings_are_recorded_per_stage(stub_registry):
+    stub_registry()
+    get_metrics().reset()
+
+    async def run():
+        questioner = DynamicQuestionAgent(context_builder=ContextBuilder(recent_turns=1))
+        questioner.session.load_state(_context(4))
+        await questioner.generate_next_question(use_cache=False)
+
+    asyncio.run(run())
+    stats = get_metrics().stage_summary()["question_generation"]
+    assert stats["context_tokens_saved"] > 0
+    assert 'aiscribe_context_tokens_saved_total{stage="question_generation"}' in get_metrics().to_prometheus()
@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+import pytest
+
+from agents.base import DeadlineExceeded, LatencyPolicy, LatencyPolicyConfig
+from agents.base.model_transport import LatencyModel
+from agents.prompt import PromptAnalysisAgent
+from agents.question import DynamicQuestionAgent
+
+class _FirstCallSlow:
+    """Latency model where only the first completion is slow, like one stuck request."""
+
+    def __init__(self, slow: float):
+        self.delays = [slow]
+
+    def sample(self) -> float:
+        return self.delays.pop() if self.delays else 0.0
+
+def _hedged_registry(stub_registry, monkeypatch, slow):
+    monkeypatch.setenv("AISCRIBE_HEDGE", "analysis")
+    registry = stub_registry(latency=_FirstCallSlow(slow))
+    # Skip collecting latency samples: hedge anything still running after 50 ms
+    registry.latency_policy._thresholds["analysis"] = 0.05
+    return registry
+
+def test_deadlines_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("AISCRIBE_DEADLINES", "question_generation=8,final_prompt=30")
+    monkeypatch.setenv("AISCRIBE_DEADLINE", "5")
+    policy = LatencyPolicy()
+    assert policy.deadline("question_generation") == 8
+    assert policy.deadline("analysis") == 5
+    assert LatencyPolicy(LatencyPolicyConfig()).deadline("analysis") is None
+
+def test_hedge_threshold_follows_observed_latency():
+    policy = LatencyPolicy(LatencyPolicyConfig(hedge_stages={"analysis"}, hedge_quantile=90, min_samples=20))
+    assert policy.hedge_delay("analysis") is None
+    for index in range(32):
+        policy.observe("analysis", 0.01 * (index + 1))
+    assert policy.hedge_delay("analysis") == pytest.approx(0.29)
+    assert policy.hedge_delay("final_prompt") is None
+
+def test_hedges_are_paid_from_a_budget():
+    policy = LatencyPolicy(LatencyPolicyConfig(hedge_stages={"analysis"}, hedge_budget=0.25, hedge_burst=2.0))
+    assert policy.try_hedge() and policy.try_hedge()
+    assert not policy.try_hedge()
+    # Every call tops the budget up by hedge_budget
+    for _ in range(4):
+        policy.hedge_delay("analysis")
+    assert policy.try_hedge()
+    assert policy.stats()["hedges_issued"] == 3 and policy.stats()["hedges_denied"] == 1
+
+def test_slow_call_is_hedged_after_the_delay(stub_registry, monkeypatch):
+    registry = _hedged_registry(stub_registry, monkeypatch, slow=2.0)
+    started = time.perf_counter()
+    analysis = asyncio.run(PromptAnalysisAgent(batcher=None).analyze_prompt("a fox in the snow", use_cache=False))
+    elapsed = time.perf_counter() - started
+    stats = registry.latency_policy.stats()
+    assert "error" not in analysis
+    assert elapsed < 1.0
+    assert registry.model_transport.requests == 2
+    assert stats["hedges_issued"] == 1 and stats["hedges_won"] == 1
+
+def test_hedge_is_not_sent_without_budget(stub_registry, monkeypatch):
+    registry = _hedged_registry(stub_registry, monkeypatch, slow=0.3)
+    registry.latency_policy._budget = 0.0
+    asyncio.run(PromptAnalysisAgent(batcher=None).analyze_prompt("a fox in the snow", use_cache=False))
+    stats = registry.latency_policy.stats()
+    assert registry.model_transport.requests == 1
+    assert stats["hedges_issued"] == 0 and stats["hedges_denied"] == 1
+
+def test_missed_deadline_raises_deadline_exceeded(stub_registry, monkeypatch):
+    registry = _slow_registry(stub_registry, monkeypatch, ["analysis"])
+
+    async def run():
+        return await registry.get_llm().complete(
+            messages=[{"role": "user", "content": "hello"}], stage="analysis", use_cache=False
+        )
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run())
+    assert registry.latency_policy.stats()["deadlines_exceeded"] == 1
+
+def test_slow_question_falls_back_to_a_template(stub_registry, monkeypatch):
+    registry = _slow_registry(stub_registry, monkeypatch, ["question_generation"])
+    suggestions = {
+        "active_modules": {"character": {"active": True, "existing_elements": ["girl"]}},
+        "standard_questions": {"character": ["a"]}
+    }
+    started = time.perf_counter()
+    session = asyncio.run(DynamicQuestionAgent().process_module_suggestions(suggestions, use_cache=False))
+    assert time.perf_counter() - started < 0.5
+    assert session["initial_question"]["module"] == "character"
+    assert registry.latency_policy.stats()["deadlines_exceeded"] == 1
+
+def _slow_registry(stub_registry, monkeypatch, stages):
+    monkeypatch.setenv("AISCRIBE_DEADLINES", ",".join(f"{stage}=0.05" for stage in stages))
+    return stub_registry(latency=LatencyModel("fixed", 1.0))
+
+def _answered_questioner():
+    questioner = DynamicQuestionAgent()
+    questioner.record_response({"question": "Wearing?", "module": "character"}, "a red cloak")
+    questioner.record_response({"question": "When?", "module": "atmosphere"}, "at dusk")
+    return questioner
+
+def test_slow_analysis_falls_back_to_a_local_analysis(stub_registry, monkeypatch):
+    _slow_registry(stub_registry, monkeypatch, ["analysis"])
+    analysis = asyncio.run(PromptAnalysisAgent(batcher=None).analyze_prompt("a girl in a dark forest", use_cache=False))
+    assert "error" not in analysis
+    assert "Places" in analysis["categorized_elements"]
+
+def test_failed_analysis_falls_back_to_a_local_analysis(stub_registry, monkeypatch):
+    monkeypatch.setenv("AISCRIBE_LLM_RETRIES", "0")
+    stub_registry(error_rate=1.0, retry_after=0.0)
+    analysis = asyncio.run(PromptAnalysisAgent(batcher=None).analyze_prompt("a girl in a dark forest", use_cache=False))
+    assert "categorized_elements" in analysis and "error" not in analysis
+
+def test_slow_final_prompt_is_assembled_locally(stub_registry, monkeypatch):
+    _slow_registry(stub_registry, monkeypatch, ["final_prompt"])
+    final_prompt = asyncio.run(_answered_questioner().generate_final_prompt(use_cache=False, initial_prompt="a fox"))
+    assert final_prompt == "a fox, a red cloak, at dusk"
+
+def test_slow_final_prompt_stream_is_assembled_locally(stub_registry, monkeypatch):
+    _slow_registry(stub_registry, monkeypatch, ["final_prompt"])
+
+    async def run():
+        return [chunk async for chunk in _answered_questioner().stream_final_prompt(use_cache=False, initial_prompt="a fox")]
+
+    assert asyncio.run(run()) == ["a fox, a red cloak, at dusk"]
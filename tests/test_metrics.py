@@ -0,0 +1,63 @@
+import json
+
+from agents.base.metrics import CallRecord, MetricsRegistry, estimate_cost, session_scope
+
+def _record(stage="analysis", latency=0.2, **fields):
+    return CallRecord(agent="prompt_analyzer", stage=stage, model="gpt-4o-mini", prompt_tokens=100,
+                      completion_tokens=50, latency=latency, cost=estimate_cost("gpt-4o-mini", 100, 50), **fields)
+
+def test_cost_follows_the_price_table():
+    assert estimate_cost("gpt-4o-mini", 1_000_000, 1_000_000) == 0.75
+    assert estimate_cost("unknown-model", 1000, 1000) == 0.0
+
+def test_stage_and_session_summaries():
+    metrics = MetricsRegistry()
+    with session_scope("s1"):
+        metrics.record(_record(latency=0.1))
+        metrics.record(_record(latency=0.3, cached=True))
+    metrics.record(_record(stage="final_prompt", error="RateLimitError"))
+    stages = metrics.stage_summary()
+    assert stages["analysis"]["calls"] == 2 and stages["analysis"]["cached"] == 1
+    assert stages["analysis"]["prompt_tokens"] == 200
+    assert stages["analysis"]["p50"] in (0.1, 0.3)
+    assert stages["final_prompt"]["errors"] == 1
+    assert list(metrics.session_summary("s1")) == ["analysis"]
+
+def test_prometheus_export():
+    metrics = MetricsRegistry()
+    metrics.record(_record(latency=0.2))
+    metrics.record(_record(latency=3.0, cached=True))
+    metrics.register_gauge("aiscribe_queue_depth", lambda: 7)
+    text = metrics.to_prometheus()
+    lines = text.splitlines()
+    assert "# TYPE aiscribe_llm_latency_seconds histogram" in lines
+    # Buckets are cumulative
+    assert 'aiscribe_llm_latency_seconds_bucket{stage="analysis",le="0.25"} 1' in lines
+    assert 'aiscribe_llm_latency_seconds_bucket{stage="analysis",le="4.0"} 2' in lines
+    assert 'aiscribe_llm_latency_seconds_bucket{stage="analysis",le="+Inf"} 2' in lines
+    assert 'aiscribe_llm_latency_seconds_count{stage="analysis"} 2' in lines
+    assert 'aiscribe_llm_tokens_total{stage="analysis",type="prompt"} 200' in lines
+    assert 'aiscribe_llm_calls_total{stage="analysis",result="cached"} 1' in lines
+    assert 'aiscribe_llm_calls_total{stage="analysis",result="completed"} 1' in lines
+    assert "aiscribe_queue_depth 7" in lines
+    assert text.endswith("\n")
+
+def test_jsonl_export():
+    metrics = MetricsRegistry()
+    with session_scope("s1"):
+        metrics.record(_record())
+    metrics.record(_record(stage="final_prompt"))
+    records = [json.loads(line) for line in metrics.to_jsonl().splitlines()]
+    assert [record["stage"] for record in records] == ["analysis", "final_prompt"]
+    assert records[0]["session_id"] == "s1" and records[1]["session_id"] is None
+    assert records[0]["prompt_tokens"] == 100
+
+def test_records_and_sessions_are_bounded():
+    metrics = MetricsRegistry(max_records=3, max_sessions=2)
+    for index in range(5):
+        with session_scope(f"s{index}"):
+            metrics.record(_record())
+    assert len(metrics.to_jsonl().splitlines()) == 3
+    assert metrics.session_summary("s0") == {}
+    assert metrics.session_summary("s4")["analysis"]["calls"] == 1
+    assert metrics.stage_summary()["analysis"]["calls"] == 5
@@ -0,0 +1,66 @@
+from agents.base.model_router import ModelRouter, RoutingConfig
+
+def _router(**options):
+    options.setdefault("min_samples", 10)
+    return ModelRouter(RoutingConfig(**options))
+
+def _record(router, stage, failures, total):
+    for index in range(total):
+        router.record_outcome(stage, index >= failures)
+
+def test_stages_start_on_their_configured_tier(monkeypatch):
+    monkeypatch.setenv("AISCRIBE_ROUTES", "response_analysis=local,final_prompt=large")
+    router = ModelRouter()
+    assert router.is_local("response_analysis")
+    assert router.model_for("response_analysis") == "gpt-4o-mini"
+    assert router.model_for("final_prompt") == "gpt-4o"
+    assert router.tier("analysis") == "small"
+
+def test_stage_without_a_heuristic_is_never_local():
+    router = _router(stages={"analysis": "local"})
+    assert not router.is_local("analysis")
+    assert router.tier("analysis") == "small"
+
+def test_parse_failures_promote_a_stage():
+    router = _router()
+    _record(router, "analysis", failures=3, total=10)
+    assert router.tier("analysis") == "large"
+    assert router.stats()["analysis"]["promotions"] == 1
+
+def test_failures_below_the_threshold_keep_the_tier():
+    router = _router()
+    _record(router, "analysis", failures=2, total=10)
+    assert router.tier("analysis") == "small"
+
+def test_slow_stage_is_demoted():
+    router = _router(stages={"final_prompt": "large"}, latency_budgets={"final_prompt": 1.0})
+    for _ in range(10):
+        router.observe_latency("final_prompt", "gpt-4o", 2.0)
+    assert router.tier("final_prompt") == "small"
+    assert router.stats()["final_prompt"]["demotions"] == 1
+
+def test_latency_on_a_previous_model_is_ignored():
+    router = _router(stages={"final_prompt": "large"}, latency_budgets={"final_prompt": 1.0})
+    for _ in range(10):
+        router.observe_latency("final_prompt", "gpt-4o-mini", 2.0)
+    assert router.tier("final_prompt") == "large"
+
+def test_promoted_stage_is_not_demoted_back():
+    router = _router(latency_budgets={"analysis": 1.0})
+    _record(router, "analysis", failures=5, total=10)
+    assert router.tier("analysis") == "large"
+    for _ in range(10):
+        router.observe_latency("analysis", "gpt-4o", 2.0)
+    assert router.tier("analysis") == "large"
+    assert router.stats()["analysis"]["demotions"] == 0
+
+def test_unsure_local_heuristic_moves_to_a_model():
+    router = _router(stages={"question_generation": "local"})
+    _record(router, "question_generation", failures=5, total=10)
+    assert router.tier("question_generation") == "small"
+    assert not router.is_local("question_generation")
+
+def test_adaptive_routing_can_be_switched_off():
+    router = _router(adaptive=False)
+    _record(router, "analysis", failures=10, total=10)
+    assert router.tier("analysis") == "small"
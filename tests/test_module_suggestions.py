@@ -0,0 +1,31 @@
+import asyncio
+import json
+
+from agents.module import LazySuggestions, ModuleSuggestionAgent
+
+ANALYSIS = {
+    "keywords": ["girl", "forest"],
+    "categorized_elements": {"Characters": ["girl"], "Places": ["dark forest"]}
+}
+
+def _suggestions(body):
+    return json.dumps({"active_modules": ["character", "setting"]})
+
+def test_prompt_analysis_returns_resolved_suggestions(stub_registry):
+    registry = stub_registry(reply=_suggestions)
+    result = asyncio.run(ModuleSuggestionAgent().process_prompt_analysis(ANALYSIS, use_cache=False))
+    assert result["suggestions"]["active_modules"] == ["character", "setting"]
+    assert result["active_modules"]["character"]["active"]
+    assert registry.model_transport.requests == 1
+
+def test_lazy_prompt_analysis_defers_the_suggestions(stub_registry):
+    registry = stub_registry(reply=_suggestions)
+
+    async def run():
+        result = await ModuleSuggestionAgent().process_prompt_analysis_lazy(ANALYSIS, use_cache=False, warm=False)
+        assert isinstance(result["suggestions"], LazySuggestions)
+        assert registry.model_transport.requests == 0
+        return await result["suggestions"]
+
+    assert isinstance(asyncio.run(run()), dict)
+    assert registry.model_transport.requests == 1
@@ -0,0 +1,58 @@
+import asyncio
+
+from agents.prompt import PromptAnalysisAgent, PromptReuseIndex, normalize_prompt
+
+ANALYSIS = {"keywords": ["fox"], "categorized_elements": {"Characters": ["fox"]}}
+
+def test_normalized_duplicates_hit():
+    index = PromptReuseIndex()
+    index.add("A red fox, in the snow!", ANALYSIS)
+    assert normalize_prompt("A red fox, in the snow!") == "a red fox in the snow"
+    assert index.lookup("a red  FOX in the snow") is ANALYSIS
+
+def test_near_duplicates_hit():
+    index = PromptReuseIndex()
+    index.add("a red fox walking through a snowy pine forest at dawn", ANALYSIS)
+    # Stopwords and plural or -ing endings do not count as differences
+    assert index.lookup("the red foxes walk through snowy pine forests at dawn") is ANALYSIS
+    assert index.stats()["hits"] == 1
+
+def test_different_prompts_miss():
+    index = PromptReuseIndex()
+    index.add("a red fox walking through a snowy pine forest at dawn", ANALYSIS)
+    assert index.lookup("a lighthouse on a stormy coast at night") is None
+    # Sharing half the words stays below the default 0.8 similarity
+    assert index.lookup("a red fox sleeping in a sunny desert cave") is None
+    assert index.stats()["misses"] == 2
+
+def test_threshold_controls_reuse():
+    strict = PromptReuseIndex(threshold=1.0)
+    loose = PromptReuseIndex(threshold=0.5)
+    for index in (strict, loose):
+        index.add("red fox snowy pine forest dawn", ANALYSIS)
+    assert strict.lookup("red fox snowy pine forest dusk") is None
+    assert loose.lookup("red fox snowy pine forest dusk") is ANALYSIS
+
+def test_oldest_entries_are_evicted():
+    index = PromptReuseIndex(max_entries=2)
+    for prompt in ("a red fox", "a lighthouse keeper", "a sailing ship"):
+        index.add(prompt, {"prompt": prompt})
+    assert index.stats()["entries"] == 2
+    assert index.lookup("a red fox") is None
+    assert index.lookup("a sailing ship") == {"prompt": "a sailing ship"}
+
+def test_agent_reuses_a_near_duplicate_analysis(stub_registry):
+    registry = stub_registry()
+    agent = PromptAnalysisAgent(reuse_index=PromptReuseIndex(), batcher=None)
+
+    async def run():
+        first = await agent.analyze_prompt("a red fox walking through a snowy pine forest at dawn")
+        calls = registry.model_transport.requests
+        assert calls > 0
+        # The prompt text differs, so only the reuse index can answer it
+        second = await agent.analyze_prompt("the red foxes walk through snowy pine forests at dawn")
+        return first, second, registry.model_transport.requests - calls
+
+    first, second, calls = asyncio.run(run())
+    assert second == first and second is not first
+    assert calls == 0
@@ -0,0 +1,41 @@
+import asyncio
+
+from agents.question import DynamicQuestionAgent
+
+SUGGESTIONS = {
+    "active_modules": {
+        "character": {"active": True, "existing_elements": ["girl"]},
+        "setting": {"active": True, "existing_elements": ["forest"]}
+    },
+    "standard_questions": {"character": ["a", "b", "c"], "setting": ["a", "b", "c"]}
+}
+
+def test_local_question_generation_does_not_repeat(stub_registry, monkeypatch):
+    monkeypatch.setenv("AISCRIBE_ROUTES", "question_generation=local")
+    stub_registry()
+
+    async def run():
+        questioner = DynamicQuestionAgent()
+        question = (await questioner.process_module_suggestions(SUGGESTIONS))["initial_question"]
+        asked = []
+        for _ in range(5):
+            asked.append((question["module"], question["category"]))
+            questioner.record_response(question, question["options"][0])
+            question = await questioner.generate_next_question({"question": question, "response": question["options"][0]})
+        return asked
+
+    asked = asyncio.run(run())
+    assert len(set(asked)) == len(asked)
+    assert asked[:3] == [("character", "appearance"), ("character", "facial_expression"), ("character", "clothing")]
+
+def test_streamed_final_prompt_matches_the_stripped_one(stub_registry):
+    reply = "\n\n   A fox in a red cloak" + " " * 20 + "at dusk, cinematic lighting  \n" + " " * 20 + "\n"
+    stub_registry(reply=lambda body: reply)
+
+    async def run():
+        streamed = [chunk async for chunk in DynamicQuestionAgent().stream_final_prompt(use_cache=False)]
+        return streamed, await DynamicQuestionAgent().generate_final_prompt(use_cache=False)
+
+    streamed, generated = asyncio.run(run())
+    assert "".join(streamed) == generated == reply.strip()
+    assert all(chunk.strip() for chunk in streamed)
@@ -0,0 +1,133 @@
+import asyncio
+
+import httpx
+import openai
+
+from agents.base.metrics import current_session
+from agents.base.rate_limiter import RateLimitConfig, RateLimiter, TokenBucket, classify_error, retry_after
+
+def _rate_limit_error(headers=None, code=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers=headers or {}, request=request)
+    body = {"code": code} if code else None
+    return openai.RateLimitError("rate limited", response=response, body=body)
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(60, burst_seconds=2.0)
+    now = bucket.updated
+    assert bucket.wait_time(2, now) == 0.0
+    bucket.take(2)
+    assert bucket.wait_time(1, now) == 1.0
+    assert bucket.wait_time(1, now + 1.0) == 0.0
+
+def test_token_bucket_caps_requests_at_capacity():
+    bucket = TokenBucket(60, burst_seconds=2.0)
+    bucket.take(2)
+    assert bucket.wait_time(100, bucket.updated) == 2.0
+
+def test_retry_after_reads_seconds_and_milliseconds():
+    assert retry_after(_rate_limit_error({"retry-after": "3"})) == 3.0
+    assert retry_after(_rate_limit_error({"retry-after-ms": "250"})) == 0.25
+    assert retry_after(_rate_limit_error()) is None
+
+def test_exhausted_quota_is_not_retried():
+    assert classify_error(_rate_limit_error()) == (True, True)
+    assert classify_error(_rate_limit_error(code="insufficient_quota")) == (False, True)
+    assert classify_error(ValueError()) == (False, False)
+
+def test_waiting_attempt_is_granted_on_release():
+    async def run():
+        limiter = RateLimiter(RateLimitConfig(initial_concurrency=2, max_concurrency=2))
+        first = await limiter.acquire()
+        await limiter.acquire()
+        third = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not third.done()
+        assert limiter.stats()["queue_depth"] == 1
+        limiter.release(first)
+        await asyncio.wait_for(third, 1.0)
+        return limiter.stats()
+    stats = asyncio.run(run())
+    assert stats["in_flight"] == 2
+    assert stats["granted"] == 3
+    assert stats["queue_depth"] == 0
+
+def test_successes_grow_the_limit_additively():
+    async def run():
+        limiter = RateLimiter(RateLimitConfig(initial_concurrency=2))
+        for _ in range(4):
+            limiter.release(await limiter.acquire())
+        return limiter.limit
+    assert asyncio.run(run()) >= 3.0
+
+def test_throttling_halves_the_limit_and_pauses_callers():
+    async def run():
+        limiter = RateLimiter(RateLimitConfig(initial_concurrency=8))
+        permit = await limiter.acquire()
+        delay = limiter.release_error(permit, _rate_limit_error({"retry-after": "5"}), attempt=1)
+        return delay, limiter.stats()
+    delay, stats = asyncio.run(run())
+    assert delay == 0.0
+    assert stats["concurrency_limit"] == 4
+    assert stats["throttled"] == 1
+    assert stats["retries"] == 1
+    assert stats["paused_for"] > 4.0
+    assert stats["in_flight"] == 0
+
+def test_limit_is_cut_at_most_once_per_second():
+    async def run():
+        limiter = RateLimiter(RateLimitConfig(initial_concurrency=8))
+        for _ in range(3):
+            limiter.release_error(await limiter.acquire(), _rate_limit_error({"retry-after-ms": "0"}), attempt=1)
+        return limiter.stats()
+    stats = asyncio.run(run())
+    assert stats["concurrency_limit"] == 4
+    assert stats["limit_decreases"] == 1
+
+def test_errors_past_the_retry_budget_are_raised():
+    async def run():
+        limiter = RateLimiter(RateLimitConfig(max_retries=2))
+        error = openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+        delays = [limiter.release_error(await limiter.acquire(), error, attempt) for attempt in (1, 2, 3)]
+        fatal = limiter.release_error(await limiter.acquire(), ValueError(), attempt=1)
+        return delays, fatal
+    delays, fatal = asyncio.run(run())
+    assert delays[0] is not None and delays[1] is not None
+    assert delays[2] is None
+    assert fatal is None
+
+def test_waiting_sessions_are_served_round_robin():
+    async def run():
+        limiter = RateLimiter(RateLimitConfig(initial_concurrency=1, max_concurrency=1))
+        held = await limiter.acquire()
+        order = []
+
+        async def attempt(session, index):
+            current_session.set(session)
+            permit = await limiter.acquire()
+            order.append((session, index))
+            limiter.release(permit)
+
+        tasks = [asyncio.ensure_future(attempt("busy", i)) for i in range(3)]
+        tasks.append(asyncio.ensure_future(attempt("quiet", 0)))
+        await asyncio.sleep(0)
+        limiter.release(held)
+        await asyncio.wait_for(asyncio.gather(*tasks), 1.0)
+        return order
+    order = asyncio.run(run())
+    assert order.index(("quiet", 0)) == 1
+
+def test_cancelled_waiter_does_not_hold_a_slot():
+    async def run():
+        limiter = RateLimiter(RateLimitConfig(initial_concurrency=1, max_concurrency=1))
+        held = await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.wait({waiter})
+        limiter.abandon(held)
+        permit = await asyncio.wait_for(limiter.acquire(), 1.0)
+        return permit, limiter.stats()
+    permit, stats = asyncio.run(run())
+    assert stats["in_flight"] == 1
+    assert stats["queue_depth"] == 0
@@ -0,0 +1,36 @@
+from agents.question import LearnedTerms, RelevanceEngine, ResponseAnalyzer
+
+def test_known_terms_score_their_module():
+    scores, confidence = RelevanceEngine().score("a misty forest at dawn")
+    assert max(scores, key=scores.get) == "setting"
+    assert confidence > 0
+
+def test_learning_is_scoped_to_the_session():
+    engine = RelevanceEngine()
+    vocabulary = len(engine._vocabulary)
+    first = ResponseAnalyzer(llm=None, engine=engine)
+    second = ResponseAnalyzer(llm=None, engine=engine)
+    first.learn("zephyrine gloves", "character")
+    assert first.analyze_batch(["zephyrine"])[0]["character"] == 1.0
+    assert second.analyze_batch(["zephyrine"])[0]["character"] == 0.0
+    assert len(engine._vocabulary) == vocabulary
+    # The shared lexicon has no learning path of its own
+    assert not hasattr(engine, "learn")
+    first.reset()
+    assert first.analyze_batch(["zephyrine"])[0]["character"] == 0.0
+
+def test_learned_terms_are_capped():
+    learned = LearnedTerms(max_terms=3)
+    for word in ["amber", "basalt", "cobalt", "dune", "ember"]:
+        learned.learn(word, "setting")
+    assert len(learned) == 3
+    assert learned.get("amber") is None and learned.get("ember") is not None
+
+def test_learned_terms_blend_with_the_shared_lexicon():
+    engine = RelevanceEngine()
+    learned = LearnedTerms()
+    for _ in range(20):
+        learned.learn("forest", "character")
+    scores, _ = engine.score("forest", learned)
+    assert max(scores, key=scores.get) == "character"
+    assert max(engine.score("forest")[0], key=engine.score("forest")[0].get) == "setting"
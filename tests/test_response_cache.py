@@ -0,0 +1,32 @@
+import time
+
+from agents.base.response_cache import ResponseCache, SQLiteCacheStore
+
+def _count(store):
+    return store._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+def test_expired_rows_are_purged_on_open(tmp_path):
+    path = str(tmp_path / "cache.db")
+    store = SQLiteCacheStore(path)
+    store.set("old", "stale", time.time() - 7200)
+    store.set("new", "fresh", time.time())
+    reopened = SQLiteCacheStore(path, ttl=3600)
+    assert _count(reopened) == 1
+    assert reopened.get("new", 3600)[0] == "fresh"
+
+def test_writes_purge_beyond_the_row_cap(tmp_path):
+    store = SQLiteCacheStore(str(tmp_path / "cache.db"), max_rows=10)
+    store.PURGE_EVERY = 5
+    now = time.time()
+    for index in range(25):
+        store.set(f"key-{index}", "value", now + index)
+    assert _count(store) == 10
+    assert store.get("key-24", None) is not None
+    assert store.get("key-0", None) is None
+
+def test_disk_tier_serves_after_memory_eviction(tmp_path):
+    cache = ResponseCache(max_entries=1, disk_path=str(tmp_path / "cache.db"))
+    cache.set("a", "first")
+    cache.set("b", "second")
+    assert cache.get("a") == "first"
+    assert cache.disk_hits == 1
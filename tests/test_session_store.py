@@ -0,0 +1,49 @@
+import pytest
+
+from agents.question.session_store import MemorySessionStore, SQLiteSessionStore, SessionStore
+
+def _record(prompt, answers):
+    turns = [{"question": {"question": question, "module": "character"}, "response": answer} for question, answer in answers]
+    return {"prompt": prompt, "state": {"active_modules": {}, "progress": {}, "question_history": turns}, "question": None}
+
+def _answers(record):
+    return [(turn["question"]["question"], turn["response"]) for turn in record["state"]["question_history"]]
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore()
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+
+def test_session_store_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+def test_appended_turns_round_trip(store):
+    store.save("s", _record("a fox", [("q1", "a1")]))
+    store.save("s", _record("a fox", [("q1", "a1"), ("q2", "a2")]))
+    loaded = store.load("s")
+    assert _answers(loaded) == [("q1", "a1"), ("q2", "a2")]
+    assert loaded["state"]["responses"] == {"q1": "a1", "q2": "a2"}
+
+def test_shortened_history_is_rewritten(store):
+    store.save("s", _record("a fox", [("q1", "a1"), ("q2", "a2")]))
+    store.save("s", _record("a fox", [("q3", "a3")]))
+    assert _answers(store.load("s")) == [("q3", "a3")]
+
+def test_diverged_history_is_rewritten(store):
+    store.save("s", _record("a fox", [("q1", "a1"), ("q2", "a2")]))
+    store.save("s", _record("a fox", [("q1", "a1"), ("q2", "other"), ("q3", "a3")]))
+    assert _answers(store.load("s")) == [("q1", "a1"), ("q2", "other"), ("q3", "a3")]
+
+def test_new_prompt_is_rewritten(store):
+    store.save("s", _record("a fox", [("q1", "a1")]))
+    store.save("s", _record("a ship", [("q1", "a1"), ("q2", "a2")]))
+    loaded = store.load("s")
+    assert loaded["prompt"] == "a ship"
+    assert _answers(loaded) == [("q1", "a1"), ("q2", "a2")]
+
+def test_expired_sessions_are_not_loaded(tmp_path):
+    store = MemorySessionStore(ttl=-1.0)
+    store.save("s", _record("a fox", []))
+    assert store.load("s") is None
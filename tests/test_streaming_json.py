@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from agents.utils import StreamingJSONParser
+
+def _parse(text, chunk_size=3):
+    parser = StreamingJSONParser()
+    events = []
+    for start in range(0, len(text), chunk_size):
+        events.extend(parser.feed(text[start:start + chunk_size]))
+    return parser.close(), events, parser
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+def test_matches_json_loads(chunk_size):
+    document = {"question": "Which light?", "options": ["dawn", "dusk"], "score": 0.5, "nested": {"ok": True, "none": None}}
+    result, events, _ = _parse(json.dumps(document), chunk_size)
+    assert result == document
+    assert ((), document) == events[-1]
+    assert (("options", 0), "dawn") in events
+
+def test_prose_around_the_object_is_ignored():
+    result, _, _ = _parse('Sure! Here it is:\n```json\n{"question": "x"}\n```\nAnything else?')
+    assert result == {"question": "x"}
+
+def test_braces_in_leading_prose_are_skipped():
+    result, _, parser = _parse('Use {braces} like this: {"question":"x"}', chunk_size=1)
+    assert not parser.failed
+    assert result == {"question": "x"}
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 1000])
+def test_surrogate_pairs_are_combined(chunk_size):
+    text = json.dumps({"question": "Smile \U0001F600 please", "lone": "\ud83d"})
+    result, _, _ = _parse(text, chunk_size)
+    assert result == json.loads(text)
+    assert result["question"] == "Smile \U0001F600 please"
+    json.dumps(result["question"], ensure_ascii=False).encode("utf-8")
+
+def test_escapes_are_decoded():
+    text = r'{"a": "line\nbreak \"quoted\" é \\ \/"}'
+    assert _parse(text, 2)[0] == json.loads(text)
+
+def test_unclosed_object_fails():
+    result, _, parser = _parse('{"question": "x", "options": [')
+    assert result is None and parser.failed
+
+def test_invalid_literal_fails():
+    result, _, parser = _parse('{"question": nope}')
+    assert result is None and "Invalid literal" in parser.error
+
+@pytest.mark.parametrize("text", ['{"a": }', '{"a": []', '{"a": [1,]}', '{"a": 1,}'])
+def test_missing_value_fails(text):
+    result, _, parser = _parse(text, chunk_size=1)
+    assert result is None and parser.failed
+
+@pytest.mark.parametrize("text", ['{"a": [1"x"]}', '{"a": [1[2]]}', '{"a": true"x"}'])
+def test_value_run_into_a_scalar_fails(text):
+    result, _, parser = _parse(text, chunk_size=1)
+    assert result is None and parser.failed
+
+def test_empty_containers_close():
+    assert _parse('{"a": {}, "b": []}', chunk_size=1)[0] == {"a": {}, "b": []}
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from agents.utils.json_utils import StructuredOutputError
+
+class _Answer(BaseModel):
+    answer: str
+
+MESSAGES = [{"role": "user", "content": "Answer in JSON."}]
+
+def _replies(*texts):
+    """Reply with each text in turn, repeating the last one."""
+    remaining = list(texts)
+    return lambda body: remaining.pop(0) if len(remaining) > 1 else remaining[0]
+
+def _complete(registry, retries=1):
+    return asyncio.run(registry.get_llm().complete_structured(MESSAGES, _Answer, stage="analysis", retries=retries))
+
+def test_valid_output_is_parsed_once(stub_registry):
+    registry = stub_registry(reply=_replies('{"answer": "yes"}'))
+    assert _complete(registry).answer == "yes"
+    assert registry.model_transport.requests == 1
+
+def test_invalid_output_is_retried(stub_registry):
+    registry = stub_registry(reply=_replies("Sorry, I can't help with that.", '{"answer": "yes"}'))
+    assert _complete(registry).answer == "yes"
+    assert registry.model_transport.requests == 2
+    assert registry.router.stats()["analysis"]["failure_rate"] == 0.0
+
+def test_invalid_output_is_not_served_from_the_cache(stub_registry):
+    registry = stub_registry(reply=_replies('{"answer": ', '{"answer": "yes"}'))
+    with pytest.raises(StructuredOutputError):
+        _complete(registry, retries=0)
+    # The truncated reply was dropped, so the next call asks the model again
+    assert _complete(registry, retries=0).answer == "yes"
+    assert registry.model_transport.requests == 2
+
+def test_output_that_never_validates_raises(stub_registry):
+    registry = stub_registry(reply=_replies('{"unexpected": true}'))
+    with pytest.raises(StructuredOutputError):
+        _complete(registry, retries=2)
+    assert registry.model_transport.requests == 3
+    assert registry.router.stats()["analysis"]["failure_rate"] == 1.0